@@ -0,0 +1,140 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { requireAdmin } from '@/lib/auth/admin';
+import { decodeSmtIntervalBatches, SmtIntervalBatchError } from '@/lib/smt/intervalBatch';
+import { replaceNormalizedSmtIntervals } from '@/lib/usage/normalizeSmtIntervals';
+import {
+  enqueueDeferredPostIngestTasks,
+  shouldThrottleInlinePostIngest,
+} from '@/lib/usage/smtDeferredPostIngest';
+import {
+  canonicalCoverageWindowUtcBounds,
+  filterIntervalsToCanonicalCoverageWindow,
+  resolveCanonicalUsage365CoverageWindow,
+} from '@/lib/usage/canonicalMetadataWindow';
+
+export const runtime = 'nodejs';
+export const maxDuration = 300;
+
+export const dynamic = 'force-dynamic';
+
+/**
+ * Packed interval batches from the droplet ingest engine (SMT_UPLOAD_FORMAT=binary).
+ * The droplet already parsed and de-duplicated the CSV; this route only decodes,
+ * bounds to the canonical coverage window and persists. `final=1` marks the last
+ * request for a file and queues deferred post-ingest, like raw-upload's postIngest.
+ * `watermarks` acknowledges the latest slot received per ESIID/meter; the droplet
+ * only advances its delta state from these.
+ */
+export async function POST(req: NextRequest) {
+  const gate = requireAdmin(req);
+  if (!gate.ok) return NextResponse.json(gate.body, { status: gate.status });
+
+  const params = req.nextUrl.searchParams;
+  const filename = params.get('filename') ?? null;
+  const source = params.get('source') || 'smt';
+  const final = params.get('final') === '1';
+
+  let batches;
+  try {
+    batches = decodeSmtIntervalBatches(new Uint8Array(await req.arrayBuffer()));
+  } catch (err) {
+    if (err instanceof SmtIntervalBatchError) {
+      console.error('[interval-batch] decode failed', { filename, error: err.message });
+      return NextResponse.json({ ok: false, error: 'BAD_BATCH', details: err.message }, { status: 400 });
+    }
+    throw err;
+  }
+
+  const intervals = batches.flatMap((batch) =>
+    batch.intervals.map((point) => ({
+      esiid: batch.esiid,
+      meter: batch.meter,
+      ts: point.ts,
+      kwh: point.kwh,
+      source,
+    })),
+  );
+
+  const canonicalCoverage = resolveCanonicalUsage365CoverageWindow();
+  const { rangeStart, rangeEndInclusive } = canonicalCoverageWindowUtcBounds(canonicalCoverage);
+  const bounded = filterIntervalsToCanonicalCoverageWindow(intervals, canonicalCoverage);
+  const distinctEsiids = Array.from(new Set(bounded.map((i) => i.esiid))).filter(Boolean);
+  const throttleInlinePostIngest = shouldThrottleInlinePostIngest();
+
+  let tsMin: number | null = null;
+  let tsMax: number | null = null;
+  const seriesMax = new Map<string, { esiid: string; meter: string; ms: number }>();
+  for (const interval of intervals) {
+    const ms = interval.ts.getTime();
+    if (tsMin === null || ms < tsMin) tsMin = ms;
+    if (tsMax === null || ms > tsMax) tsMax = ms;
+    const key = `${interval.esiid}|${interval.meter}`;
+    const current = seriesMax.get(key);
+    if (!current) seriesMax.set(key, { esiid: interval.esiid, meter: interval.meter, ms });
+    else if (ms > current.ms) current.ms = ms;
+  }
+
+  try {
+    let inserted = 0;
+    let skipped = 0;
+    if (bounded.length > 0) {
+      const persisted = await replaceNormalizedSmtIntervals({
+        intervals: bounded,
+        transactionTimeoutMs: 30_000,
+        primaryChunkSize: 5000,
+        usageChunkSize: 5000,
+        writeUsageModule: !throttleInlinePostIngest,
+      });
+      inserted = persisted.inserted;
+      skipped = persisted.skipped;
+    }
+
+    let deferredTasksEnqueued = 0;
+    if (final && distinctEsiids.length > 0) {
+      deferredTasksEnqueued = await enqueueDeferredPostIngestTasks({
+        distinctEsiids,
+        rangeStart,
+        rangeEnd: rangeEndInclusive,
+        logPrefix: '[interval-batch]',
+      });
+    }
+
+    console.log('[interval-batch] persisted', {
+      filename,
+      batches: batches.length,
+      intervals: intervals.length,
+      records: bounded.length,
+      inserted,
+      skipped,
+      final,
+    });
+
+    return NextResponse.json({
+      ok: true,
+      filename,
+      batches: batches.length,
+      watermarks: Array.from(seriesMax.values()).map((s) => ({
+        esiid: s.esiid,
+        meter: s.meter,
+        tsMax: new Date(s.ms).toISOString(),
+      })),
+      normalizedInline: {
+        intervalsInserted: inserted,
+        inserted,
+        skipped,
+        records: bounded.length,
+        tsMin: tsMin === null ? null : new Date(tsMin).toISOString(),
+        tsMax: tsMax === null ? null : new Date(tsMax).toISOString(),
+        postIngestDeferred: final,
+        usageDualWriteDeferred: throttleInlinePostIngest,
+        deferredTasksEnqueued,
+      },
+    });
+  } catch (e: any) {
+    console.error('[interval-batch] persist failed', { filename, err: e });
+    return NextResponse.json(
+      { ok: false, error: 'DB', details: e?.message || String(e) },
+      { status: 500 },
+    );
+  }
+}
@@ -0,0 +1,294 @@
+"""
+Local interval archive: every interval the native ingest engine hands to the
+app, kept per ESIID so gap checks and re-posts never need SMT or old .asc files.
+
+Layout under SMT_ARCHIVE_DIR:
+
+    <esiid>/index.json      partition -> {rows, first, last, bytes, meters}
+    <esiid>/<YYYY-MM>.smta  one America/Chicago calendar month
+
+A partition is a small header followed by zlib-compressed fixed-width columns
+(little-endian), each stored contiguously so similar values compress together:
+
+    magic "SMTA" | version u8 | meter count u8 + (len u8 + ascii) each
+    | rows u32 | base ts i64 (00:00 Chicago on the 1st, UTC epoch s)
+    | zlib( meter u8[n] | offset s u32[n] | kWh*1000 i32[n] | revision u32[n] | flags u8[n] )
+
+Rows are sorted by (meter, start). Writes merge into the existing partition
+with smt_intervals.resolve_latest (the newer write wins a tie) and replace the
+file atomically; the index lets a range read open only the months it needs.
+"""
+
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import smt_intervals
+
+ARCHIVE_MAGIC = b"SMTA"
+ARCHIVE_VERSION = 1
+INDEX_FILE = "index.json"
+PARTITION_SUFFIX = ".smta"
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_TAIL = struct.Struct("<Iq")
+_SWAP = sys.byteorder != "little"
+
+
+def partition_key(epoch: int) -> str:
+    """YYYY-MM of the America/Chicago month holding a UTC epoch."""
+    d = date.fromordinal(smt_intervals.chicago_day(epoch) + _EPOCH_ORDINAL)
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+def partition_start(key: str) -> int:
+    """UTC epoch of 00:00 America/Chicago on the first day of a YYYY-MM partition."""
+    year, month = int(key[:4]), int(key[5:7])
+    return smt_intervals.chicago_day_start(date(year, month, 1).toordinal() - _EPOCH_ORDINAL)
+
+
+def esiid_key(esiid: str) -> str:
+    """File-name-safe form of an ESIID (alphanumerics, "-" and "_" only); ValueError if nothing is left."""
+    safe = "".join(ch for ch in esiid if ch.isascii() and (ch.isalnum() or ch in "-_"))
+    if not safe:
+        raise ValueError(f"unusable ESIID {esiid!r}")
+    return safe
+
+
+def _le(column: array) -> bytes:
+    if _SWAP:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column(typecode: str, raw: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(raw)
+    if _SWAP:
+        column.byteswap()
+    return column
+
+
+class Partition:
+    """One month of one ESIID, decoded: meter names plus the fixed-width columns."""
+
+    def __init__(self, base: int, meters: List[str]):
+        self.base = base
+        self.meters = meters
+        self.meter = array("B")
+        self.offset = array("I")
+        self.kwh = array("i")
+        self.revision = array("I")
+        self.flags = array("B")
+
+    def __len__(self) -> int:
+        return len(self.offset)
+
+    def encode(self) -> bytes:
+        head = [ARCHIVE_MAGIC, bytes([ARCHIVE_VERSION, len(self.meters)])]
+        for meter in self.meters:
+            raw = meter.encode("ascii", "replace")[:255]
+            head.append(bytes([len(raw)]) + raw)
+        head.append(_TAIL.pack(len(self), self.base))
+        body = b"".join(_le(c) for c in (self.meter, self.offset, self.kwh, self.revision, self.flags))
+        return b"".join(head) + zlib.compress(body, 6)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Partition":
+        if data[:4] != ARCHIVE_MAGIC or len(data) < 6:
+            raise ValueError("not an interval archive partition")
+        if data[4] != ARCHIVE_VERSION:
+            raise ValueError(f"unsupported archive version {data[4]}")
+        pos = 6
+        meters: List[str] = []
+        for _ in range(data[5]):
+            size = data[pos]
+            meters.append(data[pos + 1 : pos + 1 + size].decode("ascii"))
+            pos += 1 + size
+        rows, base = _TAIL.unpack_from(data, pos)
+        body = zlib.decompress(data[pos + _TAIL.size :])
+        if len(body) != rows * 14:
+            raise ValueError(f"partition holds {len(body)} column bytes for {rows} rows")
+        part = cls(base, meters)
+        widths = (("B", 1), ("I", 4), ("i", 4), ("I", 4), ("B", 1))
+        columns = []
+        at = 0
+        for typecode, width in widths:
+            columns.append(_column(typecode, body[at : at + rows * width]))
+            at += rows * width
+        part.meter, part.offset, part.kwh, part.revision, part.flags = columns
+        return part
+
+
+class IntervalArchive:
+    """Month-partitioned interval store under `root` (one directory per ESIID)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _dir(self, esiid: str) -> str:
+        return os.path.join(self.root, esiid_key(esiid))
+
+    def index(self, esiid: str) -> Dict[str, Dict[str, Any]]:
+        """Partition summaries for an ESIID, keyed YYYY-MM; empty when nothing is archived."""
+        try:
+            with open(os.path.join(self._dir(esiid), INDEX_FILE), "r", encoding="utf-8") as fh:
+                return json.load(fh).get("partitions", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _load(self, esiid: str, key: str) -> Optional[Partition]:
+        """The partition, None when absent; ValueError when the file is unreadable."""
+        path = os.path.join(self._dir(esiid), key + PARTITION_SUFFIX)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            return None
+        try:
+            return Partition.decode(data)
+        except (zlib.error, struct.error, IndexError, UnicodeDecodeError) as exc:
+            raise ValueError(f"corrupt archive partition {path}: {exc!r}") from exc
+
+    def _quarantine(self, esiid: str, key: str) -> None:
+        """Move an unreadable partition aside (kept for inspection) so the month can be rebuilt."""
+        path = os.path.join(self._dir(esiid), key + PARTITION_SUFFIX)
+        os.replace(path, f"{path}.corrupt{int(time.time())}")
+
+    @staticmethod
+    def _replace(path: str, data: bytes) -> None:
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+
+    def write(self, cols: smt_intervals.IntervalColumns) -> Dict[str, int]:
+        """Merge intervals into their partitions; returns partitions rewritten per ESIID."""
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for i in range(len(cols)):
+            esiid = cols.series_keys[cols.series[i]][0]
+            groups.setdefault((esiid, partition_key(cols.start[i])), []).append(i)
+        written: Dict[str, int] = {}
+        with self._lock:
+            indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (esiid, key), rows in sorted(groups.items()):
+                if esiid not in indexes:
+                    indexes[esiid] = self.index(esiid)
+                    os.makedirs(self._dir(esiid), exist_ok=True)
+                merged = self._merge(esiid, key, cols, rows)
+                data = merged.encode()
+                path = os.path.join(self._dir(esiid), key + PARTITION_SUFFIX)
+                if indexes[esiid].get(key, {}).get("bytes") == len(data) and self._same(path, data):
+                    continue
+                self._replace(path, data)
+                indexes[esiid][key] = {
+                    "rows": len(merged),
+                    "first": merged.base + min(merged.offset),
+                    "last": merged.base + max(merged.offset),
+                    "bytes": len(data),
+                    "meters": merged.meters,
+                    "updatedAt": round(time.time(), 3),
+                }
+                written[esiid] = written.get(esiid, 0) + 1
+            for esiid in written:
+                payload = {"version": ARCHIVE_VERSION, "partitions": dict(sorted(indexes[esiid].items()))}
+                self._replace(
+                    os.path.join(self._dir(esiid), INDEX_FILE),
+                    json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+                )
+        return written
+
+    @staticmethod
+    def _same(path: str, data: bytes) -> bool:
+        try:
+            with open(path, "rb") as fh:
+                return fh.read() == data
+        except OSError:
+            return False
+
+    def _merge(
+        self, esiid: str, key: str, cols: smt_intervals.IntervalColumns, rows: List[int]
+    ) -> Partition:
+        combined = smt_intervals.IntervalColumns()
+        try:
+            existing = self._load(esiid, key)
+        except ValueError:
+            # Rebuild the month from what is being written now; the bad file stays aside.
+            self._quarantine(esiid, key)
+            existing = None
+        if existing is not None:
+            series = [combined.series_id(esiid, meter) for meter in existing.meters]
+            for k in range(len(existing)):
+                combined.append(
+                    series[existing.meter[k]],
+                    existing.base + existing.offset[k],
+                    existing.kwh[k] / 1000,
+                    existing.revision[k],
+                    existing.flags[k],
+                )
+        for i in rows:
+            meter = cols.series_keys[cols.series[i]][1]
+            combined.append(
+                combined.series_id(esiid, meter), cols.start[i], cols.kwh[i], cols.revision[i], cols.flags[i]
+            )
+        resolved = smt_intervals.resolve_latest(combined)
+        # Meter order by name so an unchanged month re-encodes to identical bytes.
+        names = sorted(meter for _, meter in resolved.series_keys)
+        rank = {meter: n for n, meter in enumerate(names)}
+        order = sorted(range(len(resolved)), key=lambda k: (rank[resolved.series_keys[resolved.series[k]][1]], resolved.start[k]))
+        part = Partition(partition_start(key), names)
+        for k in order:
+            part.meter.append(rank[resolved.series_keys[resolved.series[k]][1]])
+            part.offset.append(resolved.start[k] - part.base)
+            part.kwh.append(int(round(resolved.kwh[k] * 1000)))
+            part.revision.append(max(0, resolved.revision[k]))
+            part.flags.append(resolved.flags[k])
+        return part
+
+    def read(self, esiid: str, start: int, end: int) -> smt_intervals.IntervalColumns:
+        """
+        Archived intervals with start in [start, end) UTC epoch seconds, sorted by
+        (meter, start). ValueError if a partition in the range is unreadable.
+        """
+        per_meter: Dict[str, List[Tuple[Partition, int, int]]] = {}
+        for key, info in sorted(self.index(esiid).items()):
+            if info["last"] < start or info["first"] >= end:
+                continue
+            part = self._load(esiid, key)
+            if part is None:
+                continue
+            lo_off, hi_off = max(0, start - part.base), max(0, end - part.base)
+            row = 0
+            for m, meter in enumerate(part.meters):
+                # Rows are sorted by (meter, offset): find this meter's run, then bisect the range.
+                run_end = bisect_left(part.meter, m + 1, row)
+                lo = bisect_left(part.offset, lo_off, row, run_end)
+                hi = bisect_left(part.offset, hi_off, row, run_end)
+                if hi > lo:
+                    per_meter.setdefault(meter, []).append((part, lo, hi))
+                row = run_end
+
+        out = smt_intervals.IntervalColumns()
+        for meter in sorted(per_meter):
+            series = out.series_id(esiid, meter)
+            for part, lo, hi in per_meter[meter]:
+                base = part.base
+                out.series.extend(array("H", [series]) * (hi - lo))
+                out.start.extend(array("q", [base + o for o in part.offset[lo:hi]]))
+                out.kwh.extend(array("d", [k / 1000 for k in part.kwh[lo:hi]]))
+                out.revision.extend(array("q", part.revision[lo:hi]))
+                out.flags.extend(part.flags[lo:hi])
+        out.stats["processedRows"] = len(out)
+        return out
@@ -0,0 +1,263 @@
+"""
+Per-ESIID interval coverage index, built by the native ingest engine.
+
+Each ESIID gets a bitmap with one bit per 15-minute UTC slot that ingest has
+handed to the app (all meters together), stored in the ingest ledger's SQLite
+file. A year is about 4.4 KB per ESIID. `CoverageStore.report` turns the bitmap
+into merged missing spans and into Chicago-date windows. A targeted SMT backfill
+can request just those windows instead of a blanket 365-day pull.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import smt_intervals
+
+SLOT_SECONDS = 900
+# Report at most this many raw missing spans; backfill windows are always complete.
+MAX_REPORTED_SPANS = 500
+
+
+def _iso(slot: int) -> str:
+    return datetime.fromtimestamp(slot * SLOT_SECONDS, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class CoverageBitmap:
+    """Set of UTC 15-minute slot numbers (epoch // 900), as bits from `base` (a multiple of 8)."""
+
+    def __init__(self, base: int = 0, bits: bytes = b""):
+        self.base = base
+        self.bits = bytearray(bits)
+
+    def __bool__(self) -> bool:
+        return any(self.bits)
+
+    def mark(self, slots: Iterable[int]) -> int:
+        """Set the given slots; returns how many were not already set."""
+        ordered = sorted(set(slots))
+        if not ordered:
+            return 0
+        low = ordered[0] - ordered[0] % 8
+        if not self.bits:
+            self.base = low
+        elif low < self.base:
+            self.bits[:0] = bytes((self.base - low) // 8)
+            self.base = low
+        need = (ordered[-1] - self.base) // 8 + 1
+        if need > len(self.bits):
+            self.bits.extend(bytes(need - len(self.bits)))
+        added = 0
+        bits = self.bits
+        for slot in ordered:
+            offset = slot - self.base
+            mask = 1 << (offset & 7)
+            if not bits[offset >> 3] & mask:
+                bits[offset >> 3] |= mask
+                added += 1
+        return added
+
+    def has(self, slot: int) -> bool:
+        offset = slot - self.base
+        if offset < 0 or offset >> 3 >= len(self.bits):
+            return False
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        """(first, last) set slot, or (None, None)."""
+        first = next((i for i, b in enumerate(self.bits) if b), None)
+        if first is None:
+            return None, None
+        last = next(i for i in range(len(self.bits) - 1, -1, -1) if self.bits[i])
+        lo = self.base + first * 8 + (self.bits[first] & -self.bits[first]).bit_length() - 1
+        hi = self.base + last * 8 + self.bits[last].bit_length() - 1
+        return lo, hi
+
+    def missing_spans(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """Merged [from, to) slot spans in [start, end) that are not set."""
+        spans: List[Tuple[int, int]] = []
+        gap: Optional[int] = None
+        slot = start
+        while slot < end:
+            offset = slot - self.base
+            byte = self.bits[offset >> 3] if 0 <= offset and offset >> 3 < len(self.bits) else 0
+            if offset & 7 == 0 and slot + 8 <= end and byte in (0, 0xFF):
+                # Whole byte at once: all missing or all present.
+                if byte == 0 and gap is None:
+                    gap = slot
+                elif byte == 0xFF and gap is not None:
+                    spans.append((gap, slot))
+                    gap = None
+                slot += 8
+                continue
+            present = bool(byte & (1 << (offset & 7)))
+            if not present and gap is None:
+                gap = slot
+            elif present and gap is not None:
+                spans.append((gap, slot))
+                gap = None
+            slot += 1
+        if gap is not None:
+            spans.append((gap, end))
+        return spans
+
+    def trim_before(self, slot: int) -> None:
+        """Forget whole bytes of slots before `slot` (retention)."""
+        drop = (slot - self.base) // 8
+        if drop > 0:
+            del self.bits[:drop]
+            self.base += drop * 8
+
+
+def backfill_windows(spans: List[Tuple[int, int]], merge_gap_days: int) -> List[Tuple[int, int]]:
+    """Inclusive Chicago day ranges covering the spans, merging ranges at most `merge_gap_days` apart."""
+    windows: List[Tuple[int, int]] = []
+    for lo, hi in spans:
+        first = smt_intervals.chicago_day(lo * SLOT_SECONDS)
+        last = smt_intervals.chicago_day((hi - 1) * SLOT_SECONDS)
+        if windows and first - windows[-1][1] - 1 <= merge_gap_days:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], last))
+        else:
+            windows.append((first, last))
+    return windows
+
+
+class CoverageStore:
+    """Coverage bitmaps plus a record of targeted backfills already submitted (SQLite, WAL)."""
+
+    def __init__(self, path: str, *, retention_days: float = 400.0):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS interval_coverage (
+                esiid TEXT PRIMARY KEY,
+                base_slot INTEGER NOT NULL,
+                bits BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS coverage_backfills (
+                esiid TEXT NOT NULL,
+                start_day INTEGER NOT NULL,
+                end_day INTEGER NOT NULL,
+                submitted_at REAL NOT NULL,
+                job_id TEXT,
+                PRIMARY KEY (esiid, start_day, end_day)
+            )
+            """
+        )
+
+    def load(self, esiid: str) -> CoverageBitmap:
+        with self._lock:
+            row = self._db.execute("SELECT base_slot, bits FROM interval_coverage WHERE esiid = ?", (esiid,)).fetchone()
+        return CoverageBitmap(row[0], row[1]) if row else CoverageBitmap()
+
+    def mark_columns(self, cols: smt_intervals.IntervalColumns) -> Dict[str, int]:
+        """Add every interval in `cols` to its ESIID's bitmap; returns newly covered slots per ESIID."""
+        slots: Dict[str, Set[int]] = {}
+        for series, start in zip(cols.series, cols.start):
+            slots.setdefault(cols.series_keys[series][0], set()).add(start // SLOT_SECONDS)
+        horizon = int((time.time() - self.retention_days * 86400) // SLOT_SECONDS)
+        added: Dict[str, int] = {}
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for esiid, esiid_slots in slots.items():
+                    row = self._db.execute(
+                        "SELECT base_slot, bits FROM interval_coverage WHERE esiid = ?", (esiid,)
+                    ).fetchone()
+                    bitmap = CoverageBitmap(row[0], row[1]) if row else CoverageBitmap()
+                    added[esiid] = bitmap.mark(s for s in esiid_slots if s >= horizon)
+                    bitmap.trim_before(horizon)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO interval_coverage (esiid, base_slot, bits, updated_at) VALUES (?, ?, ?, ?)",
+                        (esiid, bitmap.base, bytes(bitmap.bits), time.time()),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return added
+
+    def report(
+        self,
+        esiid: str,
+        start_day: int,
+        end_day: int,
+        *,
+        include_leading: bool = False,
+        merge_gap_days: int = 2,
+    ) -> Dict[str, Any]:
+        """
+        Coverage of Chicago days [start_day, end_day]. Unless `include_leading`,
+        the stretch before the first interval ever seen is not reported missing
+        (usually history SMT does not have); an ESIID with no coverage at all
+        reports the whole window.
+        """
+        bitmap = self.load(esiid)
+        first, last = bitmap.bounds()
+        start_slot = smt_intervals.chicago_day_start(start_day) // SLOT_SECONDS
+        end_slot = smt_intervals.chicago_day_start(end_day + 1) // SLOT_SECONDS
+        from_slot = start_slot
+        if first is not None and not include_leading:
+            from_slot = min(end_slot, max(start_slot, first))
+        spans = bitmap.missing_spans(from_slot, end_slot)
+        missing = sum(hi - lo for lo, hi in spans)
+        expected = end_slot - start_slot
+        covered = expected - missing - (from_slot - start_slot)
+        windows = backfill_windows(spans, merge_gap_days)
+        return {
+            "esiid": esiid,
+            "startDate": smt_intervals.format_day(start_day),
+            "endDate": smt_intervals.format_day(end_day),
+            "expectedSlots": expected,
+            "coveredSlots": covered,
+            "missingSlots": missing,
+            "firstCovered": _iso(first) if first is not None else None,
+            "lastCovered": _iso(last) if last is not None else None,
+            "missing": [
+                {"start": _iso(lo), "end": _iso(hi), "slots": hi - lo} for lo, hi in spans[:MAX_REPORTED_SPANS]
+            ],
+            "truncated": len(spans) > MAX_REPORTED_SPANS,
+            "backfillWindows": [
+                {"startDate": smt_intervals.format_day(a), "endDate": smt_intervals.format_day(b), "days": b - a + 1}
+                for a, b in windows
+            ],
+        }
+
+    def recent_backfill(self, esiid: str, start_day: int, end_day: int, since: float) -> bool:
+        """Whether a backfill covering [start_day, end_day] was submitted for this ESIID after `since`."""
+        with self._lock:
+            row = self._db.execute(
+                """
+                SELECT 1 FROM coverage_backfills
+                WHERE esiid = ? AND start_day <= ? AND end_day >= ? AND submitted_at >= ?
+                LIMIT 1
+                """,
+                (esiid, start_day, end_day, since),
+            ).fetchone()
+        return row is not None
+
+    def record_backfill(self, esiid: str, start_day: int, end_day: int, job_id: Optional[str]) -> None:
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO coverage_backfills (esiid, start_day, end_day, submitted_at, job_id)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (esiid, start_day, end_day, time.time(), job_id),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,1294 @@
+"""
+Native SMT ingest engine: the deploy/smt/fetch_and_post.sh pass, in-process.
+
+The webhook server (deploy/droplet/webhook_server.py) runs `run_ingest` on a
+worker thread for each queued smt_ingest job. Unlike the script it spawns no
+per-file helpers (sha256sum, unzip, jq, curl, base64): hashing, ZIP handling and
+uploads happen in Python, and only `sftp` (once per run) and `gpg` (once per
+encrypted file) stay external.
+
+Per-file prepare stages (stat, hash, dedupe check) run on a bounded thread
+pool a few files ahead of the uploader. Encrypted files are never written out
+decrypted: gpg's stdout feeds a front-to-back ZIP reader whose chosen member is
+streamed straight into the upload body (PgpZipCsvStream). Uploads stay one at a
+time, in discovery order, with the script's SMT_UPLOAD_DELAY throttle, so the
+app sees files in the same order as before. Every stage is timed into the metrics sink
+the caller passes in (`observe(name, seconds, **labels)` / `inc(name, value, **labels)`).
+
+Dedupe state lives in an indexed ledger (PostedLedger, SQLite next to the
+inbox). fetch_and_post.sh stays the fallback (SMT_INGEST_ENGINE=script) and the
+cron/systemd path; the ledger keeps its `.posted_sha256` in step both ways.
+
+With SMT_UPLOAD_FORMAT=binary, interval CSVs are parsed here (smt_intervals)
+and posted to the app as packed per-ESIID/day batches instead of as files;
+days the app has already acknowledged unchanged are not sent again.
+
+Intervals the app accepted are also marked in the coverage index
+(smt_coverage) and merged into the local month-partitioned archive
+(smt_archive), which `repost_archive` can send to the app again later.
+"""
+
+import base64
+import csv
+import fnmatch
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import requests
+
+import smt_archive
+import smt_coverage
+import smt_intervals
+
+LogFn = Callable[[str], None]
+
+HASH_CHUNK_BYTES = 1024 * 1024
+STREAM_CHUNK_BYTES = 256 * 1024
+ZIP_LOCAL_SIG = b"PK\x03\x04"
+ZIP_CENTRAL_SIG = b"PK\x01\x02"
+ZIP_END_SIG = b"PK\x05\x06"
+ZIP_DESCRIPTOR_SIG = b"PK\x07\x08"
+ZIP_FLAG_DATA_DESCRIPTOR = 0x08
+PGP_HEADER = b"BEGIN PGP MESSAGE"
+PGP_SNIFF_BYTES = 64 * 1024
+DISCOVER_PATTERNS = ("*.csv", "*.csv.*", "*dailymeterusage*.asc", "*intervalmeterusage*.asc")
+PGP_TMP_PREFIX = "pgp_tmp."
+PGP_TMP_MAX_AGE_SECONDS = 3600
+SEEN_FILE_NAME = ".posted_sha256"
+LEDGER_FILE_NAME = ".posted_ledger.sqlite3"
+UPLOAD_OK_STATUSES = (200, 201, 202)
+STAGE_METRIC = "smt_ingest_stage_duration_seconds"
+FILES_METRIC = "smt_ingest_files_total"
+BYTES_METRIC = "smt_ingest_uploaded_bytes_total"
+DAYS_METRIC = "smt_ingest_interval_days_total"
+DUPLICATES_METRIC = "smt_ingest_interval_duplicates_total"
+
+_METER_RE = re.compile(r"M[0-9]+")
+_INTERVAL_RE = re.compile(r"[Ii]nterval")
+_TRUE = ("1", "true", "yes", "y")
+
+
+class _NullMetrics:
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        pass
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        pass
+
+
+class IngestConfig:
+    """The env contract of fetch_and_post.sh, plus the native engine's own knobs."""
+
+    REQUIRED = ("ADMIN_TOKEN", "INTELLIWATT_BASE_URL", "SMT_HOST", "SMT_USER", "SMT_REMOTE_DIR", "SMT_LOCAL_DIR")
+
+    def __init__(self, env: Mapping[str, str]):
+        self.env = env
+        self.admin_token = (env.get("ADMIN_TOKEN") or "").strip()
+        self.base_url = (env.get("INTELLIWATT_BASE_URL") or "").strip().rstrip("/")
+        self.smt_host = (env.get("SMT_HOST") or "").strip()
+        self.smt_user = (env.get("SMT_USER") or "").strip()
+        self.smt_key = (env.get("SMT_KEY") or "").strip()
+        self.remote_dir = (env.get("SMT_REMOTE_DIR") or "").strip()
+        self.local_dir = (env.get("SMT_LOCAL_DIR") or "").strip()
+        self.upload_url = (env.get("SMT_UPLOAD_URL") or "").strip()
+        self.source_tag = env.get("SOURCE_TAG") or "adhocusage"
+        self.meter_default = env.get("METER_DEFAULT") or "M1"
+        self.upload_delay = float(env.get("SMT_UPLOAD_DELAY") or "2")
+        self.process_one = (env.get("SMT_PROCESS_ONE") or "").strip().lower() in _TRUE
+        self.workers = max(1, int(env.get("SMT_INGEST_WORKERS") or "4"))
+        self.sftp_timeout = float(env.get("SMT_SFTP_TIMEOUT_SECONDS") or "1800")
+        self.gpg_timeout = float(env.get("SMT_GPG_TIMEOUT_SECONDS") or "600")
+        self.ledger_path = (env.get("SMT_LEDGER_DB") or "").strip()
+        self.ledger_retention_days = float(env.get("SMT_LEDGER_RETENTION_DAYS") or "400")
+        self.stream_spool_bytes = int(env.get("SMT_STREAM_SPOOL_BYTES") or str(16 * 1024 * 1024))
+        self.upload_format = (env.get("SMT_UPLOAD_FORMAT") or "csv").strip().lower()
+        self.batch_url = (env.get("SMT_BATCH_UPLOAD_URL") or "").strip() or f"{self.base_url}/api/admin/smt/interval-batch"
+        self.batch_days = max(1, int(env.get("SMT_BATCH_DAYS_PER_POST") or "62"))
+        self.coverage_index = (env.get("SMT_COVERAGE_INDEX") or "1").strip().lower() in _TRUE
+        self.archive = (env.get("SMT_ARCHIVE") or "1").strip().lower() in _TRUE
+        self.archive_dir = (env.get("SMT_ARCHIVE_DIR") or "").strip() or "/home/deploy/smt_ingest/archive"
+
+    @classmethod
+    def from_env(cls) -> "IngestConfig":
+        return cls(os.environ)
+
+    def ledger_file(self) -> str:
+        return self.ledger_path or os.path.join(self.local_dir, LEDGER_FILE_NAME)
+
+    def missing(self, *, need_sftp: bool) -> List[str]:
+        problems = [f"env {name}" for name in self.REQUIRED if not (self.env.get(name) or "").strip()]
+        for cmd in (("sftp", "gpg") if need_sftp else ("gpg",)):
+            if shutil.which(cmd) is None:
+                problems.append(f"command {cmd}")
+        return problems
+
+
+class PostedLedger:
+    """
+    Indexed record of posted inbox files (SQLite, WAL), keyed by sha256.
+
+    Each row keeps the file name, size, ESIID it was posted for, the time of
+    the last attempt and its outcome. Only "handled" outcomes (posted,
+    duplicate, ignored, legacy) make a file skippable, so a failed upload is
+    recorded but retried next run. A forceRepost for one ESIID only reposts
+    files recorded for that ESIID (or imported from `.posted_sha256`, whose
+    ESIID is unknown); files posted for other ESIIDs stay skipped.
+
+    `.posted_sha256` stays in step for the fetch_and_post.sh fallback: new lines
+    appended by the script are imported from the last read offset, and handled
+    files are appended to it. Compaction drops rows older than the retention
+    window and rewrites the flat file to match.
+
+    For binary uploads it also keeps per-ESIID/meter interval watermarks (the
+    latest slot the app has acknowledged) and a digest of each acknowledged day,
+    so overlapping re-deliveries only ship days that are newer or changed.
+    """
+
+    HANDLED_OUTCOMES = ("posted", "duplicate", "ignored", "legacy")
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS posted_files (
+                sha256 TEXT PRIMARY KEY,
+                esiid TEXT,
+                file_name TEXT,
+                size_bytes INTEGER,
+                posted_at REAL NOT NULL,
+                outcome TEXT NOT NULL,
+                handled INTEGER NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS posted_files_esiid ON posted_files (esiid)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS posted_files_posted_at ON posted_files (posted_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS ledger_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS interval_watermarks (
+                esiid TEXT NOT NULL,
+                meter TEXT NOT NULL,
+                acked_ts INTEGER NOT NULL,
+                acked_at REAL NOT NULL,
+                PRIMARY KEY (esiid, meter)
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS interval_days (
+                esiid TEXT NOT NULL,
+                meter TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                acked_at REAL NOT NULL,
+                PRIMARY KEY (esiid, meter, day)
+            )
+            """
+        )
+        if legacy_path:
+            self.import_legacy()
+
+    def _meta(self, key: str, default: str = "") -> str:
+        row = self._db.execute("SELECT value FROM ledger_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._db.execute("INSERT OR REPLACE INTO ledger_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def import_legacy(self) -> int:
+        """Import `.posted_sha256` lines written since the last import (the script may have run meanwhile)."""
+        assert self.legacy_path
+        try:
+            size = os.path.getsize(self.legacy_path)
+        except OSError:
+            return 0
+        with self._lock:
+            offset = int(self._meta("legacy_offset", "0"))
+            if offset > size:
+                offset = 0  # truncated or replaced outside the ledger
+            with open(self.legacy_path, "rb") as fh:
+                fh.seek(offset)
+                data = fh.read()
+            # Only consume complete lines; a concurrent writer may be mid-line.
+            consumed = data.rfind(b"\n") + 1
+            now = time.time()
+            rows = [
+                (line.strip().decode("ascii", "replace"), now)
+                for line in data[:consumed].splitlines()
+                if line.strip()
+            ]
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO posted_files (sha256, posted_at, outcome, handled) VALUES (?, ?, 'legacy', 1)",
+                rows,
+            )
+            self._set_meta("legacy_offset", offset + consumed)
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    def lookup(self, sha256: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha256, esiid, file_name, size_bytes, posted_at, outcome, handled FROM posted_files WHERE sha256 = ?",
+                (sha256,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("sha256", "esiid", "fileName", "sizeBytes", "postedAt", "outcome", "handled")
+        return dict(zip(keys, row))
+
+    def should_skip(self, sha256: str, esiid: str, force: bool) -> bool:
+        entry = self.lookup(sha256)
+        if entry is None or not entry["handled"]:
+            return False
+        if force and entry["esiid"] in (None, esiid):
+            return False
+        return True
+
+    def record(self, sha256: str, esiid: str, file_name: str, size_bytes: int, outcome: str) -> None:
+        handled = outcome in self.HANDLED_OUTCOMES
+        with self._lock:
+            previous = self._db.execute("SELECT handled FROM posted_files WHERE sha256 = ?", (sha256,)).fetchone()
+            if previous and previous[0] and not handled:
+                # A failed force-repost must not make an already-posted file pending again.
+                return
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO posted_files (sha256, esiid, file_name, size_bytes, posted_at, outcome, handled)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (sha256, esiid, file_name, size_bytes, time.time(), outcome, int(handled)),
+            )
+            if handled and self.legacy_path and not (previous and previous[0]):
+                with open(self.legacy_path, "a", encoding="utf-8") as fh:
+                    fh.write(sha256 + "\n")
+
+    def watermark(self, esiid: str, meter: str) -> Optional[int]:
+        """Latest interval start (UTC epoch seconds) the app acknowledged for this series."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT acked_ts FROM interval_watermarks WHERE esiid = ? AND meter = ?", (esiid, meter)
+            ).fetchone()
+        return row[0] if row else None
+
+    def acked_days(self, esiid: str, meter: str) -> Dict[int, str]:
+        """Chicago day -> digest of the last acknowledged batch for that day."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT day, digest FROM interval_days WHERE esiid = ? AND meter = ?", (esiid, meter)
+            ).fetchall()
+        return dict(rows)
+
+    def acknowledge(self, batches: List[smt_intervals.DayBatch], watermarks: Dict[Tuple[str, str], int]) -> None:
+        """Record day digests and advance watermarks for batches the app acknowledged."""
+        now = time.time()
+        days = [
+            (b.esiid, b.meter, b.day, smt_intervals.batch_digest(b.packed), now)
+            for b in batches
+            if (b.esiid, b.meter) in watermarks
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO interval_days (esiid, meter, day, digest, acked_at) VALUES (?, ?, ?, ?, ?)",
+                days,
+            )
+            self._db.executemany(
+                """
+                INSERT INTO interval_watermarks (esiid, meter, acked_ts, acked_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (esiid, meter) DO UPDATE SET
+                    acked_ts = MAX(acked_ts, excluded.acked_ts), acked_at = excluded.acked_at
+                """,
+                [(esiid, meter, ts, now) for (esiid, meter), ts in watermarks.items()],
+            )
+            self._db.execute("COMMIT")
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT outcome, COUNT(*) FROM posted_files GROUP BY outcome").fetchall()
+        return {outcome: n for outcome, n in rows}
+
+    def compact(self, retention_seconds: float, *, min_interval: float = 86400.0) -> Optional[int]:
+        """Drop rows older than the retention window (at most once per `min_interval`); returns rows removed."""
+        if retention_seconds <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            if now - float(self._meta("compacted_at", "0")) < min_interval:
+                return None
+            removed = self._db.execute(
+                "DELETE FROM posted_files WHERE posted_at < ?", (now - retention_seconds,)
+            ).rowcount
+            self._db.execute("DELETE FROM interval_days WHERE acked_at < ?", (now - retention_seconds,))
+            if self.legacy_path:
+                hashes = [row[0] for row in self._db.execute("SELECT sha256 FROM posted_files WHERE handled = 1")]
+                tmp_path = self.legacy_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as fh:
+                    fh.writelines(h + "\n" for h in hashes)
+                os.replace(tmp_path, self.legacy_path)
+                self._set_meta("legacy_offset", os.path.getsize(self.legacy_path))
+            self._set_meta("compacted_at", now)
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class _StageClock:
+    """Times one stage into the metrics sink and the run's per-stage totals."""
+
+    def __init__(self, run: "IngestRun", stage: str):
+        self.run = run
+        self.stage = stage
+
+    def __enter__(self) -> "_StageClock":
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        elapsed = time.monotonic() - self.started
+        self.run.metrics.observe(STAGE_METRIC, elapsed, stage=self.stage)
+        with self.run.lock:
+            self.run.stage_seconds[self.stage] = self.run.stage_seconds.get(self.stage, 0.0) + elapsed
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while True:
+            chunk = fh.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def discover_files(local_dir: str) -> List[str]:
+    """Same set as the script's `find -maxdepth 2 -iname ...`, minus our own decrypt temp dirs."""
+    found: List[str] = []
+    base_depth = local_dir.rstrip(os.sep).count(os.sep)
+    for root, dirs, files in os.walk(local_dir):
+        depth = root.rstrip(os.sep).count(os.sep) - base_depth
+        dirs[:] = [] if depth >= 1 else [d for d in dirs if not d.startswith(PGP_TMP_PREFIX)]
+        for name in files:
+            lowered = name.lower()
+            if any(fnmatch.fnmatchcase(lowered, pattern) for pattern in DISCOVER_PATTERNS):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def clean_stale_tmp_dirs(local_dir: str, max_age: float = PGP_TMP_MAX_AGE_SECONDS) -> None:
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(local_dir))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.name.startswith(PGP_TMP_PREFIX) and entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def is_pgp_message(path: str) -> bool:
+    if not path.endswith(".asc"):
+        return False
+    try:
+        with open(path, "rb") as fh:
+            return PGP_HEADER in fh.read(PGP_SNIFF_BYTES)
+    except OSError:
+        return False
+
+
+def is_interval_csv(name: str) -> bool:
+    """SMT often bundles interval + billing files in one ZIP; the interval CSV is the one we post."""
+    return bool(_INTERVAL_RE.search(name)) and name.endswith(".csv")
+
+
+def _iter_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        while True:
+            chunk = fh.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+class ZipStreamError(Exception):
+    """The decrypted payload cannot be read front-to-back as a ZIP archive."""
+
+
+class _ByteStream:
+    """Chunked reader over a pipe with push-back, so ZIP parsing never buffers more than one chunk."""
+
+    def __init__(self, raw: Any, chunk_bytes: int = STREAM_CHUNK_BYTES):
+        self.raw = raw
+        self.chunk_bytes = chunk_bytes
+        self._buf = b""
+
+    def read_chunk(self) -> bytes:
+        if self._buf:
+            data, self._buf = self._buf, b""
+            return data
+        return self.raw.read(self.chunk_bytes)
+
+    def read_exact(self, n: int) -> bytes:
+        parts = []
+        while n > 0:
+            data = self.read_chunk()
+            if not data:
+                raise ZipStreamError("truncated archive")
+            if len(data) > n:
+                self.unread(data[n:])
+                data = data[:n]
+            parts.append(data)
+            n -= len(data)
+        return b"".join(parts)
+
+    def unread(self, data: bytes) -> None:
+        if data:
+            self._buf = data + self._buf
+
+
+class _ZipMember:
+    """Decompressed chunks of one member, read from the local file header onwards, CRC-checked at the end."""
+
+    def __init__(self, stream: _ByteStream, name: str, flags: int, method: int, crc: int, csize: int, zip64: bool):
+        self.stream = stream
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.crc = crc
+        self.csize = csize
+        self.zip64 = zip64
+        self.done = False
+        self._started = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._started:
+            raise ZipStreamError(f"member {self.name!r} already consumed")
+        self._started = True
+        crc = 0
+        if self.method == 8:
+            inflater = zlib.decompressobj(-15)
+            while not inflater.eof:
+                data = inflater.unconsumed_tail or self.stream.read_chunk()
+                if not data:
+                    raise ZipStreamError(f"truncated member {self.name!r}")
+                out = inflater.decompress(data, STREAM_CHUNK_BYTES)
+                if out:
+                    crc = zlib.crc32(out, crc)
+                    yield out
+            self.stream.unread(inflater.unused_data)
+        elif self.method == 0 and not self.flags & ZIP_FLAG_DATA_DESCRIPTOR:
+            remaining = self.csize
+            while remaining > 0:
+                data = self.stream.read_chunk()
+                if not data:
+                    raise ZipStreamError(f"truncated member {self.name!r}")
+                if len(data) > remaining:
+                    self.stream.unread(data[remaining:])
+                    data = data[:remaining]
+                remaining -= len(data)
+                crc = zlib.crc32(data, crc)
+                yield data
+        else:
+            raise ZipStreamError(f"unsupported compression for streaming: method={self.method} flags={self.flags:#x}")
+
+        expected = self.crc
+        if self.flags & ZIP_FLAG_DATA_DESCRIPTOR:
+            head = self.stream.read_exact(4)
+            if head == ZIP_DESCRIPTOR_SIG:
+                head = self.stream.read_exact(4)
+            expected = struct.unpack("<I", head)[0]
+            self.stream.read_exact(16 if self.zip64 else 8)
+        if crc != expected:
+            raise ZipStreamError(f"CRC mismatch in member {self.name!r}")
+        self.done = True
+
+    def drain(self) -> None:
+        if not self._started:
+            for _ in self:
+                pass
+
+
+def iter_zip_members(raw: Any) -> Iterator[_ZipMember]:
+    """
+    Walk a ZIP archive front-to-back from a non-seekable stream via local file
+    headers (the central directory at the end is never needed). Each member
+    must be iterated or left alone before the next one is produced; unread
+    members are drained (decompressed and discarded) automatically.
+    """
+    stream = _ByteStream(raw)
+    while True:
+        try:
+            sig = stream.read_exact(4)
+        except ZipStreamError:
+            return
+        if sig in (ZIP_CENTRAL_SIG, ZIP_END_SIG):
+            return
+        if sig != ZIP_LOCAL_SIG:
+            raise ZipStreamError("not a ZIP archive")
+        _ver, flags, method, _mtime, _mdate, crc, csize, usize, name_len, extra_len = struct.unpack(
+            "<HHHHHIIIHH", stream.read_exact(26)
+        )
+        name = stream.read_exact(name_len).decode("utf-8" if flags & 0x800 else "cp437", "replace")
+        extra = stream.read_exact(extra_len)
+        if flags & 0x1:
+            raise ZipStreamError(f"encrypted ZIP member {name!r}")
+        zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            tag, size = struct.unpack("<HH", extra[offset : offset + 4])
+            if tag == 0x0001:
+                zip64 = True
+                fields = extra[offset + 4 : offset + 4 + size]
+                values = [struct.unpack("<Q", fields[i : i + 8])[0] for i in range(0, len(fields) - 7, 8)]
+                if usize == 0xFFFFFFFF and values:
+                    values.pop(0)
+                if csize == 0xFFFFFFFF and values:
+                    csize = values.pop(0)
+            offset += 4 + size
+        member = _ZipMember(stream, name, flags, method, crc, csize, zip64)
+        if name.endswith("/"):
+            member.drain()
+            continue
+        yield member
+        member.drain()
+        if not member.done:
+            raise ZipStreamError(f"member {member.name!r} was abandoned mid-read")
+
+
+class PgpZipCsvStream:
+    """
+    `gpg --decrypt` piped straight into the front-to-back ZIP reader, yielding
+    the chosen member's bytes in bounded memory; nothing is written to disk.
+
+    `open()` advances to the first interval CSV and returns its name. Members
+    before it are drained, except the first, which is spooled (in memory up to
+    `spool_bytes`) in case the archive has no interval CSV and the script's
+    first-entry fallback applies, as for DailyMeterUsage bundles.
+    """
+
+    def __init__(self, path: str, *, spool_bytes: int, timeout: float):
+        self.path = path
+        self.spool_bytes = spool_bytes
+        self.timeout = timeout
+        self.name: Optional[str] = None
+        self.bytes_out = 0
+        self._proc: Optional[subprocess.Popen] = None
+        self._live: Optional[_ZipMember] = None
+        self._spool: Optional[Any] = None
+
+    def open(self) -> str:
+        self._proc = subprocess.Popen(
+            ["gpg", "--batch", "--yes", "-d", self.path],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        first_name = None
+        for member in iter_zip_members(self._proc.stdout):
+            if is_interval_csv(member.name):
+                self.name, self._live = member.name, member
+                return member.name
+            if first_name is None:
+                first_name = member.name
+                self._spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+                for chunk in member:
+                    self._spool.write(chunk)
+                self._spool.seek(0)
+        if first_name is None:
+            self.close()
+            raise ZipStreamError("gpg produced no ZIP members")
+        self.name = first_name
+        return first_name
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._live is not None:
+            source: Iterator[bytes] = iter(self._live)
+        elif self._spool is not None:
+            source = iter(lambda: self._spool.read(STREAM_CHUNK_BYTES), b"")
+        else:
+            raise ZipStreamError("stream not opened")
+        for chunk in source:
+            self.bytes_out += len(chunk)
+            yield chunk
+
+    def close(self) -> Optional[int]:
+        """Stop gpg (if still running) and return its exit code."""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return None
+        if proc.poll() is None and not (self._live is not None and self._live.done):
+            proc.kill()
+        try:
+            proc.stdout.close()
+            return proc.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            return proc.wait()
+
+
+def multipart_body(fields: Dict[str, str], file_field: str, file_name: str, chunks: Any, boundary: str) -> Iterator[bytes]:
+    """multipart/form-data as a generator, so requests streams it with chunked transfer encoding."""
+    for key, value in fields.items():
+        yield (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'
+        ).encode("utf-8")
+    safe_name = file_name.replace('"', "_").replace("\r", "_").replace("\n", "_")
+    yield (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{safe_name}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8")
+    for chunk in chunks:
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+def meter_from_name(file_name: str, default: str) -> str:
+    match = _METER_RE.search(file_name)
+    return match.group(0) if match else default
+
+
+def handled_outcome(body: Any) -> Optional[str]:
+    """
+    Ledger outcome for an upload response that means "handled": "posted"
+    (normalized), "duplicate", or "ignored" (a non-interval file the receiver
+    dropped on purpose); None when the file should be retried. Accepts the
+    droplet upload server, app raw-upload and app smt/pull inline shapes.
+    """
+    if not isinstance(body, dict) or body.get("ok") is not True:
+        return None
+    file_info = body.get("file") if isinstance(body.get("file"), dict) else {}
+    ingest = body.get("ingest") if isinstance(body.get("ingest"), dict) else {}
+    if ingest.get("normalized") is True or body.get("intervalNormalized") is True:
+        return "posted"
+    if body.get("normalizedInline") is not None:
+        return "posted"
+    if body.get("duplicate") is True:
+        return "duplicate"
+    message = body.get("message")
+    if file_info.get("interval") is False or (isinstance(message, str) and "upload ignored" in message.lower()):
+        return "ignored"
+    return None
+
+
+def acked_watermarks(body: Any) -> Dict[Tuple[str, str], int]:
+    """(esiid, meter) -> latest acknowledged slot start from an interval-batch response's `watermarks`."""
+    marks: Dict[Tuple[str, str], int] = {}
+    entries = body.get("watermarks") if isinstance(body, dict) else None
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or not entry.get("esiid") or not isinstance(entry.get("tsMax"), str):
+            continue
+        try:
+            ts = int(datetime.fromisoformat(entry["tsMax"].replace("Z", "+00:00")).timestamp())
+        except ValueError:
+            continue
+        key = (str(entry["esiid"]), str(entry.get("meter") or "unknown"))
+        marks[key] = max(ts, marks.get(key, ts))
+    return marks
+
+
+class IngestRun:
+    """One ingest job: an optional SFTP sync, then one posting pass per target ESIID."""
+
+    def __init__(self, config: IngestConfig, log: LogFn, metrics: Any = None):
+        self.config = config
+        self.log = log
+        self.metrics = metrics or _NullMetrics()
+        self.lock = threading.Lock()
+        self.stage_seconds: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # (path, size, mtime_ns) -> sha256, so later passes of a coalesced job never re-hash.
+        self._hash_cache: Dict[Tuple[str, int, int], str] = {}
+        self._http = requests.Session()
+        self.rate_limited = False
+        self.rate_limit_reset: Optional[str] = None
+        self.ledger: PostedLedger
+        self.coverage: Optional[smt_coverage.CoverageStore] = None
+        self.archive: Optional[smt_archive.IntervalArchive] = None
+        self._posted_this_pass: set = set()
+
+    def stage(self, name: str) -> _StageClock:
+        return _StageClock(self, name)
+
+    def _count(self, outcome: str) -> None:
+        self.metrics.inc(FILES_METRIC, outcome=outcome)
+        with self.lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    # -- sync --------------------------------------------------------------
+
+    def sftp_sync(self) -> None:
+        cfg = self.config
+        self.log(f"Starting SFTP sync from {cfg.smt_user}@{cfg.smt_host}:{cfg.remote_dir}")
+        batch = f"cd {cfg.remote_dir}\nlcd {cfg.local_dir}\nmget -p -r *\n"
+        target = f"{cfg.smt_user}@{cfg.smt_host}"
+        if cfg.smt_key:
+            cmd = ["sftp", "-i", cfg.smt_key, "-oStrictHostKeyChecking=accept-new", target]
+        else:
+            cmd = ["sftp", "-oPreferredAuthentications=password", "-oStrictHostKeyChecking=accept-new", target]
+        with self.stage("sync"):
+            try:
+                proc = subprocess.run(
+                    cmd,
+                    input=batch,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    timeout=cfg.sftp_timeout,
+                )
+            except (OSError, subprocess.TimeoutExpired) as exc:
+                self.log(f"WARN: sftp failed ({exc!r}); continuing with any downloaded files")
+                return
+        for line in (proc.stdout or "").splitlines():
+            if line.strip():
+                self.log(f"sftp: {line}")
+        if proc.returncode != 0:
+            self.log("WARN: sftp returned non-zero; continuing with any downloaded files")
+
+    # -- per-file prepare stages (thread pool) -------------------------------
+
+    def _sha256(self, path: str, st: os.stat_result) -> str:
+        key = (path, st.st_size, st.st_mtime_ns)
+        cached = self._hash_cache.get(key)
+        if cached is not None:
+            return cached
+        with self.stage("hash"):
+            sha256 = sha256_file(path)
+        with self.lock:
+            self._hash_cache[key] = sha256
+        return sha256
+
+    def prepare(self, path: str, esiid: str, force: bool) -> Dict[str, Any]:
+        item: Dict[str, Any] = {"path": path, "skip": False}
+        st = os.stat(path)
+        item["size"] = st.st_size
+        item["mtime"] = st.st_mtime
+        item["sha256"] = sha256 = self._sha256(path, st)
+        if self.ledger.should_skip(sha256, esiid, force):
+            item["skip"] = True
+            return item
+        item["pgp"] = is_pgp_message(path)
+        return item
+
+    # -- upload stage (in order) ---------------------------------------------
+
+    def _open_payload(self, item: Dict[str, Any]) -> Tuple[str, Any, Optional[PgpZipCsvStream]]:
+        """
+        (upload file name, chunk iterable, stream to close) for one inbox file.
+        PGP files stream through gpg and the ZIP reader; if that fails before
+        any bytes are produced the raw file is posted, as the script does.
+        """
+        path = item["path"]
+        if item.get("pgp"):
+            stream = PgpZipCsvStream(path, spool_bytes=self.config.stream_spool_bytes, timeout=self.config.gpg_timeout)
+            try:
+                with self.stage("decrypt"):
+                    name = stream.open()
+            except (OSError, ZipStreamError) as exc:
+                stream.close()
+                self.log(f"WARN: streaming decrypt failed for {path} ({exc}); posting the file as-is")
+            else:
+                self.log(f"Decoding PGP ZIP file: {path} -> member {name}")
+                return os.path.basename(name), stream, stream
+        return os.path.basename(path), _iter_file(path), None
+
+    def _upload_droplet(self, file_name: str, chunks: Any, esiid: str, meter: str, captured_at: str) -> str:
+        """Streamed multipart POST to the droplet upload server. Returns the file outcome."""
+        boundary = "smt-ingest-" + os.urandom(12).hex()
+        fields = {
+            "esiid": esiid,
+            "meter": meter,
+            "accountKey": "intelliwatt-smt-ingest",
+            "role": "smt-ingest",
+            "capturedAt": captured_at,
+        }
+        try:
+            with self.stage("upload"):
+                resp = self._http.post(
+                    self.config.upload_url,
+                    data=multipart_body(fields, "file", file_name, chunks, boundary),
+                    headers={"content-type": f"multipart/form-data; boundary={boundary}"},
+                    timeout=(30, 300),
+                )
+        except (requests.RequestException, ZipStreamError, OSError) as exc:
+            self.log(f"Droplet upload failed (000): {exc!r}")
+            return "failed"
+        try:
+            body: Any = resp.json()
+        except ValueError:
+            body = None
+        if resp.status_code in UPLOAD_OK_STATUSES:
+            summary = body.get("message", body) if isinstance(body, dict) else resp.text[:1000]
+            self.log(f"Droplet upload success ({resp.status_code}): {json.dumps(summary, separators=(',', ':'))}")
+            outcome = handled_outcome(body)
+            if outcome:
+                return outcome
+            self.log(f"INFO: Not marking as posted (response={resp.text[:500]})")
+            return "not_marked"
+        if resp.status_code == 429:
+            return self._rate_limited("Droplet upload", body)
+        self.log(f"Droplet upload failed ({resp.status_code}): {resp.text[:1000]}")
+        return "failed"
+
+    def _rate_limited(self, what: str, body: Any) -> str:
+        self.rate_limit_reset = body.get("resetAt") if isinstance(body, dict) else None
+        self.log(
+            f"{what} failed (rate limited 429); stopping this run. "
+            f"resetAt={self.rate_limit_reset or 'unknown'}"
+        )
+        self.rate_limited = True
+        return "rate_limited"
+
+    def _delta(self, batches: List[smt_intervals.DayBatch]) -> List[smt_intervals.DayBatch]:
+        """
+        Day batches to ship: those past the series' acknowledged watermark, plus
+        older days whose content differs from what the app acknowledged.
+        """
+        marks: Dict[Tuple[str, str], Optional[int]] = {}
+        acked: Dict[Tuple[str, str], Dict[int, str]] = {}
+        ship: List[smt_intervals.DayBatch] = []
+        newer = changed = unchanged = 0
+        for batch in batches:
+            key = (batch.esiid, batch.meter)
+            if key not in marks:
+                marks[key] = self.ledger.watermark(*key)
+                acked[key] = self.ledger.acked_days(*key)
+            mark = marks[key]
+            if mark is None or batch.last_ts > mark:
+                newer += 1
+            elif acked[key].get(batch.day) != smt_intervals.batch_digest(batch.packed):
+                changed += 1
+            else:
+                unchanged += 1
+                continue
+            ship.append(batch)
+        self.log(f"Interval delta: newer={newer} changed={changed} unchanged={unchanged} day(s)")
+        self.metrics.inc(DAYS_METRIC, newer + changed, outcome="shipped")
+        self.metrics.inc(DAYS_METRIC, unchanged, outcome="unchanged")
+        return ship
+
+    def _upload_batches(
+        self, item: Dict[str, Any], file_name: str, chunks: Any, esiid: str, meter: str, force: bool
+    ) -> Tuple[str, int, Optional[smt_intervals.IntervalColumns]]:
+        """
+        Parse an interval CSV on the droplet and POST the days the app does not
+        have yet as packed per-ESIID/day batches: runs of consecutive days, at
+        most SMT_BATCH_DAYS_PER_POST per request, the last asking for post-ingest.
+        forceRepost ships every day. Returns (outcome, bytes posted, intervals);
+        "unparsed" means no intervals came out and the file should go up as-is.
+        """
+        try:
+            with self.stage("parse"):
+                parsed = smt_intervals.parse_interval_csv(chunks, default_esiid=esiid, default_meter=meter)
+        except (ZipStreamError, OSError, csv.Error) as exc:
+            self.log(f"Interval parse failed for {file_name}: {exc!r}")
+            return "failed", 0, None
+        with self.stage("resolve"):
+            # Backfills ask SMT for every version; keep one authoritative read per slot.
+            resolved = smt_intervals.resolve_latest(parsed)
+            batches = list(smt_intervals.pack_day_batches(resolved))
+        self.metrics.inc(DUPLICATES_METRIC, resolved.stats["duplicatesCollapsed"])
+        stats = json.dumps(resolved.stats, separators=(",", ":"))
+        if not batches:
+            self.log(f"WARN: no intervals parsed from {file_name} stats={stats}")
+            return "unparsed", 0, None
+        self.log(f"Parsed {file_name}: intervals={len(resolved)} days={len(batches)} stats={stats}")
+        if not force:
+            batches = self._delta(batches)
+            if not batches:
+                self.log(f"No new or changed intervals in {file_name}; nothing to upload")
+                return "duplicate", 0, resolved
+        outcome, sent = self._post_batches(file_name, item["sha256"], batches)
+        return outcome, sent, resolved if outcome == "posted" else None
+
+    def _post_batches(
+        self, file_name: str, sha256: Optional[str], batches: List[smt_intervals.DayBatch]
+    ) -> Tuple[str, int]:
+        """POST day batches as runs of consecutive days, the last asking for post-ingest. Returns (outcome, bytes)."""
+        sent = 0
+        runs = list(smt_intervals.contiguous_runs(batches, self.config.batch_days))
+        for index, run in enumerate(runs):
+            body_bytes = b"".join(batch.packed for batch in run)
+            try:
+                with self.stage("upload"):
+                    resp = self._http.post(
+                        self.config.batch_url,
+                        params={
+                            "filename": file_name,
+                            "sha256": sha256,
+                            "source": self.config.source_tag,
+                            "final": "1" if index == len(runs) - 1 else "0",
+                        },
+                        data=body_bytes,
+                        headers={"x-admin-token": self.config.admin_token, "content-type": "application/octet-stream"},
+                        timeout=(30, 300),
+                    )
+            except requests.RequestException as exc:
+                self.log(f"Interval batch upload failed (000): {exc!r}")
+                return "failed", sent
+            try:
+                body: Any = resp.json()
+            except ValueError:
+                body = None
+            if resp.status_code == 429:
+                return self._rate_limited("Interval batch upload", body), sent
+            if resp.status_code not in UPLOAD_OK_STATUSES or not (isinstance(body, dict) and body.get("ok") is True):
+                self.log(f"Interval batch upload failed ({resp.status_code}): {resp.text[:1000]}")
+                return "failed", sent
+            sent += len(body_bytes)
+            summary = body.get("normalizedInline", body)
+            self.log(f"Interval batch upload success ({resp.status_code}): {json.dumps(summary, separators=(',', ':'))}")
+            watermarks = acked_watermarks(body)
+            if watermarks:
+                self.ledger.acknowledge(run, watermarks)
+            else:
+                self.log("INFO: response carried no interval watermarks; delta state not advanced")
+        return "posted", sent
+
+    def _upload_inline(self, file_name: str, chunks: Any, esiid: str, meter: str, captured_at: str) -> bool:
+        """Legacy JSON POST to /api/admin/smt/pull (small test files only), then a normalize call."""
+        with self.stage("upload"):
+            try:
+                raw = b"".join(chunks)
+            except (ZipStreamError, OSError) as exc:
+                self.log(f"Inline POST failed (000): {exc!r}")
+                return False
+            gz = gzip.compress(raw)
+            payload = {
+                "mode": "inline",
+                "source": self.config.source_tag,
+                "filename": file_name,
+                "mime": "text/csv",
+                "encoding": "base64+gzip",
+                "sizeBytes": len(raw),
+                "compressedBytes": len(gz),
+                "esiid": esiid,
+                "meter": meter,
+                "captured_at": captured_at,
+                "content_b64": base64.b64encode(gz).decode("ascii"),
+            }
+            headers = {"x-admin-token": self.config.admin_token, "content-type": "application/json"}
+            try:
+                resp = self._http.post(
+                    f"{self.config.base_url}/api/admin/smt/pull",
+                    data=json.dumps(payload, separators=(",", ":")),
+                    headers=headers,
+                    timeout=(30, 300),
+                )
+            except requests.RequestException as exc:
+                self.log(f"Inline POST failed (000): {exc!r}")
+                return False
+        if resp.status_code not in (200, 201):
+            self.log(f"Inline POST failed ({resp.status_code}): {resp.text[:1000]}")
+            return False
+        self.log(f"Inline POST success ({resp.status_code}): {resp.text[:1000]}")
+        return True
+
+    def _normalize_inline(self, esiid: str) -> None:
+        url = f"{self.config.base_url}/api/admin/smt/normalize"
+        with self.stage("normalize"):
+            try:
+                resp = self._http.post(
+                    url,
+                    params={"esiid": esiid, "limit": 1, "purge": 1, "cleanup": 1},
+                    data="{}",
+                    headers={"x-admin-token": self.config.admin_token, "content-type": "application/json"},
+                    timeout=(30, 300),
+                )
+                self.log(f"Normalize ({esiid}) [legacy inline] -> http {resp.status_code}: {resp.text[:1000]}")
+            except requests.RequestException as exc:
+                self.log(f"Normalize ({esiid}) [legacy inline] -> http 000: {exc!r}")
+
+    def _send(
+        self, item: Dict[str, Any], esiid: str, meter: str, *, binary: bool, force: bool
+    ) -> Tuple[str, int, str, Optional[smt_intervals.IntervalColumns]]:
+        """
+        Open one file's payload and upload it. Returns (outcome, bytes sent,
+        route, intervals). Interval CSVs uploaded as files are also parsed on the
+        way through when the coverage index or archive is on, so their intervals
+        come back too.
+        """
+        path = item["path"]
+        captured_at = datetime.fromtimestamp(item["mtime"], tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        file_name, chunks, stream = self._open_payload(item)
+        interval_file = is_interval_csv(file_name)
+        sent = [0]
+        tee: List[Optional[smt_intervals.IntervalCsvParser]] = [None]
+        if (self.coverage is not None or self.archive is not None) and interval_file and not binary:
+            tee[0] = smt_intervals.IntervalCsvParser(default_esiid=esiid, default_meter=meter)
+
+        def _counted() -> Iterator[bytes]:
+            for chunk in chunks:
+                sent[0] += len(chunk)
+                if tee[0] is not None:
+                    try:
+                        tee[0].feed(chunk)
+                    except csv.Error as exc:
+                        self.log(f"WARN: coverage parse of {file_name} abandoned: {exc!r}")
+                        tee[0] = None
+                yield chunk
+
+        try:
+            if binary and interval_file:
+                outcome, posted_bytes, cols = self._upload_batches(item, file_name, chunks, esiid, meter, force)
+                return outcome, posted_bytes, "binary", cols
+            if self.config.upload_url:
+                outcome, route = self._upload_droplet(file_name, _counted(), esiid, meter, captured_at), "droplet"
+            else:
+                ok = self._upload_inline(file_name, _counted(), esiid, meter, captured_at)
+                outcome, route = ("posted" if ok else "failed"), "inline"
+            cols = None
+            if tee[0] is not None and outcome in PostedLedger.HANDLED_OUTCOMES:
+                try:
+                    cols = tee[0].close()
+                except csv.Error as exc:
+                    self.log(f"WARN: coverage parse of {file_name} abandoned: {exc!r}")
+            return outcome, sent[0], route, cols
+        finally:
+            if stream is not None:
+                gpg_rc = stream.close()
+                if gpg_rc:
+                    self.log(f"WARN: gpg exited rc={gpg_rc} for {path} (member CRC checked)")
+
+    def post_one(self, item: Dict[str, Any], esiid: str, force: bool) -> Tuple[bool, bool]:
+        """Upload one prepared file and record it in the ledger. Returns (handled, stop_run)."""
+        path = item["path"]
+        sha256 = item["sha256"]
+        if sha256 in self._posted_this_pass:
+            # An identical file earlier in this pass was just posted.
+            self.log(f"Skipping already-posted file: {path}")
+            self._count("skipped")
+            return False, False
+        entry = self.ledger.lookup(sha256)
+        if entry and entry["handled"]:
+            self.log(f"FORCE_REPOST enabled; reprocessing previously-posted file: {path}")
+
+        meter = meter_from_name(os.path.basename(path), self.config.meter_default)
+        binary = self.config.upload_format == "binary"
+        outcome, sent, route, cols = self._send(item, esiid, meter, binary=binary, force=force)
+        if outcome == "unparsed":
+            self.log(f"Posting {path} as a file instead so the app can diagnose it")
+            outcome, sent, route, cols = self._send(item, esiid, meter, binary=False, force=force)
+        self._count(outcome)
+        if outcome == "rate_limited":
+            return False, True
+        self.ledger.record(sha256, esiid, os.path.basename(path), item["size"], outcome)
+        posted = outcome in PostedLedger.HANDLED_OUTCOMES
+        if posted:
+            self._posted_this_pass.add(sha256)
+            self.metrics.inc(BYTES_METRIC, sent)
+            if cols is not None and self.coverage is not None:
+                with self.stage("coverage"):
+                    self.coverage.mark_columns(cols)
+            if cols is not None and self.archive is not None:
+                try:
+                    with self.stage("archive"):
+                        self.archive.write(cols)
+                except (OSError, ValueError) as exc:
+                    self.log(f"WARN: could not archive intervals from {path}: {exc!r}")
+
+        # Throttle between uploads to reduce load on the droplet/API.
+        time.sleep(self.config.upload_delay)
+        if posted and route == "inline":
+            # Only the legacy inline path needs the follow-up normalize; raw-upload normalizes inline.
+            self._normalize_inline(esiid)
+        return posted, False
+
+    def _log_skip(self, item: Dict[str, Any], esiid: str, force: bool) -> None:
+        entry = self.ledger.lookup(item["sha256"]) or {}
+        if force:
+            self.log(
+                f"Skipping file posted for ESIID={entry.get('esiid')} (forceRepost applies to {esiid} only): {item['path']}"
+            )
+        else:
+            self.log(f"Skipping already-posted file: {item['path']}")
+        self._count("skipped")
+
+    # -- passes ----------------------------------------------------------------
+
+    def run_pass(self, esiid: str, force: bool) -> None:
+        self._posted_this_pass = set()
+        with self.stage("discover"):
+            files = discover_files(self.config.local_dir)
+        if not files:
+            self.log("No CSV files discovered; exiting")
+            return
+        self.log(f"Discovered {len(files)} file(s) for ESIID={esiid} forceRepost={force}")
+
+        # Keep a bounded window of files hashed ahead of the uploader. Decrypt
+        # and unzip are pipelined into each upload, so nothing lands on disk.
+        window = self.config.workers * 2
+        pending: List[Future] = []
+        next_index = 0
+        with ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix="smt-ingest") as pool:
+            try:
+                while next_index < len(files) or pending:
+                    while next_index < len(files) and len(pending) < window:
+                        pending.append(pool.submit(self.prepare, files[next_index], esiid, force))
+                        next_index += 1
+                    future = pending.pop(0)
+                    try:
+                        item = future.result()
+                    except OSError as exc:
+                        self.log(f"WARN: could not read inbox file: {exc!r}")
+                        self._count("failed")
+                        continue
+                    if item["skip"]:
+                        self._log_skip(item, esiid, force)
+                        continue
+                    posted, stop = self.post_one(item, esiid, force)
+                    if stop:
+                        break
+                    if posted and self.config.process_one:
+                        self.log("PROCESS_ONE_FILE=true; stopping after first successful upload/normalize")
+                        break
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def run_ingest(
+    targets: List[Dict[str, Any]],
+    log: LogFn,
+    metrics: Any = None,
+    *,
+    config: Optional[IngestConfig] = None,
+    skip_sftp: bool = False,
+) -> int:
+    """
+    Run one ingest job and return a script-style exit code (0 ok, 1 misconfigured).
+
+    `targets` is the queue payload's list of {"esiid", "forceRepost"}. The SFTP
+    sync runs once, then each ESIID gets its own pass over the synced inbox, as
+    the coalesced fetch_and_post.sh invocation does.
+    """
+    config = config or IngestConfig.from_env()
+    problems = config.missing(need_sftp=not skip_sftp)
+    if problems:
+        log(f"Missing {', '.join(problems)}")
+        return 1
+    run = IngestRun(config, log, metrics)
+    started = time.monotonic()
+    os.makedirs(config.local_dir, exist_ok=True)
+    if config.upload_format == "binary":
+        log(f"INFO: Posting interval CSVs as packed batches to {config.batch_url}")
+    if config.upload_url:
+        log(f"INFO: Using droplet upload server at {config.upload_url}")
+    else:
+        log("WARN: SMT_UPLOAD_URL not configured; will attempt legacy inline POST (not recommended for large files)")
+    clean_stale_tmp_dirs(config.local_dir)
+    run.ledger = PostedLedger(config.ledger_file(), os.path.join(config.local_dir, SEEN_FILE_NAME))
+    if config.archive:
+        run.archive = smt_archive.IntervalArchive(config.archive_dir)
+    if config.coverage_index:
+        run.coverage = smt_coverage.CoverageStore(
+            config.ledger_file(), retention_days=config.ledger_retention_days or 400.0
+        )
+
+    if skip_sftp:
+        log(f"SMT_SKIP_SFTP=true; using files already in {config.local_dir}")
+    else:
+        run.sftp_sync()
+
+    try:
+        for target in targets:
+            esiid = str(target.get("esiid") or "").strip()
+            if not esiid:
+                log("WARN: ingest target without ESIID; skipping (ESIID must come from app, not filename/CSV)")
+                continue
+            run.run_pass(esiid, bool(target.get("forceRepost")))
+            if run.rate_limited:
+                log(
+                    "Run halted early due to upload rate limit. Will retry on next scheduled run "
+                    f"after reset={run.rate_limit_reset or 'unknown'}"
+                )
+                break
+        removed = run.ledger.compact(config.ledger_retention_days * 86400)
+        if removed is not None:
+            log(f"Posted-file ledger compacted: removed={removed} entries={run.ledger.counts()}")
+    finally:
+        run.ledger.close()
+        if run.coverage is not None:
+            run.coverage.close()
+
+    stages = " ".join(f"{name}={seconds:.2f}s" for name, seconds in sorted(run.stage_seconds.items()))
+    counts = " ".join(f"{name}={n}" for name, n in sorted(run.counts.items()))
+    log(f"Ingest run complete in {time.monotonic() - started:.2f}s files[{counts}] stages[{stages}]")
+    return 0
+
+
+def repost_archive(
+    esiid: str,
+    start_day: int,
+    end_day: int,
+    log: LogFn,
+    metrics: Any = None,
+    *,
+    config: Optional[IngestConfig] = None,
+) -> int:
+    """
+    Send archived intervals for Chicago days [start_day, end_day] back to the
+    app as packed batches, every day regardless of delta state. Returns 0 when
+    every request was accepted (or nothing was archived), 1 otherwise.
+    """
+    config = config or IngestConfig.from_env()
+    if not config.admin_token or not config.base_url:
+        log("Missing env ADMIN_TOKEN or INTELLIWATT_BASE_URL")
+        return 1
+    run = IngestRun(config, log, metrics)
+    started = time.monotonic()
+    archive = smt_archive.IntervalArchive(config.archive_dir)
+    window = f"{smt_intervals.format_day(start_day)}-{smt_intervals.format_day(end_day)}"
+    try:
+        with run.stage("archive_read"):
+            cols = archive.read(
+                esiid, smt_intervals.chicago_day_start(start_day), smt_intervals.chicago_day_start(end_day + 1)
+            )
+            batches = list(smt_intervals.pack_day_batches(cols))
+    except (OSError, ValueError) as exc:
+        log(f"ERROR: could not read archive for ESIID={esiid} {window}: {exc!r}")
+        return 1
+    if not batches:
+        log(f"No archived intervals for ESIID={esiid} {window}; nothing to repost")
+        return 0
+    log(f"Reposting {len(cols)} archived interval(s) over {len(batches)} day(s) for ESIID={esiid} {window}")
+    run.ledger = PostedLedger(config.ledger_file(), os.path.join(config.local_dir, SEEN_FILE_NAME))
+    try:
+        file_name = f"archive_{esiid}_{smt_intervals.format_day(start_day)}_{smt_intervals.format_day(end_day)}"
+        outcome, sent = run._post_batches(file_name.replace("/", ""), None, batches)
+    finally:
+        run.ledger.close()
+    run.metrics.inc(BYTES_METRIC, sent)
+    log(f"Archive repost {outcome} in {time.monotonic() - started:.2f}s bytes={sent}")
+    return 0 if outcome == "posted" else 1
@@ -0,0 +1,555 @@
+"""
+IntervalMeterUsage CSV -> compact interval columns, and the packed batch format.
+
+The droplet parses SMT interval CSVs itself so the app never has to: rows are
+read from the same byte chunks the upload path streams (decrypt -> ZIP member ->
+here), and land in stdlib `array` columns (series index, UTC slot start, kWh,
+revision time, flags) instead of one dict per row. Parsing mirrors the app's
+normalizeSmtIntervals (app/lib/smt/normalize.ts + lib/smt/parseCsv.ts): the
+same header-fragment matching, the same America/Chicago DST rule, the same
+interval-end handling. Duplicate reads of a slot (backfills request every
+version) are collapsed by `resolve_latest` before anything is packed.
+
+`pack_day_batches` turns resolved columns into the binary batches that
+/api/admin/smt/interval-batch decodes (lib/smt/intervalBatch.ts), one batch
+per ESIID/meter and Chicago calendar day. Layout, little-endian:
+
+    magic "SMTB" | version u8 | esiid len u8 + ascii | meter len u8 + ascii
+    | chicago day i32 (days since 1970-01-01) | base ts i64 (UTC epoch s)
+    | count u16 | count x (minute offset u16, kWh*1000 i32, flags u8)
+"""
+
+import codecs
+import csv
+import hashlib
+import re
+import struct
+from array import array
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+BATCH_MAGIC = b"SMTB"
+BATCH_VERSION = 1
+FLAG_ESTIMATED = 0x01
+FLAG_GENERATION = 0x02
+# Parse-time only: the slot start came from an interval-end column.
+_FLAG_FROM_END = 0x80
+
+_HEADER = struct.Struct("<4sB")
+_DAY_HEADER = struct.Struct("<iqH")
+_RECORD = struct.Struct("<HiB")
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_CST = 6 * 3600
+_CDT = 5 * 3600
+
+_ESIID = (["esiid", "esi"], ())
+_METER = (["meter", "meternumber", "meterid", "meter_id"], ())
+_USAGE_DATE = (["usagedate", "readdate", "readdt", "readingdate", "date"], ())
+_START = (
+    ["intervalstartdatetime", "startdatetime", "intervalstarttime", "starttime",
+     "intervalstart", "start", "intervalstartdate", "startdate"],
+    (),
+)
+_END = (
+    ["intervalenddatetime", "enddatetime", "intervalendtime", "endtime",
+     "intervalend", "end", "intervalenddate", "enddate"],
+    (),
+)
+_SINGLE = (["datetimecst", "datetimecdt", "datetimect", "datetime", "date/time", "datetimestamp"], ())
+_KWH = (["usagekwh", "consumptionkwh", "kwh", "kwhusage", "usage"], ("type",))
+_REVISION = (["revisiondate", "revisiondatetime", "revision"], ())
+_QUALITY = (["estimatedactual", "actualestimated", "readtype", "estimated", "quality"], ())
+_DIRECTION = (["consumptiongeneration", "generation", "flowdirection"], ())
+
+_SANITIZE_RE = re.compile(r"[\s/_().\-:]")
+_LOCAL_RE = re.compile(
+    r"^(\d{1,2})[/\-](\d{1,2})[/\-](\d{2,4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*(AM|PM)?",
+    re.IGNORECASE,
+)
+_TZ_RE = re.compile(r"\b(CDT|CST|CT)\b", re.IGNORECASE)
+_TZ_SUFFIX_RE = re.compile(r"\s+(CST|CDT|CT)$", re.IGNORECASE)
+_CLOCK_RE = re.compile(r"\b\d{1,2}:\d{2}\b")
+_DATE_ONLY_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+
+def _sanitize_key(key: str) -> str:
+    return _SANITIZE_RE.sub("", key.lower()).strip()
+
+
+def _nth_sunday(year: int, month: int, n: int) -> int:
+    first_weekday = date(year, month, 1).weekday()  # Monday=0 .. Sunday=6
+    return 1 + (6 - first_weekday) % 7 + (n - 1) * 7
+
+
+_day_cache: Dict[Tuple[int, int, int], Tuple[int, int]] = {}
+
+
+def _day_info(year: int, month: int, day: int) -> Tuple[int, int]:
+    """
+    (days since epoch, DST kind) for a Chicago calendar day. Kind: 0 standard,
+    1 daylight, 2 spring-forward day (DST from 02:00), 3 fall-back day (DST before 02:00).
+    """
+    key = (year, month, day)
+    info = _day_cache.get(key)
+    if info is None:
+        days = date(year, month, day).toordinal() - _EPOCH_ORDINAL
+        if month < 3 or month > 11:
+            kind = 0
+        elif 3 < month < 11:
+            kind = 1
+        elif month == 3:
+            start = _nth_sunday(year, 3, 2)
+            kind = 0 if day < start else 1 if day > start else 2
+        else:
+            end = _nth_sunday(year, 11, 1)
+            kind = 1 if day < end else 0 if day > end else 3
+        info = _day_cache[key] = (days, kind)
+    return info
+
+
+def _is_dst(kind: int, minute_of_day: int) -> bool:
+    if kind == 2:
+        return minute_of_day >= 120
+    if kind == 3:
+        return minute_of_day < 120
+    return kind == 1
+
+
+def central_epoch(raw: Optional[str]) -> Optional[int]:
+    """UTC epoch seconds for an SMT America/Chicago local timestamp (parseCentralIso)."""
+    if not raw:
+        return None
+    value = raw.strip()
+    if not value:
+        return None
+    normalized = _TZ_SUFFIX_RE.sub("", value).replace("T", " ").strip()
+    match = _LOCAL_RE.match(normalized)
+    if match:
+        m_str, d_str, y_str, h_str, min_str, s_str, ampm = match.groups()
+        year = int("20" + y_str if len(y_str) == 2 else y_str)
+        hour = int(h_str)
+        minute = int(min_str)
+        if ampm:
+            upper = ampm.upper()
+            if upper == "PM" and hour < 12:
+                hour += 12
+            if upper == "AM" and hour == 12:
+                hour = 0
+        try:
+            days, kind = _day_info(year, int(m_str), int(d_str))
+        except ValueError:
+            return None
+        suffix = _TZ_RE.search(value)
+        zone = suffix.group(1).upper() if suffix else None
+        dst = True if zone == "CDT" else False if zone == "CST" else _is_dst(kind, hour * 60 + minute)
+        local = days * 86400 + hour * 3600 + minute * 60 + int(s_str or 0)
+        return local + (_CDT if dst else _CST)
+    # Fallback: what `new Date(value)` accepts on the (UTC) server: a bare
+    # MM/DD/YYYY date, or ISO with a zone-less value read as UTC.
+    date_only = _DATE_ONLY_RE.match(value)
+    if date_only:
+        try:
+            day = date(int(date_only.group(3)), int(date_only.group(1)), int(date_only.group(2)))
+        except ValueError:
+            return None
+        return (day.toordinal() - _EPOCH_ORDINAL) * 86400
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+_dst_cache: Dict[int, Tuple[int, int]] = {}
+
+
+def _dst_bounds(year: int) -> Tuple[int, int]:
+    """UTC epochs where DST starts (02:00 CST, 2nd Sunday of March) and ends (02:00 CDT, 1st Sunday of November)."""
+    bounds = _dst_cache.get(year)
+    if bounds is None:
+        start = date(year, 3, _nth_sunday(year, 3, 2)).toordinal() - _EPOCH_ORDINAL
+        end = date(year, 11, _nth_sunday(year, 11, 1)).toordinal() - _EPOCH_ORDINAL
+        bounds = _dst_cache[year] = (start * 86400 + 2 * 3600 + _CST, end * 86400 + 2 * 3600 + _CDT)
+    return bounds
+
+
+def chicago_local(epoch: int) -> int:
+    """America/Chicago wall-clock seconds since 1970-01-01 for a UTC epoch."""
+    year = date.fromordinal((epoch - _CST) // 86400 + _EPOCH_ORDINAL).year
+    start, end = _dst_bounds(year)
+    return epoch - (_CDT if start <= epoch < end else _CST)
+
+
+def chicago_day(epoch: int) -> int:
+    """America/Chicago calendar day (days since 1970-01-01) for a UTC epoch."""
+    return chicago_local(epoch) // 86400
+
+
+def chicago_day_start(day: int) -> int:
+    """UTC epoch of 00:00 America/Chicago on a Chicago day (days since 1970-01-01)."""
+    d = date.fromordinal(day + _EPOCH_ORDINAL)
+    return day * 86400 + (_CDT if _is_dst(_day_info(d.year, d.month, d.day)[1], 0) else _CST)
+
+
+def format_day(day: int) -> str:
+    """MM/DD/YYYY (SMT's request date format) for a day number."""
+    return date.fromordinal(day + _EPOCH_ORDINAL).strftime("%m/%d/%Y")
+
+
+def parse_day(value: str) -> int:
+    """Day number for an MM/DD/YYYY or YYYY-MM-DD date; ValueError otherwise."""
+    fmt = "%Y-%m-%d" if "-" in value else "%m/%d/%Y"
+    return datetime.strptime(value.strip(), fmt).date().toordinal() - _EPOCH_ORDINAL
+
+
+def _has_clock(value: str) -> bool:
+    return bool(_CLOCK_RE.search(value))
+
+
+def _parse_kwh(raw: Optional[str]) -> Optional[float]:
+    if raw is None:
+        return None
+    try:
+        value = float(raw.replace(",", ""))
+    except ValueError:
+        return None
+    return value if value == value and value not in (float("inf"), float("-inf")) else None
+
+
+class _Columns:
+    """Header resolution for one CSV: each field's candidate column indexes, in priority order."""
+
+    def __init__(self, header: List[str]):
+        self.width = len(header)
+        keys = [_sanitize_key(h) for h in header]
+
+        def resolve(spec: Tuple[List[str], Tuple[str, ...]]) -> List[int]:
+            fragments, reject = spec
+            found: List[int] = []
+            for fragment in fragments:
+                if fragment in keys:
+                    found.append(keys.index(fragment))
+            for fragment in fragments:
+                for idx, key in enumerate(keys):
+                    if fragment in key and not any(bad in key for bad in reject):
+                        found.append(idx)
+                        break
+            return list(dict.fromkeys(found))
+
+        self.esiid = resolve(_ESIID)
+        self.meter = resolve(_METER)
+        self.usage_date = resolve(_USAGE_DATE)
+        self.start = resolve(_START)
+        self.end = resolve(_END)
+        self.single = resolve(_SINGLE)
+        self.kwh = resolve(_KWH)
+        self.revision = resolve(_REVISION)
+        self.quality = resolve(_QUALITY)
+        self.direction = resolve(_DIRECTION)
+
+
+def _first(row: List[str], candidates: List[int]) -> Optional[str]:
+    for idx in candidates:
+        if idx < len(row):
+            value = row[idx].strip()
+            if value:
+                return value
+    return None
+
+
+class IntervalColumns:
+    """
+    Parsed intervals as parallel arrays. `series` indexes `series_keys`
+    ((esiid, meter) pairs); `start` and `revision` are UTC epoch seconds
+    (revision 0 when the file has none); `flags` carries FLAG_* bits.
+    """
+
+    def __init__(self) -> None:
+        self.series_keys: List[Tuple[str, str]] = []
+        self._series_index: Dict[Tuple[str, str], int] = {}
+        self.series = array("H")
+        self.start = array("q")
+        self.kwh = array("d")
+        self.revision = array("q")
+        self.flags = array("B")
+        self.stats: Dict[str, Any] = {
+            "totalRows": 0,
+            "invalidEsiid": 0,
+            "invalidTimestamp": 0,
+            "invalidKwh": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def series_id(self, esiid: str, meter: str) -> int:
+        key = (esiid, meter)
+        idx = self._series_index.get(key)
+        if idx is None:
+            idx = self._series_index[key] = len(self.series_keys)
+            self.series_keys.append(key)
+        return idx
+
+    def append(self, series: int, start: int, kwh: float, revision: int, flags: int) -> None:
+        self.series.append(series)
+        self.start.append(start)
+        self.kwh.append(kwh)
+        self.revision.append(revision)
+        self.flags.append(flags)
+
+    def take(self, order: Iterable[int]) -> "IntervalColumns":
+        """A new IntervalColumns holding the rows at `order`, in that order."""
+        out = IntervalColumns()
+        out.series_keys = list(self.series_keys)
+        out._series_index = dict(self._series_index)
+        out.stats = dict(self.stats)
+        for i in order:
+            out.append(self.series[i], self.start[i], self.kwh[i], self.revision[i], self.flags[i])
+        return out
+
+    def ts_range(self) -> Tuple[Optional[int], Optional[int]]:
+        if not self.start:
+            return None, None
+        return min(self.start), max(self.start)
+
+
+class IntervalCsvParser:
+    """
+    Incremental IntervalMeterUsage CSV parser: `feed` byte chunks as they
+    stream past (e.g. alongside an upload), then `close` for the columns.
+    One entry per data row with a kWh value (duplicates kept; see
+    resolve_latest). The CSV's ESIID wins over `default_esiid`, as in the app.
+    """
+
+    def __init__(self, *, default_esiid: Optional[str], default_meter: Optional[str]):
+        self.cols = IntervalColumns()
+        self._fallback_esiid = (default_esiid or "").strip().lstrip("'") or None
+        self._meter_fallback = (default_meter or "").strip() or "unknown"
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._tail = ""
+        # Complete lines still inside a quoted field that continues past them.
+        self._pending: List[str] = []
+        self._quotes = 0
+        self._spec: Optional[_Columns] = None
+        self._end_min: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> None:
+        lines = (self._tail + self._decoder.decode(chunk)).splitlines(keepends=True)
+        # Hold back an unterminated line, and a bare "\r" that may be half of "\r\n".
+        if lines and (not lines[-1].endswith(("\n", "\r")) or lines[-1].endswith("\r")):
+            self._tail = lines.pop()
+        else:
+            self._tail = ""
+        self._take_lines(lines)
+
+    def _take_lines(self, lines: List[str]) -> None:
+        # Hand csv.reader whole records only: cut where the running quote count is even.
+        pending = self._pending
+        quotes = self._quotes
+        cut = len(pending) if quotes % 2 == 0 else -1
+        pending.extend(lines)
+        for i in range(len(pending) - len(lines), len(pending)):
+            quotes += pending[i].count('"')
+            if quotes % 2 == 0:
+                cut = i + 1
+        if cut > 0:
+            for row in csv.reader(pending[:cut]):
+                self._row(row)
+            del pending[:cut]
+            quotes = sum(line.count('"') for line in pending)
+        self._quotes = quotes
+
+    def _row(self, row: List[str]) -> None:
+        if not any(cell.strip() for cell in row):
+            return
+        spec = self._spec
+        if spec is None:
+            self._spec = _Columns(row)
+            return
+        kwh = _parse_kwh(_first(row, spec.kwh))
+        if kwh is None:
+            return
+        cols = self.cols
+        stats = cols.stats
+        stats["totalRows"] += 1
+
+        usage_date = _first(row, spec.usage_date)
+        start = _first(row, spec.start)
+        end = _first(row, spec.end)
+        single = _first(row, spec.single)
+        start_local = f"{usage_date} {start}" if start and usage_date else start
+        end_local = f"{usage_date} {end}" if end and usage_date else end
+        single_local = single or (f"{usage_date} {start or end}" if usage_date and (start or end) else None)
+
+        flags = 0
+        if start_local and _has_clock(start_local):
+            ts = central_epoch(start_local)
+        elif end_local and _has_clock(end_local):
+            ts = central_epoch(end_local)
+            if ts is not None:
+                flags |= _FLAG_FROM_END
+                self._end_min = ts if self._end_min is None else min(self._end_min, ts)
+        elif single_local and _has_clock(single_local):
+            ts = central_epoch(single_local)
+        else:
+            ts = None
+            for candidate in (start_local, end_local, single_local):
+                if candidate:
+                    ts = central_epoch(candidate)
+                    if ts is not None:
+                        break
+        if ts is None:
+            stats["invalidTimestamp"] += 1
+            return
+
+        esiid = (_first(row, spec.esiid) or "").lstrip("'") or self._fallback_esiid
+        if not esiid:
+            stats["invalidEsiid"] += 1
+            return
+        meter = _first(row, spec.meter) or self._meter_fallback
+
+        quality = (_first(row, spec.quality) or "").upper()
+        if quality.startswith("E"):
+            flags |= FLAG_ESTIMATED
+        if (_first(row, spec.direction) or "").upper().startswith("G"):
+            flags |= FLAG_GENERATION
+        revision = central_epoch(_first(row, spec.revision)) or 0
+
+        cols.append(cols.series_id(esiid, meter), ts, kwh, revision, flags)
+
+    def close(self) -> IntervalColumns:
+        tail = self._tail + self._decoder.decode(b"", final=True)
+        self._tail = ""
+        self._take_lines([tail] if tail else [])
+        if self._pending:
+            # Unbalanced quote at end of file: let csv.reader make what it can of it.
+            for row in csv.reader(self._pending):
+                self._row(row)
+            self._pending = []
+
+        # Interval-end columns label either the period start (first slot at 00:00
+        # local) or its end (first slot at 00:15); shift the latter back one slot.
+        cols = self.cols
+        end_min = self._end_min
+        shift = 0 if end_min is not None and chicago_local(end_min) // 60 % 1440 == 0 else 900
+        flags_col = cols.flags
+        start_col = cols.start
+        for i in range(len(flags_col)):
+            if flags_col[i] & _FLAG_FROM_END:
+                start_col[i] -= shift
+                flags_col[i] &= ~_FLAG_FROM_END & 0xFF
+        return cols
+
+
+def parse_interval_csv(
+    chunks: Iterable[bytes],
+    *,
+    default_esiid: Optional[str],
+    default_meter: Optional[str],
+) -> IntervalColumns:
+    """IntervalCsvParser over an iterable of byte chunks."""
+    parser = IntervalCsvParser(default_esiid=default_esiid, default_meter=default_meter)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def resolve_latest(cols: IntervalColumns) -> IntervalColumns:
+    """
+    One row per (series, slot), sorted by (series, start): the authoritative
+    read among duplicates. Latest revision wins, then actual over estimated,
+    then the later row in the file. One sort, then one pass keeping the last
+    row of each slot's run. Adds duplicatesCollapsed / estimatedSuperseded to
+    the stats.
+    """
+    series, start, revision, flags = cols.series, cols.start, cols.revision, cols.flags
+    keys = [
+        (series[i], start[i], revision[i], not flags[i] & FLAG_ESTIMATED, i)
+        for i in range(len(cols))
+    ]
+    keys.sort()
+    keep: List[int] = []
+    superseded = 0
+    for k, key in enumerate(keys):
+        if k + 1 < len(keys) and keys[k + 1][:2] == key[:2]:
+            continue
+        keep.append(key[4])
+        if key[3] and k > 0 and keys[k - 1][:2] == key[:2] and not keys[k - 1][3]:
+            superseded += 1
+    resolved = cols.take(keep)
+    resolved.stats["processedRows"] = len(resolved)
+    resolved.stats["duplicatesCollapsed"] = len(cols) - len(resolved)
+    resolved.stats["estimatedSuperseded"] = superseded
+    return resolved
+
+
+def iter_day_groups(cols: IntervalColumns) -> Iterator[Tuple[int, int, int, int]]:
+    """(series, chicago day, first row, end row) runs of columns sorted by (series, start)."""
+    n = len(cols)
+    i = 0
+    while i < n:
+        series = cols.series[i]
+        day = chicago_day(cols.start[i])
+        j = i + 1
+        while j < n and cols.series[j] == series and chicago_day(cols.start[j]) == day:
+            j += 1
+        yield series, day, i, j
+        i = j
+
+
+def _short_ascii(value: str) -> bytes:
+    raw = value.encode("ascii", "replace")[:255]
+    return bytes([len(raw)]) + raw
+
+
+class DayBatch(NamedTuple):
+    esiid: str
+    meter: str
+    day: int
+    first_ts: int
+    last_ts: int
+    packed: bytes
+
+
+def pack_day_batches(cols: IntervalColumns) -> Iterator[DayBatch]:
+    """One packed DayBatch per (series, Chicago day) of resolved, sorted columns."""
+    for series, day, i, j in iter_day_groups(cols):
+        esiid, meter = cols.series_keys[series]
+        base = cols.start[i]
+        parts = [
+            _HEADER.pack(BATCH_MAGIC, BATCH_VERSION),
+            _short_ascii(esiid),
+            _short_ascii(meter),
+            _DAY_HEADER.pack(day, base, j - i),
+        ]
+        for k in range(i, j):
+            parts.append(
+                _RECORD.pack((cols.start[k] - base) // 60, int(round(cols.kwh[k] * 1000)), cols.flags[k])
+            )
+        yield DayBatch(esiid, meter, day, base, cols.start[j - 1], b"".join(parts))
+
+
+def batch_digest(packed: bytes) -> str:
+    """Content digest of one packed day batch (slots, kWh and flags), for change detection."""
+    return hashlib.blake2b(packed, digest_size=12).hexdigest()
+
+
+def contiguous_runs(batches: Iterable[DayBatch], limit: int) -> Iterator[List[DayBatch]]:
+    """
+    Split sorted day batches into runs of at most `limit` consecutive days of one
+    ESIID/meter. The app replaces each series' whole [first, last] range per
+    request, so a request must never span a day it does not carry.
+    """
+    run: List[DayBatch] = []
+    for batch in batches:
+        if run:
+            prev = run[-1]
+            if len(run) >= limit or (batch.esiid, batch.meter) != (prev.esiid, prev.meter) or batch.day != prev.day + 1:
+                yield run
+                run = []
+        run.append(batch)
+    if run:
+        yield run
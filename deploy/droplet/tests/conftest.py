@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The droplet modules run as top-level scripts next to each other, not as a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# webhook_server opens its job queue at import; keep it off /home/deploy.
+os.environ.setdefault("WEBHOOK_JOB_DB", os.path.join(tempfile.mkdtemp(prefix="webhook-test-"), "jobs.sqlite3"))
@@ -0,0 +1,8 @@
+import webhook_server
+
+
+def test_archive_repost_accepts_only_archive_safe_esiids():
+    assert webhook_server._archive_safe_esiid("10443720000000001")
+    assert not webhook_server._archive_safe_esiid("../1044")
+    assert not webhook_server._archive_safe_esiid("1044/x")
+    assert not webhook_server._archive_safe_esiid("")
@@ -0,0 +1,47 @@
+import json
+import logging
+
+import webhook_server
+
+
+class _Boom:
+    def __repr__(self):
+        raise AssertionError("rendered on the caller's thread")
+
+
+def _capture(monkeypatch):
+    records = []
+    monkeypatch.setattr(webhook_server.LOG_WRITER, "submit", records.append)
+    return records, webhook_server.AsyncLogHandler()
+
+
+def _record(level, msg, args):
+    return logging.LogRecord("root", level, __file__, 1, msg, args, None)
+
+
+def test_handler_defers_formatting_to_the_writer(monkeypatch):
+    records, handler = _capture(monkeypatch)
+    payload = {"esiid": "1044", "rows": [1, 2]}
+    handler.emit(_record(logging.INFO, "payload=%s boom=%s", (webhook_server.LazySnip(payload, limit=8000), _Boom())))
+    # Later changes by the caller do not leak into the queued record.
+    payload["esiid"] = "changed"
+    payload["extra"] = True
+
+    (fields,) = records
+    assert isinstance(fields["msg"], webhook_server.LogMessage)
+    fields["msg"].args = fields["msg"].args[:1] + ("ok",)
+    line = json.loads(webhook_server.LOG_WRITER._format(fields))
+    assert line["msg"] == 'payload={"esiid":"1044","rows":[1,2]} boom=ok'
+
+
+def test_handler_respects_webhook_log_level(monkeypatch):
+    records, handler = _capture(monkeypatch)
+    monkeypatch.setattr(webhook_server, "WEBHOOK_LOG_LEVEL", webhook_server.LOG_LEVELS["WARNING"])
+    handler.emit(_record(logging.INFO, "dropped %s", ("x",)))
+    handler.emit(_record(logging.ERROR, "kept %s", ("x",)))
+    assert [str(fields["msg"]) for fields in records] == ["kept x"]
+
+
+def test_log_message_survives_bad_format_args():
+    assert webhook_server.LogMessage("%d rows", ("many",)).render() == "%d rows ('many',)"
+    assert webhook_server.LogMessage("plain %s", ()).render() == "plain %s"
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+import webhook_server
+
+
+class _PlanRequest(webhook_server.H):
+    """Drives _handle_smt_backfill_plan without a socket: canned payload, captured reply."""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.replies = []
+
+    def _ensure_proxy_auth(self):
+        return True
+
+    def _read_json_payload(self, *, allow_empty):
+        return self.payload
+
+    def _write_json(self, status, payload):
+        self.replies.append((status, payload))
+
+
+def _plan(**payload):
+    request = _PlanRequest({"esiid": "1044", "dryRun": True, **payload})
+    request._handle_smt_backfill_plan()
+    (reply,) = request.replies
+    return reply
+
+
+def test_monthly_windows_newest_first_and_clipped():
+    assert webhook_server.plan_backfill_windows("01/15/2024", "03/10/2024") == [
+        ("03/01/2024", "03/10/2024"),
+        ("02/01/2024", "02/29/2024"),
+        ("01/15/2024", "01/31/2024"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "start, end, split",
+    [
+        ("01/15/2024", "03/10/2024", "monthly"),
+        ("12/01/2023", "01/31/2024", "monthly"),
+        ("01/01/2024", "01/31/2024", "weekly"),
+        ("01/01/2024", "01/28/2024", 7),
+        ("01/01/2024", "01/01/2024", 1),
+        ("01/01/2024", "12/31/2024", "30"),
+    ],
+)
+def test_window_count_matches_the_plan(start, end, split):
+    count = webhook_server.count_backfill_windows(start, end, split)
+    assert count == len(webhook_server.plan_backfill_windows(start, end, split))
+
+
+def test_plans_reaching_year_9999_do_not_overflow():
+    assert webhook_server.plan_backfill_windows("11/15/9999", "12/31/9999")[0] == ("12/01/9999", "12/31/9999")
+    assert webhook_server.plan_backfill_windows("12/25/9999", "12/31/9999", 5)[0] == ("12/30/9999", "12/31/9999")
+
+
+@pytest.mark.parametrize("value", [0, -1, 367, 10**20, 1.5, 7.0, True, "1.5", "fortnightly", None, [7]])
+def test_backfill_split_rejects_out_of_range_and_non_integers(value):
+    with pytest.raises(ValueError):
+        webhook_server.backfill_split(value)
+
+
+def test_backfill_split_accepts_names_ints_and_digit_strings():
+    assert webhook_server.backfill_split("monthly") == "monthly"
+    assert webhook_server.backfill_split("weekly") == "weekly"
+    assert webhook_server.backfill_split(366) == 366
+    assert webhook_server.backfill_split(" 14 ") == 14
+
+
+def test_huge_plan_is_rejected_before_any_window_is_built():
+    began = time.monotonic()
+    status, body = _plan(startDate="01/01/0001", endDate="12/30/9999", split=1)
+    assert (status, body["error"]) == (400, "plan_too_large")
+    assert time.monotonic() - began < 1
+
+
+def test_monthly_plan_ending_in_december_9999_is_not_a_500():
+    status, body = _plan(esiids=["1044"], startDate="11/01/9999", endDate="12/31/9999", split="monthly")
+    assert status == 200
+    assert body["windows"][0] == ("12/01/9999", "12/31/9999")
+
+
+@pytest.mark.parametrize("split", [10**20, 1.5, True, 0, 367, "x"])
+def test_bad_split_is_invalid_split(split):
+    status, body = _plan(startDate="01/01/2024", endDate="01/31/2024", split=split)
+    assert (status, body["error"]) == (400, "invalid_split")
+
+
+def test_bad_dates_are_invalid_window():
+    assert _plan(startDate="13/01/2024", endDate="01/31/2024")[1]["error"] == "invalid_window"
+    assert _plan(startDate="02/01/2024", endDate="01/31/2024")[1]["error"] == "invalid_window"
@@ -0,0 +1,20 @@
+import pytest
+
+import smt_intervals
+import webhook_server
+
+
+def test_coverage_window_parses_both_date_formats():
+    start, end = webhook_server.coverage_window("2024-08-01", "08/31/2024")
+    assert (start, end) == (smt_intervals.parse_day("08/01/2024"), smt_intervals.parse_day("08/31/2024"))
+
+
+@pytest.mark.parametrize("value", [20240801, 1.5, True, ["08/01/2024"], {"d": 1}, "not a date"])
+def test_coverage_window_rejects_non_date_values(value):
+    with pytest.raises(ValueError):
+        webhook_server.coverage_window(value, None)
+
+
+def test_coverage_window_rejects_reversed_window():
+    with pytest.raises(ValueError):
+        webhook_server.coverage_window("08/31/2024", "08/01/2024")
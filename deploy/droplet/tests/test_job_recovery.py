@@ -0,0 +1,107 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+import webhook_server
+
+
+@pytest.fixture
+def child():
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True)
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def _queue(**kwargs):
+    queue = webhook_server.DurableJobQueue(":memory:", {"smt_ingest": 1}, 50, 3, **kwargs)
+    queue.orphan_poll_seconds = 0.05
+    return queue
+
+
+def _running(queue, pid, identity, started_at=None):
+    queue._db.execute(
+        "INSERT INTO jobs (id, kind, priority, payload, state, enqueued_at, started_at, attempts, pid, pid_identity) "
+        "VALUES ('job-1', 'smt_ingest', 0, '{}', 'running', ?, ?, 1, ?, ?)",
+        (time.time(), started_at or time.time(), pid, identity),
+    )
+
+
+def _state(queue):
+    return queue.get("job-1")["state"]
+
+
+def _wait_for(queue, state, timeout=5.0):
+    end = time.monotonic() + timeout
+    while _state(queue) != state:
+        assert time.monotonic() < end, _state(queue)
+        time.sleep(0.02)
+
+
+def test_identity_is_stable_and_reports_gone_processes(child):
+    identity = webhook_server._pid_identity(child.pid)
+    assert identity and identity == webhook_server._pid_identity(child.pid)
+    assert identity != webhook_server._pid_identity(webhook_server.os.getpid())
+    child.kill()
+    child.wait()
+    assert webhook_server._pid_identity(child.pid) is None
+    assert webhook_server._pid_identity(None) is None
+
+
+def test_reused_pid_is_not_adopted(child):
+    queue = _queue()
+    # Same pid, but a different process than the one recorded (pid reuse / reboot).
+    _running(queue, child.pid, "another-boot:12345")
+    queue._recover()
+    job = queue.get("job-1")
+    assert (job["state"], job["pid"], job["pid_identity"]) == ("queued", None, None)
+    assert child.poll() is None
+
+
+def test_row_without_identity_is_requeued(child):
+    queue = _queue()
+    _running(queue, child.pid, None)
+    queue._recover()
+    assert _state(queue) == "queued"
+
+
+def test_matching_process_is_adopted_until_it_exits(child):
+    queue = _queue()
+    _running(queue, child.pid, webhook_server._pid_identity(child.pid))
+    queue._recover()
+    assert _state(queue) == "running"
+    child.kill()
+    child.wait()
+    _wait_for(queue, "exited")
+
+
+def test_overdue_orphan_is_stopped_and_requeued(child):
+    queue = _queue(orphan_max_seconds=60)
+    _running(queue, child.pid, webhook_server._pid_identity(child.pid), started_at=time.time() - 120)
+    queue._recover()
+    assert _state(queue) == "queued"
+    assert child.wait(timeout=5) != 0
+
+
+def test_adopted_orphan_is_stopped_at_the_cap(child):
+    queue = _queue(orphan_max_seconds=60)
+    _running(queue, child.pid, webhook_server._pid_identity(child.pid), started_at=time.time() - 59.7)
+    queue._recover()
+    assert _state(queue) == "running"
+    _wait_for(queue, "failed")
+    assert queue.get("job-1")["error"] == "orphan_timeout"
+    assert child.wait(timeout=5) != 0
+
+
+def test_old_database_gains_the_identity_column(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    db = webhook_server.sqlite3.connect(path)
+    db.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, priority INTEGER NOT NULL, "
+               "payload TEXT NOT NULL, state TEXT NOT NULL, enqueued_at REAL NOT NULL, started_at REAL, "
+               "finished_at REAL, attempts INTEGER NOT NULL DEFAULT 0, pid INTEGER, exit_code INTEGER, "
+               "log_path TEXT, error TEXT)")
+    db.close()
+    queue = webhook_server.DurableJobQueue(path, {}, 50, 3)
+    assert "pid_identity" in {col[1] for col in queue._db.execute("PRAGMA table_info(jobs)")}
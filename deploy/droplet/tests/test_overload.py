@@ -0,0 +1,113 @@
+import http.client
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import webhook_server
+
+RELEASE = threading.Event()
+STARTED = threading.Event()
+
+
+class _Blocked(BaseHTTPRequestHandler):
+    """Worker handler that holds its thread until the test releases it."""
+
+    def do_GET(self):
+        STARTED.set()
+        RELEASE.wait(10)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(webhook_server.BoundedThreadPoolHTTPServer):
+    overload_deadline = 1.0
+    overload_responders = 1
+    overload_backlog = 1
+
+
+@pytest.fixture
+def saturated():
+    """A server whose only worker is busy and whose hand-off queue is full."""
+    RELEASE.clear()
+    STARTED.clear()
+    srv = _Server(
+        ("127.0.0.1", 0), _Blocked, overload_handler_class=webhook_server.OverloadedH, workers=1, queue_size=1
+    )
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    held = [socket.create_connection(srv.server_address)]
+    held[0].sendall(b"GET /slow HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert STARTED.wait(5)
+    held.append(socket.create_connection(srv.server_address))
+    _wait(lambda: srv.work_queue.qsize() == 1)
+    yield srv
+    RELEASE.set()
+    for sock in held:
+        sock.close()
+    srv.shutdown()
+    srv.server_close()
+
+
+def _wait(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end
+        time.sleep(0.01)
+
+
+def _get(srv, path):
+    conn = http.client.HTTPConnection(*srv.server_address, timeout=5)
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    return resp.status, resp.read()
+
+
+def test_health_with_a_query_string_answers_200_under_overload(saturated):
+    assert _get(saturated, "/health?probe=1") == (200, b"ok")
+    assert _get(saturated, "/smt/coverage?esiid=1")[0] == 503
+
+
+def test_dribbling_client_is_cut_off_at_the_overload_deadline(saturated):
+    slow = socket.create_connection(saturated.server_address)
+    slow.settimeout(5)
+    began = time.monotonic()
+    try:
+        for ch in b"GET /health HTTP/1.1\r\nX-Pad: " + b"a" * 40:
+            slow.send(bytes([ch]))
+            time.sleep(0.05)
+    except OSError:
+        pass
+    assert slow.recv(1024) == b""
+    assert time.monotonic() - began < 3
+    slow.close()
+
+
+def test_backed_up_responders_get_a_canned_503_without_reading(saturated):
+    stuck = [socket.create_connection(saturated.server_address) for _ in range(2)]
+    _wait(lambda: saturated.overload_queue.qsize() == 1)
+    refused = socket.create_connection(saturated.server_address)
+    refused.settimeout(2)
+    reply = refused.recv(4096)
+    assert reply.startswith(b"HTTP/1.1 503 ")
+    assert b'"server_busy"' in reply
+    for sock in stuck + [refused]:
+        sock.close()
+
+
+def test_metrics_path_with_a_query_string_is_served():
+    srv = webhook_server.BoundedThreadPoolHTTPServer(
+        ("127.0.0.1", 0), webhook_server.H, overload_handler_class=webhook_server.OverloadedH, workers=1, queue_size=1
+    )
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        status, body = _get(srv, "/metrics?ts=1")
+        assert status == 200
+        assert b"webhook_work_queue_depth" in body
+    finally:
+        srv.shutdown()
+        srv.server_close()
@@ -0,0 +1,31 @@
+import pytest
+
+import webhook_server
+
+
+@pytest.mark.parametrize(
+    "status, expected",
+    [
+        ("COMPLETED", "delivered"),
+        ("Delivered", "delivered"),
+        ("Report processed successfully", "delivered"),
+        ("INCOMPLETE", "pending"),
+        ("Not delivered", "pending"),
+        ("UNPROCESSED", "pending"),
+        ("Undelivered", "pending"),
+        ("not yet completed", "pending"),
+        ("IN_PROGRESS", "pending"),
+        ("Pending", "pending"),
+        ("FAILED", "failed"),
+        ("Request rejected", "failed"),
+        ("no errors", "pending"),
+    ],
+)
+def test_report_status_state(status, expected):
+    assert webhook_server._report_status_state({"reportStatus": status}) == expected
+
+
+def test_report_status_state_reads_nested_status_fields():
+    body = {"data": [{"deliveryStatus": "incomplete"}, {"fileStatus": "Delivered"}]}
+    assert webhook_server._report_status_state(body) == "delivered"
+    assert webhook_server._report_status_state({"data": {"status": "Cancelled"}, "note": "completed"}) == "failed"
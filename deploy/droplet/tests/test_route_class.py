@@ -0,0 +1,23 @@
+import pytest
+
+import webhook_server
+
+
+@pytest.mark.parametrize(
+    "path, route",
+    [
+        ("/health", "health"),
+        ("/health?x=1", "health"),
+        ("/metrics?format=prometheus", "health"),
+        ("/?probe=1", "health"),
+        ("/jobs?state=queued", "jobs"),
+        ("/jobs/smt_ingest-1-abc", "jobs"),
+        ("/smt/coverage?esiid=1044", "jobs"),
+        ("/smt/archive/repost", "jobs"),
+        ("/trigger/smt-now", "trigger"),
+        ("/smt/backfill/batch", "smt_proxy"),
+        ("/smt/coverage/backfill", "smt_proxy"),
+    ],
+)
+def test_route_class_ignores_query_strings(path, route):
+    assert webhook_server._route_class(path) == route
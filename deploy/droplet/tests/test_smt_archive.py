@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+import smt_archive
+import smt_intervals
+
+DAY = smt_intervals.parse_day("08/01/2024")
+START = smt_intervals.chicago_day_start(DAY)
+
+
+def _cols(rows):
+    """rows: (meter, slot index from 08/01 00:00 Chicago, kWh, revision, flags)."""
+    cols = smt_intervals.IntervalColumns()
+    for meter, slot, kwh, revision, flags in rows:
+        cols.append(cols.series_id("1044", meter), START + slot * 900, kwh, revision, flags)
+    return cols
+
+
+def _partition_path(archive, key="2024-08"):
+    return os.path.join(archive.root, "1044", key + smt_archive.PARTITION_SUFFIX)
+
+
+def test_corrupt_partition_is_a_value_error_on_read(tmp_path):
+    archive = smt_archive.IntervalArchive(str(tmp_path))
+    archive.write(_cols([("M1", 0, 0.5, 0, 0)]))
+    path = _partition_path(archive)
+    with open(path, "r+b") as fh:
+        fh.truncate(os.path.getsize(path) - 4)
+    with pytest.raises(ValueError):
+        archive.read("1044", START, START + 86400)
+
+
+def test_write_quarantines_a_corrupt_partition_and_rebuilds_it(tmp_path):
+    archive = smt_archive.IntervalArchive(str(tmp_path))
+    archive.write(_cols([("M1", 0, 0.5, 0, 0)]))
+    with open(_partition_path(archive), "wb") as fh:
+        fh.write(smt_archive.ARCHIVE_MAGIC + b"\x01\x01\x02M1garbage")
+
+    assert archive.write(_cols([("M1", 1, 0.25, 0, 0)])) == {"1044": 1}
+    got = archive.read("1044", START, START + 86400)
+    assert list(got.kwh) == [0.25]
+    assert any(".corrupt" in name for name in os.listdir(os.path.dirname(_partition_path(archive))))
+
+
+def test_esiid_key_strips_path_characters():
+    assert smt_archive.esiid_key("10443720000000001") == "10443720000000001"
+    assert smt_archive.esiid_key("../../etc/x") == "etcx"
+    with pytest.raises(ValueError):
+        smt_archive.esiid_key("../")
+
+
+def _read(archive, start=START, end=START + 86400):
+    got = archive.read("1044", start, end)
+    return [
+        (got.series_keys[s][1], (ts - START) // 900, kwh, rev, flags)
+        for s, ts, kwh, rev, flags in zip(got.series, got.start, got.kwh, got.revision, got.flags)
+    ]
+
+
+def test_round_trip_sorted_by_meter_then_start(tmp_path):
+    archive = smt_archive.IntervalArchive(str(tmp_path))
+    rows = [("M2", 3, 0.75, 0, 0), ("M1", 2, 1.5, 7, 1), ("M1", 0, 0.25, 0, 2)]
+    assert archive.write(_cols(rows)) == {"1044": 1}
+    assert _read(archive) == [("M1", 0, 0.25, 0, 2), ("M1", 2, 1.5, 7, 1), ("M2", 3, 0.75, 0, 0)]
+    info = archive.index("1044")["2024-08"]
+    assert info["rows"] == 3
+    assert info["meters"] == ["M1", "M2"]
+    assert (info["first"], info["last"]) == (START, START + 3 * 900)
+
+
+def test_merge_keeps_newer_revisions_and_actuals(tmp_path):
+    archive = smt_archive.IntervalArchive(str(tmp_path))
+    archive.write(_cols([("M1", 0, 1.0, 200, 0), ("M1", 1, 1.0, 100, 0), ("M1", 2, 1.0, 100, 0)]))
+    est = smt_intervals.FLAG_ESTIMATED
+    archive.write(_cols([("M1", 0, 2.0, 100, 0), ("M1", 1, 2.0, 300, 0), ("M1", 2, 2.0, 100, est)]))
+    assert [(slot, kwh) for _, slot, kwh, _, _ in _read(archive)] == [(0, 1.0), (1, 2.0), (2, 1.0)]
+
+
+def test_identical_rewrite_touches_nothing(tmp_path):
+    archive = smt_archive.IntervalArchive(str(tmp_path))
+    rows = [("M1", 0, 0.5, 0, 0), ("M2", 1, 0.5, 0, 0)]
+    archive.write(_cols(rows))
+    mtime = os.stat(_partition_path(archive)).st_mtime_ns
+    assert archive.write(_cols(list(reversed(rows)))) == {}
+    assert os.stat(_partition_path(archive)).st_mtime_ns == mtime
+
+
+def test_range_read_spans_month_partitions(tmp_path):
+    archive = smt_archive.IntervalArchive(str(tmp_path))
+    oct31 = smt_intervals.chicago_day_start(smt_intervals.parse_day("10/31/2024"))
+    nov4 = smt_intervals.chicago_day_start(smt_intervals.parse_day("11/04/2024"))
+    cols = smt_intervals.IntervalColumns()
+    series = cols.series_id("1044", "M1")
+    for ts in range(oct31, nov4, 900):
+        cols.append(series, ts, 0.1, 0, 0)
+    assert archive.write(cols) == {"1044": 2}
+    assert sorted(archive.index("1044")) == ["2024-10", "2024-11"]
+
+    # Oct 31 23:00 Chicago across the month boundary and through the 25-hour 11/03.
+    got = archive.read("1044", oct31 + 23 * 3600, nov4)
+    assert list(got.start) == list(range(oct31 + 23 * 3600, nov4, 900))
+    assert len(archive.read("1044", nov4, nov4 + 86400)) == 0
+
+
+def test_partition_key_follows_chicago_months():
+    assert smt_archive.partition_key(START) == "2024-08"
+    assert smt_archive.partition_key(START - 1) == "2024-07"
+    assert smt_archive.partition_start("2024-08") == START
@@ -0,0 +1,118 @@
+import time
+
+import smt_coverage
+import smt_intervals
+
+
+def _slots(day, first, count):
+    base = smt_intervals.chicago_day_start(day) // smt_coverage.SLOT_SECONDS
+    return range(base + first, base + first + count)
+
+
+def test_mark_counts_new_slots_and_rebases_downwards():
+    bitmap = smt_coverage.CoverageBitmap()
+    assert bitmap.mark([103, 101]) == 2
+    assert bitmap.base == 96
+    assert bitmap.mark([101, 90, 3]) == 2
+    assert bitmap.base == 0
+    assert [s for s in range(120) if bitmap.has(s)] == [3, 90, 101, 103]
+    assert bitmap.bounds() == (3, 103)
+    assert not bitmap.has(-1) and not bitmap.has(10_000)
+
+
+def test_empty_bitmap_has_no_bounds():
+    bitmap = smt_coverage.CoverageBitmap()
+    assert not bitmap
+    assert bitmap.bounds() == (None, None)
+    assert bitmap.missing_spans(10, 20) == [(10, 20)]
+
+
+def test_missing_spans_merge_across_whole_and_partial_bytes():
+    bitmap = smt_coverage.CoverageBitmap()
+    bitmap.mark(list(range(16, 40)) + [45])
+    assert bitmap.missing_spans(5, 60) == [(5, 16), (40, 45), (46, 60)]
+    assert bitmap.missing_spans(16, 40) == []
+
+
+def test_trim_before_drops_whole_bytes_only():
+    bitmap = smt_coverage.CoverageBitmap()
+    bitmap.mark([0, 9, 30])
+    bitmap.trim_before(20)
+    assert bitmap.base == 16
+    assert bitmap.bounds() == (30, 30)
+
+
+def test_backfill_windows_merge_nearby_days():
+    day = smt_intervals.parse_day("08/01/2024")
+    spans = [(_slots(day, 10, 1)[0], _slots(day, 12, 1)[0]),
+             (_slots(day + 3, 0, 1)[0], _slots(day + 4, 0, 1)[0]),
+             (_slots(day + 10, 5, 1)[0], _slots(day + 10, 6, 1)[0])]
+    assert smt_coverage.backfill_windows(spans, 2) == [(day, day + 3), (day + 10, day + 10)]
+    assert smt_coverage.backfill_windows(spans, 1) == [(day, day), (day + 3, day + 3), (day + 10, day + 10)]
+
+
+def _store(tmp_path):
+    return smt_coverage.CoverageStore(str(tmp_path / "coverage.sqlite3"))
+
+
+def _mark(store, esiid, slots):
+    cols = smt_intervals.IntervalColumns()
+    series = cols.series_id(esiid, "M1")
+    for slot in slots:
+        cols.append(series, slot * smt_coverage.SLOT_SECONDS, 0.1, 0, 0)
+    return store.mark_columns(cols)
+
+
+def _day_slots(day):
+    return (smt_intervals.chicago_day_start(day + 1) - smt_intervals.chicago_day_start(day)) // smt_coverage.SLOT_SECONDS
+
+
+def test_report_skips_leading_history_unless_asked(tmp_path):
+    store = _store(tmp_path)
+    day = smt_intervals.chicago_day(int(time.time())) - 10
+    full, part = _day_slots(day + 1), 40
+    assert _mark(store, "1044", list(_slots(day + 1, 0, full)) + list(_slots(day + 2, 0, part))) == {"1044": full + part}
+
+    report = store.report("1044", day, day + 2)
+    tail = _day_slots(day + 2) - part
+    assert report["expectedSlots"] == sum(_day_slots(d) for d in range(day, day + 3))
+    assert report["coveredSlots"] == full + part
+    assert report["missingSlots"] == tail
+    assert [w["days"] for w in report["backfillWindows"]] == [1]
+    assert report["backfillWindows"][0]["startDate"] == smt_intervals.format_day(day + 2)
+
+    leading = store.report("1044", day, day + 2, include_leading=True)
+    assert leading["missingSlots"] == _day_slots(day) + tail
+    assert leading["backfillWindows"][0]["startDate"] == smt_intervals.format_day(day)
+    store.close()
+
+
+def test_report_without_coverage_is_the_whole_window(tmp_path):
+    store = _store(tmp_path)
+    day = smt_intervals.chicago_day(int(time.time())) - 10
+    report = store.report("2055", day, day + 1)
+    assert report["coveredSlots"] == 0
+    assert report["firstCovered"] is None
+    assert report["backfillWindows"] == [
+        {"startDate": smt_intervals.format_day(day), "endDate": smt_intervals.format_day(day + 1), "days": 2}
+    ]
+    store.close()
+
+
+def test_mark_columns_ignores_slots_past_retention(tmp_path):
+    store = _store(tmp_path)
+    old = smt_intervals.chicago_day(int(time.time())) - 500
+    assert _mark(store, "1044", _slots(old, 0, 4)) == {"1044": 0}
+    assert store.load("1044").bounds() == (None, None)
+    store.close()
+
+
+def test_recent_backfill_matches_covering_windows_only(tmp_path):
+    store = _store(tmp_path)
+    before = time.time() - 1
+    store.record_backfill("1044", 100, 110, "job-1")
+    assert store.recent_backfill("1044", 102, 108, before)
+    assert not store.recent_backfill("1044", 99, 108, before)
+    assert not store.recent_backfill("2055", 102, 108, before)
+    assert not store.recent_backfill("1044", 102, 108, time.time() + 60)
+    store.close()
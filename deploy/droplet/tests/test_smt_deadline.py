@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+import webhook_server
+
+
+class _Resp:
+    status_code = 200
+    text = "{}"
+
+    def json(self):
+        return {}
+
+
+@pytest.fixture
+def smt(monkeypatch):
+    calls = []
+    monkeypatch.setattr(webhook_server, "get_smt_access_token", lambda **kwargs: "token")
+    monkeypatch.setattr(webhook_server.SMT_HTTP, "post", lambda url, **kwargs: calls.append(kwargs["timeout"]) or _Resp())
+    monkeypatch.setattr(webhook_server, "SMT_CIRCUIT", webhook_server.CircuitBreaker("test", 5, 30))
+    return calls
+
+
+def _slow_acquire(seconds):
+    def acquire(endpoint, max_wait=None):
+        time.sleep(seconds)
+
+    return acquire
+
+
+def test_rate_limit_wait_comes_out_of_the_post_timeout(monkeypatch, smt):
+    monkeypatch.setattr(webhook_server.SMT_RATE_LIMITER, "acquire", _slow_acquire(0.3))
+    with webhook_server.request_deadline(time.monotonic() + 2.0):
+        webhook_server.smt_post("/v2/myagreements/", {})
+    (timeout,) = smt
+    assert timeout <= 1.75
+
+
+def test_deadline_spent_waiting_is_reported_without_posting(monkeypatch, smt):
+    monkeypatch.setattr(webhook_server.SMT_RATE_LIMITER, "acquire", _slow_acquire(0.3))
+    with webhook_server.request_deadline(time.monotonic() + 1.2):
+        with pytest.raises(webhook_server.SmtUnavailableError) as info:
+            webhook_server.smt_post("/v2/myagreements/", {})
+    assert info.value.code == "smt_deadline_exceeded"
+    assert smt == []
+    assert webhook_server.SMT_CIRCUIT.consecutive_failures == 0
@@ -0,0 +1,87 @@
+import io
+import random
+import zipfile
+
+import pytest
+
+import smt_ingest
+
+MEMBERS = {
+    "IntervalMeterUsage_1044_20240801.csv": b"ESIID,USAGE_DATE\r\n" + b"1044,08/01/2024,0.25\r\n" * 400,
+    "notes/readme.txt": bytes(range(256)) * 8,
+}
+
+
+class _Unseekable(io.RawIOBase):
+    """Write-only sink zipfile cannot seek in, so it emits data descriptors."""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buf.extend(data)
+        return len(data)
+
+
+class _Chunked:
+    """Pipe stand-in that hands back short reads of random size."""
+
+    def __init__(self, data, seed):
+        self.data = data
+        self.pos = 0
+        self.rng = random.Random(seed)
+
+    def read(self, n):
+        size = min(n, self.rng.randint(1, 97))
+        out = self.data[self.pos : self.pos + size]
+        self.pos += len(out)
+        return out
+
+
+def _archive(compression, descriptors):
+    sink = _Unseekable() if descriptors else io.BytesIO()
+    with zipfile.ZipFile(sink, "w", compression=compression) as zf:
+        zf.writestr("notes/", b"")
+        for name, data in MEMBERS.items():
+            zf.writestr(name, data)
+    return bytes(sink.buf) if descriptors else sink.getvalue()
+
+
+def _read_all(data, seed=0):
+    return {m.name: b"".join(m) for m in smt_ingest.iter_zip_members(_Chunked(data, seed))}
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "compression, descriptors",
+    [(zipfile.ZIP_DEFLATED, False), (zipfile.ZIP_DEFLATED, True), (zipfile.ZIP_STORED, False)],
+)
+def test_members_read_front_to_back_across_random_chunk_splits(compression, descriptors, seed):
+    assert _read_all(_archive(compression, descriptors), seed) == MEMBERS
+
+
+def test_unread_members_are_drained():
+    members = smt_ingest.iter_zip_members(io.BytesIO(_archive(zipfile.ZIP_DEFLATED, True)))
+    names = [m.name for m in members]
+    assert names == list(MEMBERS)
+
+
+def test_stored_member_with_data_descriptor_is_rejected():
+    with pytest.raises(smt_ingest.ZipStreamError):
+        _read_all(_archive(zipfile.ZIP_STORED, True))
+
+
+def test_crc_mismatch_is_rejected():
+    data = bytearray(_archive(zipfile.ZIP_STORED, False))
+    at = data.index(b"1044,08/01/2024")
+    data[at] ^= 0x01
+    with pytest.raises(smt_ingest.ZipStreamError, match="CRC"):
+        _read_all(bytes(data))
+
+
+def test_non_zip_payload_is_rejected():
+    with pytest.raises(smt_ingest.ZipStreamError):
+        _read_all(b"-----BEGIN PGP MESSAGE-----\n")
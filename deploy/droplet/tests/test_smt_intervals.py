@@ -0,0 +1,171 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import smt_intervals
+
+
+def _utc(text):
+    return int(datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp())
+
+
+def _local(epoch):
+    local = smt_intervals.chicago_local(epoch)
+    return datetime.fromtimestamp(local, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+@pytest.mark.parametrize(
+    "utc, local",
+    [
+        ("2024-03-10 07:00", "2024-03-10 01:00"),  # CST, the last hour before the jump
+        ("2024-03-10 07:45", "2024-03-10 01:45"),
+        ("2024-03-10 08:00", "2024-03-10 03:00"),  # 02:00 CST -> 03:00 CDT
+        ("2024-11-03 06:30", "2024-11-03 01:30"),  # first 01:30 (CDT)
+        ("2024-11-03 07:30", "2024-11-03 01:30"),  # second 01:30 (CST)
+        ("2024-11-03 08:00", "2024-11-03 02:00"),
+        ("2024-07-04 17:00", "2024-07-04 12:00"),
+        ("2024-01-01 05:59", "2023-12-31 23:59"),
+    ],
+)
+def test_chicago_local_around_dst_changes(utc, local):
+    assert _local(_utc(utc)) == local
+
+
+def test_central_epoch_and_chicago_local_agree_on_every_slot_of_dst_days():
+    for day in ("03/10/2024", "11/03/2024"):
+        start = smt_intervals.chicago_day_start(smt_intervals.parse_day(day))
+        end = smt_intervals.chicago_day_start(smt_intervals.parse_day(day) + 1)
+        assert (end - start) // 900 in (92, 100)
+        for epoch in range(start, end, 900):
+            local = datetime.fromtimestamp(smt_intervals.chicago_local(epoch), tz=timezone.utc)
+            assert smt_intervals.chicago_day(epoch) == smt_intervals.parse_day(day)
+            if day.startswith("03"):
+                assert smt_intervals.central_epoch(local.strftime("%m/%d/%Y %H:%M")) == epoch
+
+
+AUG1 = smt_intervals.chicago_day_start(smt_intervals.parse_day("08/01/2024"))
+
+CSV = (
+    "\ufeffESIID,USAGE_DATE,USAGE_START_TIME,USAGE_END_TIME,USAGE_KWH,ESTIMATED_ACTUAL,NOTE\r\n"
+    "'1044,08/01/2024,00:00,00:15,0.250,A,plain\r\n"
+    '1044,08/01/2024,00:15,00:30,"1,024.5",E,"two\r\nlines, café"\r\n'
+    "\r\n"
+    "1044,08/01/2024,00:30,00:45,,A,no kwh\r\n"
+    "1044,08/01/2024,,,0.1,A,no time\r\n"
+    "1044,08/01/2024,00:45,01:00,0.125,A,\"say \"\"hi\"\"\"\r\n"
+).encode("utf-8")
+
+
+def _rows(cols):
+    return [
+        (cols.series_keys[cols.series[i]], cols.start[i] - AUG1, cols.kwh[i], cols.flags[i])
+        for i in range(len(cols))
+    ]
+
+
+def _parse(chunks, esiid=None, meter="M1"):
+    return smt_intervals.parse_interval_csv(chunks, default_esiid=esiid, default_meter=meter)
+
+
+def test_parser_reads_quotes_multiline_fields_and_skips_bad_rows():
+    cols = _parse([CSV])
+    assert _rows(cols) == [
+        (("1044", "M1"), 0, 0.25, 0),
+        (("1044", "M1"), 900, 1024.5, smt_intervals.FLAG_ESTIMATED),
+        (("1044", "M1"), 2700, 0.125, 0),
+    ]
+    assert cols.stats["totalRows"] == 4
+    assert cols.stats["invalidTimestamp"] == 1
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_parser_is_independent_of_chunk_boundaries(size):
+    whole = _rows(_parse([CSV]))
+    assert _rows(_parse([CSV[i : i + size] for i in range(0, len(CSV), size)])) == whole
+
+
+def test_parser_holds_back_a_cr_split_from_its_lf():
+    cut = CSV.index(b"\r\n") + 1
+    cols = _parse([CSV[:cut], CSV[cut:]])
+    assert len(cols) == 3
+
+
+def test_end_only_columns_shift_back_one_slot_when_the_day_starts_at_0015():
+    csv = b"ESIID,USAGE_DATE,USAGE_END_TIME,USAGE_KWH\n1044,08/01/2024,00:15,1\n1044,08/01/2024,00:30,2\n"
+    assert [s for _, s, _, _ in _rows(_parse([csv]))] == [0, 900]
+
+
+def test_end_only_columns_are_left_alone_when_the_day_starts_at_0000():
+    csv = b"ESIID,USAGE_DATE,USAGE_END_TIME,USAGE_KWH\n1044,08/01/2024,00:00,1\n1044,08/01/2024,00:15,2\n"
+    assert [s for _, s, _, _ in _rows(_parse([csv]))] == [0, 900]
+
+
+def test_default_esiid_fills_in_when_the_csv_has_none():
+    csv = b"USAGE_DATE,USAGE_START_TIME,USAGE_KWH\n08/01/2024,00:00,1\n"
+    assert _rows(_parse([csv], esiid="'2055")) == [(("2055", "M1"), 0, 1.0, 0)]
+    assert _parse([csv]).stats["invalidEsiid"] == 1
+
+
+def _day_cols(days, meter="M1"):
+    cols = smt_intervals.IntervalColumns()
+    series = cols.series_id("1044", meter)
+    for day in days:
+        start = smt_intervals.chicago_day_start(smt_intervals.parse_day("08/01/2024") + day)
+        for slot in range(2):
+            cols.append(series, start + slot * 900, 0.5, 0, 0)
+    return cols
+
+
+def test_pack_day_batches_one_batch_per_chicago_day():
+    batches = list(smt_intervals.pack_day_batches(_day_cols([0, 1, 3])))
+    first = smt_intervals.parse_day("08/01/2024")
+    assert [b.day - first for b in batches] == [0, 1, 3]
+    assert batches[0].first_ts == AUG1
+    assert batches[0].last_ts == AUG1 + 900
+    assert batches[0].packed.startswith(smt_intervals.BATCH_MAGIC)
+
+
+def test_contiguous_runs_break_on_gaps_meters_and_limit():
+    batches = list(smt_intervals.pack_day_batches(_day_cols([0, 1, 2, 4])))
+    batches += list(smt_intervals.pack_day_batches(_day_cols([5], meter="M2")))
+    runs = [[b.day - batches[0].day for b in run] for run in smt_intervals.contiguous_runs(batches, 2)]
+    assert runs == [[0, 1], [2], [4], [5]]
+
+
+def _dupes(rows):
+    """rows: (slot, kWh, revision, flags) on one series; returns resolved (slot, kWh) plus stats."""
+    cols = smt_intervals.IntervalColumns()
+    series = cols.series_id("1044", "M1")
+    for slot, kwh, revision, flags in rows:
+        cols.append(series, AUG1 + slot * 900, kwh, revision, flags)
+    resolved = smt_intervals.resolve_latest(cols)
+    return [((s - AUG1) // 900, k) for s, k in zip(resolved.start, resolved.kwh)], resolved.stats
+
+
+def test_resolve_latest_prefers_the_newest_revision():
+    rows, stats = _dupes([(0, 1.0, 200, 0), (0, 2.0, 100, 0), (1, 3.0, 0, 0)])
+    assert rows == [(0, 1.0), (1, 3.0)]
+    assert stats["duplicatesCollapsed"] == 1
+    assert stats["estimatedSuperseded"] == 0
+
+
+def test_resolve_latest_prefers_actual_over_estimated_within_a_revision():
+    est = smt_intervals.FLAG_ESTIMATED
+    rows, stats = _dupes([(0, 1.0, 100, 0), (0, 2.0, 100, est)])
+    assert rows == [(0, 1.0)]
+    assert stats["estimatedSuperseded"] == 1
+
+
+def test_resolve_latest_keeps_the_later_row_on_a_full_tie_and_sorts_by_start():
+    rows, stats = _dupes([(2, 5.0, 0, 0), (0, 1.0, 0, 0), (0, 2.0, 0, 0)])
+    assert rows == [(0, 2.0), (2, 5.0)]
+    assert stats["processedRows"] == 2
+
+
+def test_resolve_latest_keeps_series_apart():
+    cols = smt_intervals.IntervalColumns()
+    for meter in ("M2", "M1"):
+        cols.append(cols.series_id("1044", meter), AUG1, 1.0, 0, 0)
+    resolved = smt_intervals.resolve_latest(cols)
+    assert [resolved.series_keys[s] for s in resolved.series] == [("1044", "M2"), ("1044", "M1")]
+    assert resolved.stats["duplicatesCollapsed"] == 0
@@ -1,20 +1,66 @@
 import os
+import atexit
+import base64
 import json
 import subprocess
 import logging
 import secrets
+import shlex
+import signal
+import socket
+import sqlite3
 import time
 import hashlib
+import heapq
 import hmac
+import queue
+import random
+import re
+import sys
 import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from http.server import BaseHTTPRequestHandler, HTTPServer
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
-# SMT debug logging helpers
+# Structured logging.
 # NOTE: This file is deployed to /home/deploy/webhook_server.py by systemd.
+#
+# Hot-path log calls only build a small record and put it on a bounded queue; a
+# background thread serializes records as JSON lines and flushes stdout once per
+# batch. Payload snippets are wrapped in LazySnip so json.dumps of a whole SMT
+# body only happens on the writer thread, and only for records that survived
+# the level and sampling checks.
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "WARN": 30, "ERROR": 40, "CRITICAL": 50}
+WEBHOOK_LOG_LEVEL = LOG_LEVELS.get((os.environ.get("WEBHOOK_LOG_LEVEL") or "DEBUG").strip().upper(), 10)
+WEBHOOK_LOG_QUEUE_SIZE = int(os.environ.get("WEBHOOK_LOG_QUEUE_SIZE", "10000"))
+WEBHOOK_LOG_BATCH_SIZE = 256
+
+
+def _parse_log_sampling(raw: str) -> Dict[str, float]:
+    """`proxy_auth=0.1,SMT_DEBUG=0.5` -> {"proxy_auth": 0.1, "SMT_DEBUG": 0.5}."""
+    rates: Dict[str, float] = {}
+    for part in (raw or "").split(","):
+        key, sep, value = part.partition("=")
+        if not sep or not key.strip():
+            continue
+        try:
+            rates[key.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+# Per-category sample rates, keyed by event name or by tag (event wins).
+WEBHOOK_LOG_SAMPLE = _parse_log_sampling(os.environ.get("WEBHOOK_LOG_SAMPLE", ""))
+
+
 def _smt_snip(text: Optional[str], limit: int = 1000) -> str:
     if not isinstance(text, str):
         return ""
@@ -23,52 +69,249 @@ def _smt_snip(text: Optional[str], limit: int = 1000) -> str:
     return text[:limit] + "...[truncated]"
 
 
-def _log_smt_request(step_name: str, url: str, headers: Dict[str, Any], payload: Any) -> None:
-    try:
-        safe_headers = {}
-        if isinstance(headers, dict):
-            for key, value in headers.items():
-                lower = key.lower()
-                if lower in ("authorization", "proxy-authorization", "password"):
-                    continue
-                safe_headers[key] = value
-        body_repr: str
-        if isinstance(payload, (dict, list)):
-            body_repr = json.dumps(payload, separators=(",", ":"))
+class LazySnip:
+    """A payload rendered (compact JSON or repr) and truncated only when the record is written."""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int = 1000):
+        self.value = value
+        self.limit = limit
+
+    def render(self) -> str:
+        value = self.value
+        if isinstance(value, (dict, list)):
+            try:
+                text = json.dumps(value, separators=(",", ":"))
+            except Exception:
+                text = repr(value)
+        elif isinstance(value, str):
+            text = value
         else:
-            body_repr = repr(payload)
-        print(
-            "[SMT_DEBUG] step=%s base_url=%s username=%s url=%s headers=%s body=%s"
-            % (
-                step_name,
-                SMT_API_BASE_URL,
-                SMT_USERNAME,
-                url,
-                safe_headers,
-                _smt_snip(body_repr),
-            ),
-            flush=True,
-        )
-    except Exception as exc:
-        print(
-            f"[SMT_DEBUG] error_while_logging_request step={step_name} err={exc!r}",
-            flush=True,
-        )
+            text = repr(value)
+        return _smt_snip(text.replace("\n", " "), self.limit)
+
+    # Lets a LazySnip be passed as a stdlib logging arg: rendered only if the record is emitted.
+    __str__ = render
+
+
+def _log_arg_snapshot(value: Any) -> Any:
+    """Shallow copy of a mutable logging arg, so the writer thread formats what the caller saw."""
+    if isinstance(value, LazySnip) and isinstance(value.value, (dict, list)):
+        return LazySnip(_log_arg_snapshot(value.value), value.limit)
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+class LogMessage:
+    """A stdlib record's `msg % args`, formatted on the log writer thread instead of the caller's."""
+
+    __slots__ = ("msg", "args")
+
+    def __init__(self, msg: Any, args: Any):
+        self.msg = msg
+        if isinstance(args, dict):
+            self.args: Any = _log_arg_snapshot(args)
+        elif args:
+            self.args = tuple(_log_arg_snapshot(arg) for arg in args)
+        else:
+            self.args = None
+
+    def render(self) -> str:
+        text = str(self.msg)
+        if self.args is None:
+            return text
+        try:
+            return text % self.args
+        except Exception:
+            return f"{text} {self.args!r}"
+
+    __str__ = render
+
+
+class AsyncLogWriter:
+    """Background JSON-lines writer. Never blocks callers: a full queue drops the record and counts it."""
+
+    def __init__(self, max_queue: int, batch_size: int):
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._batch_size = max(1, batch_size)
+        self.dropped = 0
+        self.written = 0
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        if self._thread is None:
+            self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Drain what is queued (best effort) so shutdown does not lose the last lines."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    @staticmethod
+    def _json_default(value: Any) -> Any:
+        if isinstance(value, (LazySnip, LogMessage)):
+            return value.render()
+        return repr(value)
+
+    def _format(self, record: Dict[str, Any]) -> str:
+        try:
+            return json.dumps(record, default=self._json_default, separators=(",", ":"))
+        except Exception as exc:
+            return json.dumps({"ts": record.get("ts"), "level": "ERROR", "tag": "LOG", "event": "format_error", "err": repr(exc)})
+
+    def _run(self) -> None:
+        reported_dropped = 0
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            while record is not None and len(batch) < self._batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(record)
+            lines = [self._format(item) for item in batch if item is not None]
+            if self.dropped != reported_dropped:
+                lines.append(
+                    self._format(
+                        {
+                            "ts": _log_timestamp(),
+                            "level": "WARNING",
+                            "tag": "LOG",
+                            "event": "records_dropped",
+                            "count": self.dropped - reported_dropped,
+                        }
+                    )
+                )
+                reported_dropped = self.dropped
+            try:
+                if lines:
+                    sys.stdout.write("\n".join(lines) + "\n")
+                    sys.stdout.flush()
+                    self.written += len(lines)
+            except Exception:
+                pass
+            if batch[-1] is None:
+                return
+
+
+def _log_timestamp() -> str:
+    now = time.time()
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)) + ".%03dZ" % int((now % 1) * 1000)
+
+
+LOG_WRITER = AsyncLogWriter(WEBHOOK_LOG_QUEUE_SIZE, WEBHOOK_LOG_BATCH_SIZE)
+atexit.register(LOG_WRITER.close)
+
+
+def log_enabled(level: str, tag: str = "", event: str = "") -> bool:
+    if LOG_LEVELS.get(level, 20) < WEBHOOK_LOG_LEVEL:
+        return False
+    if WEBHOOK_LOG_SAMPLE and LOG_LEVELS.get(level, 20) < LOG_LEVELS["WARNING"]:
+        rate = WEBHOOK_LOG_SAMPLE.get(event, WEBHOOK_LOG_SAMPLE.get(tag, 1.0))
+        if rate < 1.0 and random.random() >= rate:
+            return False
+    return True
+
+
+def log_event(level: str, tag: str, event: str, **fields: Any) -> None:
+    """
+    Queue one structured record, e.g. log_event("DEBUG", "SMT_DEBUG", "proxy_auth", path=p, status="accepted").
+
+    Warnings and errors are never sampled. Wrap large payloads in LazySnip.
+    """
+    if not log_enabled(level, tag, event):
+        return
+    record: Dict[str, Any] = {"ts": _log_timestamp(), "level": level, "tag": tag, "event": event}
+    record.update(fields)
+    LOG_WRITER.submit(record)
+
+
+class AsyncLogHandler(logging.Handler):
+    """Routes stdlib `logging` calls through the same queue as log_event."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        event = "log" if record.name == "root" else record.name
+        if not log_enabled(record.levelname, "LOG", event):
+            return
+        try:
+            fields: Dict[str, Any] = {
+                "ts": _log_timestamp(),
+                "level": record.levelname,
+                "tag": "LOG",
+                "event": event,
+                # Rendered by the writer thread; payload args (LazySnip) stay unformatted until then.
+                "msg": LogMessage(record.msg, record.args),
+            }
+            if record.exc_info:
+                # Tracebacks are formatted here: the frames are only valid on this thread.
+                fields["exc"] = logging.Formatter().formatException(record.exc_info)
+            LOG_WRITER.submit(fields)
+        except Exception:
+            self.handleError(record)
+
+
+def _install_log_handler() -> None:
+    root = logging.getLogger()
+    if not any(isinstance(handler, AsyncLogHandler) for handler in root.handlers):
+        root.addHandler(AsyncLogHandler())
+    if root.level > logging.INFO:
+        root.setLevel(logging.INFO)
+
+
+def _log_smt_request(step_name: str, url: str, headers: Dict[str, Any], payload: Any) -> None:
+    if not log_enabled("DEBUG", "SMT_DEBUG", "smt_request"):
+        return
+    safe_headers = {}
+    if isinstance(headers, dict):
+        for key, value in headers.items():
+            if key.lower() in ("authorization", "proxy-authorization", "password"):
+                continue
+            safe_headers[key] = value
+    log_event(
+        "DEBUG",
+        "SMT_DEBUG",
+        "smt_request",
+        step=step_name,
+        base_url=SMT_API_BASE_URL,
+        username=SMT_USERNAME,
+        url=url,
+        headers=safe_headers,
+        body=LazySnip(payload),
+    )
 
 
 def _log_smt_response(step_name: str, resp: requests.Response) -> None:
-    try:
-        status = getattr(resp, "status_code", None)
-        text = getattr(resp, "text", None)
-        print(
-            f"[SMT_DEBUG] step={step_name} response_status={status} body={_smt_snip(text)}",
-            flush=True,
-        )
-    except Exception as exc:
-        print(
-            f"[SMT_DEBUG] error_while_logging_response step={step_name} err={exc!r}",
-            flush=True,
-        )
+    if not log_enabled("DEBUG", "SMT_DEBUG", "smt_response"):
+        return
+    log_event(
+        "DEBUG",
+        "SMT_DEBUG",
+        "smt_response",
+        step=step_name,
+        response_status=getattr(resp, "status_code", None),
+        body=LazySnip(getattr(resp, "text", None)),
+    )
 
 # Shared secrets from env
 SECRET_A = os.environ.get("INTELLIWATT_WEBHOOK_SECRET", "").strip()
@@ -108,11 +351,272 @@ WEBHOOK_SECRET = (
     or ""
 ).strip()
 
+# Concurrency / admission control.
+# WEBHOOK_WORKERS=0 falls back to the legacy single-threaded HTTPServer.
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "16"))
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "32"))
+WEBHOOK_RETRY_AFTER_SECONDS = int(os.environ.get("WEBHOOK_RETRY_AFTER_SECONDS", "5"))
+# Per-route-class in-flight caps; 0 disables the cap for that class.
+WEBHOOK_ROUTE_LIMITS = {
+    "smt_proxy": int(os.environ.get("WEBHOOK_MAX_SMT_PROXY", "8")),
+    "trigger": int(os.environ.get("WEBHOOK_MAX_TRIGGER", "4")),
+    "jobs": 0,
+    "health": 0,
+}
+
+
+# Prometheus-style metrics.
+WEBHOOK_METRICS_TOKEN = (os.environ.get("WEBHOOK_METRICS_TOKEN") or "").strip()
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms sharded per thread.
+
+    Recording touches only the calling thread's shard, so the request path never
+    takes a lock. A scrape merges every shard; shards of finished threads
+    (batch fan-out workers) are folded into a retired shard so the shard list
+    stays bounded.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, Dict[str, Dict[MetricKey, Any]]]] = []
+        self._retired: Dict[str, Dict[MetricKey, Any]] = {"counters": {}, "histograms": {}}
+
+    def _shard(self) -> Dict[str, Dict[MetricKey, Any]]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {"counters": {}, "histograms": {}}
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        counters = self._shard()["counters"]
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        histograms = self._shard()["histograms"]
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        hist = histograms.get(key)
+        if hist is None:
+            hist = [[0] * len(self.buckets), 0.0, 0]
+            histograms[key] = hist
+        for idx, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                hist[0][idx] += 1
+                break
+        hist[1] += seconds
+        hist[2] += 1
+
+    @staticmethod
+    def _merge_into(target: Dict[str, Dict[MetricKey, Any]], shard: Dict[str, Dict[MetricKey, Any]]) -> None:
+        for key, value in dict(shard["counters"]).items():
+            target["counters"][key] = target["counters"].get(key, 0.0) + value
+        for key, hist in dict(shard["histograms"]).items():
+            merged = target["histograms"].get(key)
+            if merged is None:
+                merged = [[0] * len(hist[0]), 0.0, 0]
+                target["histograms"][key] = merged
+            for idx, count in enumerate(list(hist[0])):
+                merged[0][idx] += count
+            merged[1] += hist[1]
+            merged[2] += hist[2]
+
+    def collect(self) -> Dict[str, Dict[MetricKey, Any]]:
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge_into(self._retired, shard)
+            self._shards = alive
+            merged: Dict[str, Dict[MetricKey, Any]] = {"counters": {}, "histograms": {}}
+            self._merge_into(merged, self._retired)
+            for _thread, shard in alive:
+                self._merge_into(merged, shard)
+        return merged
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = ",".join(
+        '%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs
+    )
+    return "{" + escaped + "}"
+
+
+def render_metrics(
+    registry: MetricsRegistry,
+    gauges: List[Tuple[str, Dict[str, Any], float]],
+) -> str:
+    """
+    Render merged counters/histograms plus scrape-time values in Prometheus text format.
+
+    Scrape-time values whose name ends in `_total` are cumulative counts kept by
+    the components themselves and are typed as counters; the rest are gauges.
+    """
+
+    data = registry.collect()
+    lines: List[str] = []
+
+    by_name: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], Any]]] = {}
+    for (name, labels), value in data["counters"].items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in sorted(by_name[name]):
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    hist_by_name: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], Any]]] = {}
+    for (name, labels), hist in data["histograms"].items():
+        hist_by_name.setdefault(name, []).append((labels, hist))
+    for name in sorted(hist_by_name):
+        lines.append(f"# TYPE {name} histogram")
+        for labels, (counts, total, count) in sorted(hist_by_name[name], key=lambda item: item[0]):
+            cumulative = 0
+            for bound, bucket_count in zip(registry.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    # The exposition format wants each family's samples contiguous; sorted() is stable.
+    current = None
+    for name, labels, value in sorted(gauges, key=lambda item: item[0]):
+        if name != current:
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            current = name
+        label_tuple = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        lines.append(f"{name}{_format_labels(label_tuple)} {value:g}")
+
+    return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry(LATENCY_BUCKETS)
+
+
+def _track_background_start(kind: str) -> None:
+    METRICS.inc("webhook_background_jobs_started_total", kind=kind)
+
+
+def _track_background_end(kind: str, returncode: Optional[int]) -> None:
+    outcome = "ok" if returncode == 0 else "error"
+    METRICS.inc("webhook_background_jobs_finished_total", kind=kind, outcome=outcome)
+
+
+# Outbound HTTP connection pools (one per upstream so SMT and app traffic never starve each other).
+SMT_HTTP_POOL_SIZE = int(os.environ.get("SMT_HTTP_POOL_SIZE", "10"))
+APP_HTTP_POOL_SIZE = int(os.environ.get("APP_HTTP_POOL_SIZE", "10"))
+
+
+class UpstreamSession:
+    """
+    Keep-alive connection pool for one upstream host.
+
+    A single HTTPAdapter (urllib3 pool, thread-safe) is shared by per-thread
+    requests.Session objects, so every worker thread reuses the same warm
+    TCP/TLS connections without sharing Session cookie/header state.
+    """
+
+    def __init__(self, name: str, pool_size: int):
+        self.name = name
+        self._adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(1, pool_size),
+            pool_block=False,
+            max_retries=0,
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            session.headers["Connection"] = "keep-alive"
+            self._local.session = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        started = time.monotonic()
+        try:
+            resp = self._session().request(method, url, **kwargs)
+        except requests.RequestException:
+            self._record((time.monotonic() - started) * 1000.0, error=True)
+            raise
+        self._record((time.monotonic() - started) * 1000.0, error=False)
+        return resp
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def _record(self, elapsed_ms: float, *, error: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.max_ms:
+                self.max_ms = elapsed_ms
+            if error:
+                self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Connection counts come from urllib3's pools: connectionsOpened well below
+        # requests means keep-alive reuse is working.
+        opened = 0
+        try:
+            pools = self._adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += int(getattr(pool, "num_connections", 0) or 0)
+        except Exception:
+            pass
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "connectionsOpened": opened,
+                "avgMs": round(self.total_ms / self.requests, 1) if self.requests else 0.0,
+                "maxMs": round(self.max_ms, 1),
+            }
+
+
+SMT_HTTP = UpstreamSession("smt", SMT_HTTP_POOL_SIZE)
+APP_HTTP = UpstreamSession("app", APP_HTTP_POOL_SIZE)
+
+
+def _fetch_meter_info_uncached(esiid: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Return (meterInfo, definitive). `definitive` is True only when the app
+    answered 200, so a missing record can be negatively cached while transport
+    and server errors are always retried.
+    """
 
-def fetch_meter_info_from_app(esiid: str) -> Optional[Dict[str, Any]]:
     if not APP_BASE_URL:
         logging.warning("meter info fetch skipped; APP_BASE_URL not configured")
-        return None
+        return None, False
 
     params = {"esiid": esiid}
     headers: Dict[str, str] = {}
@@ -122,7 +626,7 @@ def fetch_meter_info_from_app(esiid: str) -> Optional[Dict[str, Any]]:
         headers["x-admin-token"] = ADMIN_TOKEN
 
     try:
-        resp = requests.get(
+        resp = APP_HTTP.get(
             f"{APP_BASE_URL}/api/admin/smt/meter-info/latest",
             params=params,
             headers=headers,
@@ -130,7 +634,7 @@ def fetch_meter_info_from_app(esiid: str) -> Optional[Dict[str, Any]]:
         )
     except requests.RequestException as exc:
         logging.error("failed to fetch meter info from app: %s", exc)
-        return None
+        return None, False
 
     if resp.status_code != 200:
         logging.warning(
@@ -138,19 +642,119 @@ def fetch_meter_info_from_app(esiid: str) -> Optional[Dict[str, Any]]:
             resp.status_code,
             resp.text[:300],
         )
-        return None
+        return None, False
 
     try:
         payload = resp.json()
     except ValueError as exc:
         logging.error("meter info fetch JSON parse error: %s", exc)
-        return None
+        return None, False
 
     meter_info = payload.get("meterInfo")
     if not meter_info:
         logging.info("meter info fetch ok but no record found for esiid=%s", esiid)
-        return None
+        return None, True
+
+    return meter_info, True
+
+
+class TtlLruCache:
+    """
+    Small thread-safe LRU cache with a per-entry TTL.
+
+    Entries are evicted least-recently-used first once `max_entries` is reached;
+    expired entries are dropped lazily on lookup. Every invalidation bumps
+    `generation`; a read-through caller that captured the generation before
+    going upstream passes it to set() so a result fetched across an
+    invalidation is never stored.
+    """
+
+    _MISS = object()
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Any, Tuple[float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+
+    def get(self, key: Any) -> Tuple[bool, Any, float]:
+        """Return (hit, value, age_seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None, 0.0
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2], now - entry[1]
+
+    def set(self, key: Any, value: Any, ttl: float, *, if_generation: Optional[int] = None) -> None:
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if if_generation is not None and if_generation != self.generation:
+                return
+            self._entries[key] = (now + ttl, now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Any) -> bool:
+        with self._lock:
+            self.generation += 1
+            return self._entries.pop(key, self._MISS) is not self._MISS
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# meterInfo lookups used to hydrate placeholder meter numbers on /agreements.
+METER_INFO_CACHE_TTL_SECONDS = float(os.environ.get("METER_INFO_CACHE_TTL_SECONDS", "600"))
+METER_INFO_CACHE_NEGATIVE_TTL_SECONDS = float(os.environ.get("METER_INFO_CACHE_NEGATIVE_TTL_SECONDS", "60"))
+METER_INFO_CACHE = TtlLruCache(
+    "meter_info",
+    int(os.environ.get("METER_INFO_CACHE_MAX_ENTRIES", "2048")),
+)
+
 
+def fetch_meter_info_from_app(esiid: str) -> Optional[Dict[str, Any]]:
+    hit, cached, age = METER_INFO_CACHE.get(esiid)
+    if hit:
+        logging.info(
+            "meter info cache hit esiid=%s found=%s age=%.1fs",
+            esiid,
+            cached is not None,
+            age,
+        )
+        return cached
+
+    generation = METER_INFO_CACHE.generation
+    meter_info, definitive = _fetch_meter_info_uncached(esiid)
+    if meter_info:
+        METER_INFO_CACHE.set(esiid, meter_info, METER_INFO_CACHE_TTL_SECONDS, if_generation=generation)
+    elif definitive:
+        METER_INFO_CACHE.set(esiid, None, METER_INFO_CACHE_NEGATIVE_TTL_SECONDS, if_generation=generation)
     return meter_info
 
 
@@ -277,7 +881,7 @@ def smt_report_status(correlation_id: str, service_type: Optional[str] = None) -
     if service_type:
         payload["serviceType"] = service_type
 
-    logging.info("[SMT_PROXY] ReportStatus payload=%s", json.dumps(payload))
+    logging.info("[SMT_PROXY] ReportStatus payload=%s", LazySnip(payload, limit=8000))
     response = smt_post("/v2/reportrequeststatus/", payload)
     status = response.get("status")
     data = response.get("data")
@@ -286,6 +890,93 @@ def smt_report_status(correlation_id: str, service_type: Optional[str] = None) -
     return status or 200, data
 
 
+SMT_BATCH_CONCURRENCY = int(os.environ.get("SMT_BATCH_CONCURRENCY", "8"))
+SMT_BATCH_MAX_IDS = int(os.environ.get("SMT_BATCH_MAX_IDS", "500"))
+
+
+def smt_report_status_batch(
+    correlation_ids: List[str],
+    service_type: Optional[str] = None,
+    concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run ReportStatus for many correlation IDs with bounded concurrency.
+
+    All calls share the cached SMT token and the pooled SMT connections. One
+    failing ID never fails the batch; each result carries its own ok/error.
+    Results are returned in input order.
+    """
+
+    workers = max(1, min(concurrency or SMT_BATCH_CONCURRENCY, len(correlation_ids) or 1))
+    deadline = current_deadline()
+
+    def _one(correlation_id: str) -> Dict[str, Any]:
+        try:
+            with request_deadline(deadline):
+                status, data = smt_report_status(correlation_id, service_type)
+            return {"correlationId": correlation_id, "ok": True, "status": status, "reportStatus": data}
+        except SmtUnavailableError as exc:
+            return {"correlationId": correlation_id, "ok": False, "error": exc.code, "retryAfter": round(exc.retry_after, 1)}
+        except SmtProxyRequestError as exc:
+            return {
+                "correlationId": correlation_id,
+                "ok": False,
+                "status": exc.status,
+                "error": "smt_request_failed",
+                "response": exc.payload,
+            }
+        except Exception as exc:
+            logging.exception("[SMT_PROXY] batch report_status unexpected_error correlationId=%s", correlation_id)
+            return {"correlationId": correlation_id, "ok": False, "error": str(exc)}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smt-report-status") as pool:
+        return list(pool.map(_one, correlation_ids))
+
+
+# Read-through cache for SMT listing calls (MySubscriptions / MyAgreements).
+SMT_LISTING_CACHE_TTL_SECONDS = float(os.environ.get("SMT_LISTING_CACHE_TTL_SECONDS", "60"))
+SMT_LISTING_CACHE = TtlLruCache("smt_listings", 256)
+
+
+def invalidate_smt_listing_cache(reason: str) -> None:
+    SMT_LISTING_CACHE.clear()
+    logging.info("[SMT_PROXY] listing cache invalidated reason=%s", reason)
+
+
+def _cached_smt_read(key: Tuple[Any, ...], fetch: Any, no_cache: bool) -> Tuple[int, Any, Dict[str, Any]]:
+    """
+    Serve `fetch()` through SMT_LISTING_CACHE. Returns (status, data, cacheInfo);
+    `no_cache` skips the lookup but still refreshes the entry. Only successful
+    reads are cached because the smt_* readers raise on SMT errors.
+    """
+
+    if not no_cache:
+        hit, cached, age = SMT_LISTING_CACHE.get(key)
+        if hit:
+            status, data = cached
+            return status, data, {"hit": True, "ageSec": round(age, 1), "ttlSec": SMT_LISTING_CACHE_TTL_SECONDS}
+    generation = SMT_LISTING_CACHE.generation
+    status, data = fetch()
+    SMT_LISTING_CACHE.set(key, (status, data), SMT_LISTING_CACHE_TTL_SECONDS, if_generation=generation)
+    return status, data, {"hit": False, "ageSec": 0.0, "ttlSec": SMT_LISTING_CACHE_TTL_SECONDS, "bypass": no_cache}
+
+
+def smt_list_subscriptions_cached(no_cache: bool = False) -> Tuple[int, Any, Dict[str, Any]]:
+    return _cached_smt_read(("subscriptions",), smt_list_subscriptions, no_cache)
+
+
+def smt_my_agreements_cached(
+    agreement_number: Optional[int] = None,
+    status_reason: Optional[str] = None,
+    no_cache: bool = False,
+) -> Tuple[int, Any, Dict[str, Any]]:
+    return _cached_smt_read(
+        ("myagreements", agreement_number, status_reason or None),
+        lambda: smt_my_agreements(agreement_number, status_reason),
+        no_cache,
+    )
+
+
 def smt_list_subscriptions() -> Tuple[int, Any]:
     requestor_id, requester_auth_id = _smt_base_ids()
     payload = {
@@ -294,7 +985,7 @@ def smt_list_subscriptions() -> Tuple[int, Any]:
         "requesterAuthenticationID": requester_auth_id,
         "SMTTermsandConditions": "Y",
     }
-    logging.info("[SMT_PROXY] MySubscriptions payload=%s", json.dumps(payload))
+    logging.info("[SMT_PROXY] MySubscriptions payload=%s", LazySnip(payload, limit=8000))
     response = smt_post("/v2/Mysubscriptions/", payload)
     status = response.get("status")
     data = response.get("data")
@@ -312,10 +1003,12 @@ def smt_unsubscribe(subscription_number: str) -> Tuple[int, Any]:
         "subscriptionNumber": subscription_number,
         "SMTTermsandConditions": "Y",
     }
-    logging.info("[SMT_PROXY] UnSubscription payload=%s", json.dumps(payload))
+    logging.info("[SMT_PROXY] UnSubscription payload=%s", LazySnip(payload, limit=8000))
     response = smt_post("/v2/UnSubscription/", payload)
     status = response.get("status") or 0
     data = response.get("data")
+    if _smt_success(status):
+        invalidate_smt_listing_cache("unsubscribe")
     return status, data
 
 
@@ -328,7 +1021,7 @@ def smt_agreement_esiids(agreement_number: int) -> Tuple[int, Any]:
         "agreementNumber": agreement_number,
         "SMTTermsandConditions": "Y",
     }
-    logging.info("[SMT_PROXY] AgreementESIIDs payload=%s", json.dumps(payload))
+    logging.info("[SMT_PROXY] AgreementESIIDs payload=%s", LazySnip(payload, limit=8000))
     response = smt_post("/v2/AgreementESIIDs/", payload)
     status = response.get("status")
     data = response.get("data")
@@ -351,10 +1044,12 @@ def smt_terminate_agreement(agreement_number: int, retail_customer_email: str) -
         ],
         "SMTTermsandConditions": "Y",
     }
-    logging.info("[SMT_PROXY] Terminateagreement payload=%s", json.dumps(payload))
+    logging.info("[SMT_PROXY] Terminateagreement payload=%s", LazySnip(payload, limit=8000))
     response = smt_post("/v2/Terminateagreement/", payload)
     status = response.get("status") or 0
     data = response.get("data")
+    if _smt_success(status):
+        invalidate_smt_listing_cache("terminate_agreement")
     return status, data
 
 
@@ -374,7 +1069,7 @@ def smt_my_agreements(
     if status_reason:
         payload["statusReason"] = status_reason
 
-    logging.info("[SMT_PROXY] MyAgreements payload=%s", json.dumps(payload))
+    logging.info("[SMT_PROXY] MyAgreements payload=%s", LazySnip(payload, limit=8000))
     response = smt_post("/v2/myagreements/", payload)
     status = response.get("status")
     data = response.get("data")
@@ -383,23 +1078,10 @@ def smt_my_agreements(
     return status or 200, data
 
 
-def smt_request_interval_backfill(
-    *,
-    esiid: str,
-    meter_number: Optional[str],
-    start_date: str,
-    end_date: str,
-    authorization_id: Optional[str] = None,
-) -> str:
+def _submit_interval_backfill(esiids: List[str], start_date: str, end_date: str) -> str:
     """
-    Submit a 15-minute interval backfill request to SMT's /v2/15minintervalreads/
-    endpoint, asking SMT to deliver a CSV report over FTP.
-
-    The caller is responsible for providing start_date/end_date as MM/DD/YYYY
-    strings (365 days before "now" for start, and today/yesterday for end).
-
-    Returns a job identifier (correlationId if provided by SMT, otherwise the
-    locally generated trans_id) that the caller can use to correlate ReportStatus.
+    POST one /v2/15minintervalreads/ request covering `esiids` and return its job id
+    (SMT correlationId when present, otherwise the local trans_id).
     """
 
     # Build SMT identity fields (requestorID + DUNS).
@@ -427,18 +1109,13 @@ def smt_request_interval_backfill(
         "readingType": "C",
         # 15-minute JSON examples from SMT show esiid as an array of strings:
         # "esiid": ["1008901012126195372100"]
-        "esiid": [str(esiid).strip()],
+        "esiid": [str(esiid).strip() for esiid in esiids],
         "SMTTermsandConditions": "Y",
     }
 
     logging.info(
-        "[SMT_PROXY] interval backfill request esiid=%s meter=%s start=%s end=%s auth=%s payload=%s",
-        esiid,
-        meter_number or "",
-        start_date,
-        end_date,
-        authorization_id or "",
-        json.dumps(payload, separators=(",", ":"), ensure_ascii=False),
+        "[SMT_PROXY] interval backfill payload=%s",
+        LazySnip(payload, limit=8000),
     )
 
     # Call SMT /v2/15minintervalreads/ using the shared helper that injects the JWT token.
@@ -447,15 +1124,10 @@ def smt_request_interval_backfill(
     data = response.get("data") or {}
 
     # Log a concise summary for journalctl debugging.
-    try:
-        data_snip = json.dumps(data, separators=(",", ":"))[:800] if isinstance(data, (dict, list)) else repr(data)[:800]
-    except Exception:
-        data_snip = repr(data)[:800]
-
     logging.info(
         "[SMT_PROXY] interval backfill SMT reply status=%s body=%s",
         status,
-        data_snip,
+        LazySnip(data, limit=800),
     )
 
     if not _smt_success(status):
@@ -467,22 +1139,447 @@ def smt_request_interval_backfill(
     if isinstance(data, dict):
         correlation_id = data.get("correlationId") or data.get("correlationID") or data.get("CorrelationId")
 
-    job_id = str(correlation_id or trans_id)
+    return str(correlation_id or trans_id)
+
+
+def smt_request_interval_backfill(
+    *,
+    esiid: str,
+    meter_number: Optional[str],
+    start_date: str,
+    end_date: str,
+    authorization_id: Optional[str] = None,
+) -> str:
+    """
+    Submit a 15-minute interval backfill request to SMT's /v2/15minintervalreads/
+    endpoint, asking SMT to deliver a CSV report over FTP.
+
+    The caller is responsible for providing start_date/end_date as MM/DD/YYYY
+    strings (365 days before "now" for start, and today/yesterday for end).
+
+    Returns a job identifier (correlationId if provided by SMT, otherwise the
+    locally generated trans_id) that the caller can use to correlate ReportStatus.
+    """
+
+    logging.info(
+        "[SMT_PROXY] interval backfill request esiid=%s meter=%s start=%s end=%s auth=%s",
+        esiid,
+        meter_number or "",
+        start_date,
+        end_date,
+        authorization_id or "",
+    )
+
+    job_id = _submit_interval_backfill([esiid], start_date, end_date)
 
     logging.info(
-        "[SMT_PROXY] interval backfill accepted esiid=%s jobId=%s status=%s",
+        "[SMT_PROXY] interval backfill accepted esiid=%s jobId=%s",
         esiid,
         job_id,
-        status,
     )
 
     return job_id
 
 
-def run_default_command() -> bytes:
+SMT_BACKFILL_MAX_ESIIDS_PER_REQUEST = int(os.environ.get("SMT_BACKFILL_MAX_ESIIDS_PER_REQUEST", "100"))
+# Default sub-window for /smt/backfill/plan: "monthly", "weekly" or a number of days.
+SMT_BACKFILL_SPLIT_DEFAULT = os.environ.get("SMT_BACKFILL_SPLIT_DEFAULT", "monthly").strip() or "monthly"
+# Largest day-count split accepted; anything longer should just use "monthly".
+SMT_BACKFILL_SPLIT_MAX_DAYS = 366
+
+
+def smt_request_interval_backfill_batch(
+    items: List[Dict[str, str]],
+    *,
+    chunk_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     """
-    Default behavior for generic "smt-now" triggers.
-    Preserves the old behavior so existing callers still work.
+    Submit interval backfills for many ESIIDs with as few SMT requests as possible.
+
+    `items` are {"esiid", "startDate", "endDate"} dicts. ESIIDs sharing a date
+    window are grouped and split into chunks of at most `chunk_size`; each chunk
+    is one SMT request. Chunks are submitted with bounded concurrency and the
+    per-chunk outcome (jobId or error) is returned in submission order.
+    """
+
+    size = max(1, chunk_size or SMT_BACKFILL_MAX_ESIIDS_PER_REQUEST)
+    windows: "OrderedDict[Tuple[str, str], List[str]]" = OrderedDict()
+    for item in items:
+        key = (item["startDate"], item["endDate"])
+        bucket = windows.setdefault(key, [])
+        if item["esiid"] not in bucket:
+            bucket.append(item["esiid"])
+
+    chunks: List[Dict[str, Any]] = []
+    for (start_date, end_date), esiids in windows.items():
+        for offset in range(0, len(esiids), size):
+            chunks.append(
+                {
+                    "chunk": len(chunks),
+                    "startDate": start_date,
+                    "endDate": end_date,
+                    "esiids": esiids[offset : offset + size],
+                }
+            )
+
+    deadline = current_deadline()
+
+    def _submit(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with request_deadline(deadline):
+                job_id = _submit_interval_backfill(chunk["esiids"], chunk["startDate"], chunk["endDate"])
+        except SmtUnavailableError as exc:
+            return {**chunk, "ok": False, "error": exc.code, "retryAfter": round(exc.retry_after, 1)}
+        except SmtProxyRequestError as exc:
+            return {**chunk, "ok": False, "status": exc.status, "error": "smt_request_failed", "response": exc.payload}
+        except Exception as exc:
+            logging.exception("[SMT_PROXY] interval backfill chunk %s failed", chunk["chunk"])
+            return {**chunk, "ok": False, "error": str(exc)}
+        return {**chunk, "ok": True, "jobId": job_id}
+
+    if not chunks:
+        return []
+    workers = max(1, min(concurrency or SMT_BATCH_CONCURRENCY, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smt-backfill-submit") as pool:
+        return list(pool.map(_submit, chunks))
+
+
+SMT_DATE_FORMAT = "%m/%d/%Y"
+
+
+def backfill_split(value: Any) -> Any:
+    """
+    Normalize a backfill split: "monthly", "weekly", or a whole number of days in
+    1..SMT_BACKFILL_SPLIT_MAX_DAYS (an int or a string of digits). Floats and bools
+    are rejected rather than truncated. ValueError otherwise.
+    """
+
+    if value in ("monthly", "weekly"):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value.strip())
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= SMT_BACKFILL_SPLIT_MAX_DAYS:
+        raise ValueError(f"split must be monthly, weekly or 1..{SMT_BACKFILL_SPLIT_MAX_DAYS} days")
+    return value
+
+
+def _backfill_bounds(start_date: str, end_date: str) -> Tuple[date, date]:
+    start = datetime.strptime(start_date, SMT_DATE_FORMAT).date()
+    end = datetime.strptime(end_date, SMT_DATE_FORMAT).date()
+    if end < start:
+        raise ValueError("endDate is before startDate")
+    return start, end
+
+
+def count_backfill_windows(start_date: str, end_date: str, split: Any = "monthly") -> int:
+    """How many sub-windows plan_backfill_windows would return, without building them."""
+
+    start, end = _backfill_bounds(start_date, end_date)
+    split = backfill_split(split)
+    if split == "monthly":
+        return (end.year * 12 + end.month) - (start.year * 12 + start.month) + 1
+    days = 7 if split == "weekly" else split
+    return (end.toordinal() - start.toordinal()) // days + 1
+
+
+def plan_backfill_windows(start_date: str, end_date: str, split: Any = "monthly") -> List[Tuple[str, str]]:
+    """
+    Split an inclusive MM/DD/YYYY window into sub-windows, newest first.
+
+    `split` is "monthly" (calendar months, clipped to the window), "weekly", or a
+    number of days (see backfill_split). Newest-first ordering means the most
+    recent data is requested (and delivered) first. Callers taking a window
+    from a request should bound it with count_backfill_windows first.
+    """
+
+    start, end = _backfill_bounds(start_date, end_date)
+    split = backfill_split(split)
+
+    # Work in ordinals and clip to `end` before converting back, so stepping
+    # past the last month/day of year 9999 never builds an out-of-range date.
+    windows: List[Tuple[int, int]] = []
+    cursor, last = start.toordinal(), end.toordinal()
+    if split == "monthly":
+        year, month = start.year, start.month
+        while cursor <= last:
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            next_month = date(year, month, 1).toordinal() if year <= 9999 else last + 1
+            windows.append((cursor, min(last, next_month - 1)))
+            cursor = next_month
+    else:
+        days = 7 if split == "weekly" else split
+        while cursor <= last:
+            windows.append((cursor, min(last, cursor + days - 1)))
+            cursor += days
+
+    windows.reverse()
+    return [
+        (date.fromordinal(a).strftime(SMT_DATE_FORMAT), date.fromordinal(b).strftime(SMT_DATE_FORMAT))
+        for a, b in windows
+    ]
+
+
+def smt_request_interval_backfill_planned(
+    esiids: List[str],
+    start_date: str,
+    end_date: str,
+    *,
+    split: Any = "monthly",
+    concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Submit one large backfill window as smaller sub-window requests.
+
+    Every (sub-window, ESIID chunk) becomes its own SMT request with its own
+    correlation ID, so files land as they are ready instead of all at once.
+    """
+
+    items = [
+        {"esiid": esiid, "startDate": sub_start, "endDate": sub_end}
+        for sub_start, sub_end in plan_backfill_windows(start_date, end_date, split)
+        for esiid in esiids
+    ]
+    return smt_request_interval_backfill_batch(items, concurrency=concurrency)
+
+
+# Droplet-side polling of submitted interval backfills.
+SMT_BACKFILL_POLL_INITIAL_SECONDS = float(os.environ.get("SMT_BACKFILL_POLL_INITIAL_SECONDS", "300"))
+SMT_BACKFILL_POLL_MAX_SECONDS = float(os.environ.get("SMT_BACKFILL_POLL_MAX_SECONDS", "3600"))
+SMT_BACKFILL_MAX_AGE_SECONDS = float(os.environ.get("SMT_BACKFILL_MAX_AGE_HOURS", "72")) * 3600
+SMT_BACKFILL_MAX_TRACKED = int(os.environ.get("SMT_BACKFILL_MAX_TRACKED", "2000"))
+# App route that receives one completion callback per job; empty disables callbacks.
+SMT_BACKFILL_CALLBACK_PATH = os.environ.get("SMT_BACKFILL_CALLBACK_PATH", "").strip()
+
+
+_STATUS_FAILED_WORDS = frozenset(
+    ("fail", "failed", "failure", "error", "errored", "reject", "rejected", "cancel", "canceled", "cancelled")
+)
+_STATUS_DELIVERED_WORDS = frozenset(
+    ("complete", "completed", "delivered", "success", "successful", "succeeded", "processed")
+)
+_STATUS_NEGATIONS = frozenset(("not", "no", "non"))
+
+
+def _report_status_state(data: Any) -> str:
+    """
+    Reduce an SMT ReportStatus body to delivered / failed / pending.
+
+    SMT's field names vary between report types, so this looks at every string
+    value whose key mentions "status" (top level and two levels down).
+    """
+
+    texts: List[str] = []
+
+    def _collect(obj: Any, depth: int) -> None:
+        if depth > 2:
+            return
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if isinstance(value, str) and "status" in str(key).lower():
+                    texts.append(value.lower())
+                elif isinstance(value, (dict, list)):
+                    _collect(value, depth + 1)
+        elif isinstance(obj, list):
+            for item in obj[:50]:
+                _collect(item, depth + 1)
+
+    _collect(data, 0)
+    # Whole words only, so "incomplete", "undelivered" or "unprocessed" never read
+    # as done; a word within two words after "not"/"no" ("not yet delivered") does not count either.
+    failed = delivered = False
+    for text in texts:
+        words = re.findall(r"[a-z]+", text)
+        for index, word in enumerate(words):
+            if _STATUS_NEGATIONS.intersection(words[max(0, index - 2) : index]):
+                continue
+            if word in _STATUS_FAILED_WORDS:
+                failed = True
+            elif word in _STATUS_DELIVERED_WORDS:
+                delivered = True
+    if failed:
+        return "failed"
+    if delivered:
+        return "delivered"
+    return "pending"
+
+
+class BackfillJobTracker:
+    """
+    In-process scheduler that polls ReportStatus for submitted backfill jobs.
+
+    Jobs sit in a min-heap keyed by next poll time. Each round polls every due
+    job through smt_report_status_batch, then reschedules pending jobs with
+    exponential backoff and jitter. Jobs that finish (delivered, failed, or
+    too old) get exactly one completion callback to the app and move into a
+    bounded history.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_delay: float,
+        max_delay: float,
+        max_age: float,
+        max_jobs: int,
+        history_size: int = 500,
+    ):
+        self.initial_delay = max(1.0, initial_delay)
+        self.max_delay = max(self.initial_delay, max_delay)
+        self.max_age = max_age
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._history: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._history_size = history_size
+        self._heap: List[Tuple[float, str]] = []
+        self._cond = threading.Condition(threading.Lock())
+        self._thread: Optional[threading.Thread] = None
+
+    def _next_delay(self, attempts: int) -> float:
+        # "Equal jitter": half the exponential step is fixed, half is random.
+        step = min(self.max_delay, self.initial_delay * (2 ** min(attempts, 16)))
+        return step / 2 + random.uniform(0, step / 2)
+
+    def track(self, job_id: str, **meta: Any) -> bool:
+        now = time.time()
+        with self._cond:
+            if job_id in self._jobs:
+                return True
+            if len(self._jobs) >= self.max_jobs:
+                logging.warning("[SMT_BACKFILL] tracker full (%s jobs); not tracking jobId=%s", self.max_jobs, job_id)
+                return False
+            job = {
+                "jobId": job_id,
+                "state": "pending",
+                "submittedAt": now,
+                "polls": 0,
+                "lastPolledAt": None,
+                "lastError": None,
+                **meta,
+            }
+            job["nextPollAt"] = now + self._next_delay(0)
+            self._jobs[job_id] = job
+            heapq.heappush(self._heap, (job["nextPollAt"], job_id))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="smt-backfill-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        logging.info("[SMT_BACKFILL] tracking jobId=%s meta=%s", job_id, meta)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active": [dict(job) for job in self._jobs.values()],
+                "recent": [dict(job) for job in reversed(self._history.values())],
+            }
+
+    def _take_due(self) -> List[str]:
+        with self._cond:
+            while True:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    due: List[str] = []
+                    while self._heap and self._heap[0][0] <= now:
+                        _, job_id = heapq.heappop(self._heap)
+                        if job_id in self._jobs:
+                            due.append(job_id)
+                    if due:
+                        return due
+                    continue
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            due = self._take_due()
+            try:
+                results = smt_report_status_batch(due)
+            except Exception as exc:
+                logging.exception("[SMT_BACKFILL] poll round failed")
+                results = [{"correlationId": job_id, "ok": False, "error": str(exc)} for job_id in due]
+            for result in results:
+                self._apply_result(result)
+
+    def _apply_result(self, result: Dict[str, Any]) -> None:
+        job_id = result.get("correlationId")
+        now = time.time()
+        finished: Optional[Dict[str, Any]] = None
+        with self._cond:
+            job = self._jobs.get(job_id)  # type: ignore[arg-type]
+            if job is None:
+                return
+            job["polls"] += 1
+            job["lastPolledAt"] = now
+            if result.get("ok"):
+                job["lastError"] = None
+                job["state"] = _report_status_state(result.get("reportStatus"))
+                job["reportStatus"] = result.get("reportStatus")
+            else:
+                job["lastError"] = result.get("error") or result.get("status")
+            if job["state"] == "pending" and now - job["submittedAt"] > self.max_age:
+                job["state"] = "expired"
+            if job["state"] == "pending":
+                job["nextPollAt"] = now + self._next_delay(job["polls"])
+                heapq.heappush(self._heap, (job["nextPollAt"], job_id))
+            else:
+                job["completedAt"] = now
+                finished = self._jobs.pop(job_id)  # type: ignore[arg-type]
+                self._history[job_id] = finished  # type: ignore[index]
+                while len(self._history) > self._history_size:
+                    self._history.popitem(last=False)
+        if finished is not None:
+            logging.info(
+                "[SMT_BACKFILL] jobId=%s finished state=%s polls=%s",
+                job_id,
+                finished["state"],
+                finished["polls"],
+            )
+            _post_backfill_completion(finished)
+
+
+def _post_backfill_completion(job: Dict[str, Any]) -> None:
+    if not SMT_BACKFILL_CALLBACK_PATH:
+        return
+    if not APP_BASE_URL or not WEBHOOK_SECRET:
+        print(
+            "[WARN] backfill completion callback skipped; APP_BASE_URL or WEBHOOK_SECRET missing",
+            flush=True,
+        )
+        return
+    try:
+        resp = APP_HTTP.post(
+            f"{APP_BASE_URL}{SMT_BACKFILL_CALLBACK_PATH}",
+            headers={
+                "content-type": "application/json",
+                "x-intelliwatt-secret": WEBHOOK_SECRET,
+            },
+            json=job,
+            timeout=15,
+        )
+        print(
+            f"[INFO] backfill completion callback jobId={job.get('jobId')!r} status={resp.status_code}",
+            flush=True,
+        )
+    except Exception as exc:
+        print(
+            f"[ERROR] backfill completion callback POST failed jobId={job.get('jobId')!r}: {exc!r}",
+            flush=True,
+        )
+
+
+BACKFILL_TRACKER = BackfillJobTracker(
+    initial_delay=SMT_BACKFILL_POLL_INITIAL_SECONDS,
+    max_delay=SMT_BACKFILL_POLL_MAX_SECONDS,
+    max_age=SMT_BACKFILL_MAX_AGE_SECONDS,
+    max_jobs=SMT_BACKFILL_MAX_TRACKED,
+)
+
+
+def run_default_command() -> bytes:
+    """
+    Default behavior for generic "smt-now" triggers.
+    Preserves the old behavior so existing callers still work.
     """
     cmd = (
         'printf "[INFO] Generic SMT trigger at $(date +%Y%m%d_%H%M%S)\\n'
@@ -498,11 +1595,82 @@ def run_default_command() -> bytes:
     return (p.stdout or "ok\n").encode()
 
 
-def _spawn_sim_job_tsx(job_kind: str, job_arg: str) -> None:
+SimJobDone = Callable[[Optional[int]], None]
+JOB_OUTPUT_TAIL_LINES = int(os.environ.get("WEBHOOK_JOB_TAIL_LINES", "40"))
+
+
+class JobOutputTails:
+    """Last few output lines per job id, bounded in both jobs and lines, for GET /jobs/<id>."""
+
+    def __init__(self, max_jobs: int, max_lines: int):
+        self.max_jobs = max(1, max_jobs)
+        self.max_lines = max(1, max_lines)
+        self._tails: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, job_id: Optional[str], line: str) -> None:
+        if not job_id:
+            return
+        with self._lock:
+            tail = self._tails.get(job_id)
+            if tail is None:
+                tail = self._tails[job_id] = deque(maxlen=self.max_lines)
+                while len(self._tails) > self.max_jobs:
+                    self._tails.popitem(last=False)
+            tail.append(line.rstrip("\n")[:500])
+
+    def get(self, job_id: str) -> Optional[List[str]]:
+        with self._lock:
+            tail = self._tails.get(job_id)
+            return list(tail) if tail is not None else None
+
+
+def _read_log_tail(path: Optional[str], max_lines: int, max_bytes: int = 16384) -> Optional[List[str]]:
+    """Last lines of a log file, reading at most `max_bytes` from the end."""
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as fh:
+            fh.seek(0, os.SEEK_END)
+            size = fh.tell()
+            fh.seek(max(0, size - max_bytes))
+            data = fh.read()
+    except OSError:
+        return None
+    lines = data.decode("utf-8", "replace").splitlines()
+    if size > max_bytes and lines:
+        lines = lines[1:]  # first line is probably partial
+    return [line[:500] for line in lines[-max_lines:]]
+
+
+def _pump_output(stream: Any, logf: Any, job_id_of: Callable[[], Optional[str]]) -> None:
+    """Copy a child's output into its log file and into the current job's in-memory tail."""
+    try:
+        for line in stream:
+            try:
+                logf.write(line)
+                logf.flush()
+            except Exception:
+                pass
+            JOB_OUTPUT.append(job_id_of(), line)
+    except Exception:
+        pass
+
+
+JOB_OUTPUT = JobOutputTails(int(os.environ.get("WEBHOOK_JOB_HISTORY", "500")), JOB_OUTPUT_TAIL_LINES)
+
+
+def _spawn_sim_job_tsx(
+    job_kind: str,
+    job_arg: str,
+    on_done: Optional[SimJobDone] = None,
+    job_id: Optional[str] = None,
+) -> int:
     """Run canonical TS sim jobs via one entrypoint (Gap-Fill compare, Past recalc, …).
 
-    Performs subprocess.Popen synchronously so the HTTP handler can return 500 if
-    `npx`/`tsx` cannot start. Only the long wait+close runs in a background thread.
+    Performs subprocess.Popen synchronously so the caller sees a failure if
+    `npx`/`tsx` cannot start. Only the long wait+close runs in a background thread,
+    which calls `on_done(returncode)` at the end. Returns the child pid.
     """
     app_root = os.environ.get("INTELLIWATT_APP_ROOT", "/home/deploy/apps/intelliwatt").strip()
     runner = os.path.join(app_root, "scripts", "droplet", "sim-job-run.ts")
@@ -530,11 +1698,16 @@ def _spawn_sim_job_tsx(job_kind: str, job_arg: str) -> None:
         p = subprocess.Popen(
             argv,
             cwd=app_root,
-            stdout=logf,
+            stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             env=os.environ.copy(),
+            text=True,
+            errors="replace",
         )
+        pump = threading.Thread(target=_pump_output, args=(p.stdout, logf, lambda: job_id), daemon=True)
+        pump.start()
         print(f"[sim_job] spawned pid={p.pid}", flush=True)
+        _track_background_start(f"sim_{job_kind}")
     except Exception as exc:
         try:
             logf.close()
@@ -544,22 +1717,768 @@ def _spawn_sim_job_tsx(job_kind: str, job_arg: str) -> None:
         raise
 
     def _wait_and_close() -> None:
+        rc: Optional[int] = None
         try:
-            p.wait(timeout=7200)
+            rc = p.wait(timeout=7200)
         except Exception:
             pass
+        _track_background_end(f"sim_{job_kind}", rc)
+        pump.join(timeout=5)
         try:
             logf.close()
         except Exception:
             pass
+        if on_done is not None:
+            on_done(rc)
 
     threading.Thread(target=_wait_and_close, daemon=True).start()
+    return p.pid
+
+
+# Warm sim-job workers: long-lived `sim-job-run.ts --worker` processes fed over stdin,
+# so each job skips npx resolution, tsx transpile and Node/Prisma cold start.
+SIM_JOB_WORKERS = int(os.environ.get("SIM_JOB_WORKERS", "2"))
+SIM_JOB_WORKER_MAX_JOBS = int(os.environ.get("SIM_JOB_WORKER_MAX_JOBS", "50"))
+SIM_JOB_QUEUE_SIZE = int(os.environ.get("SIM_JOB_QUEUE_SIZE", "100"))
+SIM_JOB_TIMEOUT_SECONDS = float(os.environ.get("SIM_JOB_TIMEOUT_SECONDS", "7200"))
+SIM_JOB_HEALTH_INTERVAL_SECONDS = float(os.environ.get("SIM_JOB_HEALTH_INTERVAL_SECONDS", "60"))
+SIM_JOB_PING_TIMEOUT_SECONDS = 15.0
+# First ping waits for module load (tsx transpile + Prisma client), which is the slow part.
+SIM_JOB_STARTUP_TIMEOUT_SECONDS = 120.0
+SIM_JOB_RESTART_BACKOFF_MAX_SECONDS = 60.0
+
+
+def _sim_job_paths() -> Tuple[str, str, str]:
+    app_root = os.environ.get("INTELLIWATT_APP_ROOT", "/home/deploy/apps/intelliwatt").strip()
+    runner = os.path.join(app_root, "scripts", "droplet", "sim-job-run.ts")
+    log_dir = os.path.join(app_root, "deploy", "droplet", "logs")
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+    except Exception:
+        log_dir = app_root
+    return app_root, runner, os.path.join(log_dir, "sim-job-run.log")
+
+
+class SimJobWorker:
+    """One warm `sim-job-run.ts --worker` process speaking line-delimited JSON over stdin/stdout."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.proc: Optional[subprocess.Popen] = None
+        self.jobs_run = 0
+        self.started_at = 0.0
+        self._replies: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._logf: Any = None
+        self._seq = 0
+        self.current_job_id: Optional[str] = None
+
+    def start(self) -> None:
+        app_root, runner, log_path = _sim_job_paths()
+        if not os.path.isfile(runner):
+            raise FileNotFoundError(runner)
+        local_tsx = os.path.join(app_root, "node_modules", ".bin", "tsx")
+        argv = [local_tsx, runner, "--worker"] if os.path.isfile(local_tsx) else ["npx", "--yes", "tsx", runner, "--worker"]
+        self._logf = open(log_path, "a", encoding="utf-8")
+        self._replies = queue.Queue()
+        self.proc = subprocess.Popen(
+            argv,
+            cwd=app_root,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=os.environ.copy(),
+            text=True,
+            errors="replace",
+            bufsize=1,
+        )
+        self.jobs_run = 0
+        self.started_at = time.time()
+        threading.Thread(target=self._read_replies, args=(self.proc, self._replies), daemon=True).start()
+        threading.Thread(
+            target=_pump_output, args=(self.proc.stderr, self._logf, lambda: self.current_job_id), daemon=True
+        ).start()
+        print(f"[sim_job] worker {self.index} started pid={self.proc.pid} argv={argv!r}", flush=True)
+
+    @staticmethod
+    def _read_replies(proc: subprocess.Popen, replies: "queue.Queue[Optional[Dict[str, Any]]]") -> None:
+        try:
+            for line in proc.stdout:  # type: ignore[union-attr]
+                line = line.strip()
+                if not line.startswith("{"):
+                    continue
+                try:
+                    replies.put(json.loads(line))
+                except ValueError:
+                    continue
+        except Exception:
+            pass
+        replies.put(None)  # EOF: the process exited or closed stdout.
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def call(self, request: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send one request and wait for its reply. Raises RuntimeError if the worker dies or times out."""
+        if not self.alive():
+            raise RuntimeError("worker_not_running")
+        self._seq += 1
+        request_id = f"{self.index}-{self._seq}"
+        try:
+            self.proc.stdin.write(json.dumps({"id": request_id, **request}) + "\n")  # type: ignore[union-attr]
+            self.proc.stdin.flush()  # type: ignore[union-attr]
+        except (BrokenPipeError, OSError, ValueError) as exc:
+            raise RuntimeError(f"worker_write_failed: {exc!r}")
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("worker_timeout")
+            try:
+                reply = self._replies.get(timeout=remaining)
+            except queue.Empty:
+                raise RuntimeError("worker_timeout")
+            if reply is None:
+                rc: Optional[int] = None
+                try:
+                    rc = self.proc.wait(timeout=2) if self.proc else None
+                except Exception:
+                    pass
+                raise RuntimeError(f"worker_exited rc={rc}")
+            if reply.get("id") == request_id:
+                return reply
+
+    def stop(self, grace: float = 10.0) -> None:
+        proc, self.proc = self.proc, None
+        if proc is not None:
+            try:
+                proc.stdin.close()  # type: ignore[union-attr]
+            except Exception:
+                pass
+            try:
+                proc.wait(timeout=grace)
+            except Exception:
+                proc.kill()
+                try:
+                    proc.wait(timeout=5)
+                except Exception:
+                    pass
+        if self._logf is not None:
+            try:
+                self._logf.close()
+            except Exception:
+                pass
+            self._logf = None
+
+
+class SimJobWorkerPool:
+    """
+    Fixed set of warm sim-job workers pulling from one bounded job queue.
+
+    Each worker slot has a supervisor thread that (re)starts its process, feeds it
+    jobs one at a time, pings it when idle, and recycles it after `max_jobs` jobs
+    or on crash/timeout (with backoff). `submit` never blocks: if no worker could
+    be started or the queue is full it returns False and the caller falls back to
+    the per-job spawn path.
+    """
+
+    def __init__(self, size: int, max_jobs: int, queue_size: int):
+        self.size = size
+        self.max_jobs = max(1, max_jobs)
+        self._jobs: "queue.Queue[Tuple[str, str, Optional[SimJobDone], Optional[SimJobDone], Optional[str]]]" = queue.Queue(
+            maxsize=max(1, queue_size)
+        )
+        self._workers: List[SimJobWorker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.healthy_workers = 0
+        self.restarts = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started or self.size <= 0:
+                return
+            self._started = True
+            for index in range(self.size):
+                worker = SimJobWorker(index)
+                self._workers.append(worker)
+                threading.Thread(target=self._supervise, args=(worker,), name=f"sim-job-worker-{index}", daemon=True).start()
+
+    def submit(
+        self,
+        job_kind: str,
+        job_arg: str,
+        on_done: Optional[SimJobDone] = None,
+        *,
+        on_start: Optional[SimJobDone] = None,
+        job_id: Optional[str] = None,
+    ) -> bool:
+        """`on_start(pid)` fires when a worker picks the job up; `on_done(rc)` when it ends."""
+        if self.size <= 0:
+            return False
+        self.start()
+        if self.healthy_workers <= 0:
+            return False
+        try:
+            self._jobs.put_nowait((job_kind, job_arg, on_done, on_start, job_id))
+        except queue.Full:
+            return False
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "healthy": self.healthy_workers,
+            "queued": self._jobs.qsize(),
+            "restarts": self.restarts,
+            "completed": self.completed,
+            "failed": self.failed,
+            "workers": [
+                {"index": w.index, "pid": w.proc.pid if w.proc else None, "jobsRun": w.jobs_run, "alive": w.alive()}
+                for w in list(self._workers)
+            ],
+        }
+
+    def _set_healthy(self, delta: int) -> None:
+        with self._lock:
+            self.healthy_workers += delta
+
+    def _supervise(self, worker: SimJobWorker) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                worker.start()
+                reply = worker.call({"op": "ping"}, SIM_JOB_STARTUP_TIMEOUT_SECONDS)
+                if not reply.get("ok"):
+                    raise RuntimeError(f"ping_failed {reply!r}")
+            except Exception as exc:
+                print(f"[ERROR] sim_job worker {worker.index} failed to start: {exc!r}", flush=True)
+                worker.stop(grace=1.0)
+                time.sleep(backoff)
+                backoff = min(SIM_JOB_RESTART_BACKOFF_MAX_SECONDS, backoff * 2)
+                continue
+
+            backoff = 1.0
+            self._set_healthy(1)
+            try:
+                reason = self._serve(worker)
+            finally:
+                self._set_healthy(-1)
+            print(f"[sim_job] worker {worker.index} recycling reason={reason} jobs={worker.jobs_run}", flush=True)
+            worker.stop()
+            with self._lock:
+                self.restarts += 1
+
+    def _serve(self, worker: SimJobWorker) -> str:
+        while worker.jobs_run < self.max_jobs:
+            try:
+                job_kind, job_arg, on_done, on_start, job_id = self._jobs.get(timeout=SIM_JOB_HEALTH_INTERVAL_SECONDS)
+            except queue.Empty:
+                try:
+                    worker.call({"op": "ping"}, SIM_JOB_PING_TIMEOUT_SECONDS)
+                except RuntimeError as exc:
+                    return f"health_check_failed: {exc}"
+                continue
+
+            worker.jobs_run += 1
+            print(
+                f"[sim_job] worker {worker.index} pid={worker.proc.pid if worker.proc else None} "
+                f"run job_kind={job_kind!r} job_arg={job_arg!r}",
+                flush=True,
+            )
+            _track_background_start(f"sim_{job_kind}")
+            if on_start is not None and worker.proc is not None:
+                on_start(worker.proc.pid)
+            worker.current_job_id = job_id
+            try:
+                reply = worker.call({"op": "run", "kind": job_kind, "arg": job_arg}, SIM_JOB_TIMEOUT_SECONDS)
+            except RuntimeError as exc:
+                worker.current_job_id = None
+                _track_background_end(f"sim_{job_kind}", None)
+                with self._lock:
+                    self.failed += 1
+                print(f"[ERROR] sim_job {job_kind} {job_arg} lost with worker {worker.index}: {exc}", flush=True)
+                if on_done is not None:
+                    on_done(None)
+                return str(exc)
+            worker.current_job_id = None
+            ok = bool(reply.get("ok"))
+            _track_background_end(f"sim_{job_kind}", 0 if ok else 1)
+            if on_done is not None:
+                on_done(0 if ok else 1)
+            with self._lock:
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            print(
+                f"[sim_job] done job_kind={job_kind!r} job_arg={job_arg!r} ok={ok} "
+                f"ms={reply.get('ms')} error={reply.get('error')!r}",
+                flush=True,
+            )
+        return "max_jobs"
+
+
+SIM_JOB_POOL = SimJobWorkerPool(SIM_JOB_WORKERS, SIM_JOB_WORKER_MAX_JOBS, SIM_JOB_QUEUE_SIZE)
+
+
+def _run_sim_job(
+    job_kind: str,
+    job_arg: str,
+    on_done: Optional[SimJobDone] = None,
+    *,
+    on_start: Optional[SimJobDone] = None,
+    job_id: Optional[str] = None,
+) -> str:
+    """Queue a sim job on the warm pool, or spawn a one-off runner if the pool can't take it."""
+    if SIM_JOB_POOL.submit(job_kind, job_arg, on_done, on_start=on_start, job_id=job_id):
+        return "pool"
+    pid = _spawn_sim_job_tsx(job_kind, job_arg, on_done, job_id=job_id)
+    if on_start is not None:
+        on_start(pid)
+    return "spawn"
+
+
+# Durable background-job queue for ingest and sim jobs: survives restarts, caps
+# concurrency per kind, and runs user-facing work ahead of admin batches.
+WEBHOOK_JOB_DB = os.environ.get("WEBHOOK_JOB_DB", "/home/deploy/smt_ingest/webhook_jobs.sqlite3").strip()
+WEBHOOK_JOB_HISTORY = int(os.environ.get("WEBHOOK_JOB_HISTORY", "500"))
+WEBHOOK_JOB_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_JOB_MAX_ATTEMPTS", "3"))
+# A job left running by a previous process is adopted only this long after it started.
+WEBHOOK_JOB_ORPHAN_MAX_SECONDS = float(os.environ.get("WEBHOOK_JOB_ORPHAN_MAX_HOURS", "6")) * 3600
+JOB_KIND_LIMITS = {
+    # One at a time: every ingest syncs and posts the same local inbox.
+    "smt_ingest": int(os.environ.get("JOB_LIMIT_SMT_INGEST", "1")),
+    "smt_archive_repost": int(os.environ.get("JOB_LIMIT_SMT_ARCHIVE_REPOST", "1")),
+    "gapfill_compare": int(os.environ.get("JOB_LIMIT_GAPFILL_COMPARE", "2")),
+    "past_sim_recalc": int(os.environ.get("JOB_LIMIT_PAST_SIM_RECALC", "2")),
+}
+JOB_PRIORITY_USER = 10
+JOB_PRIORITY_ADMIN = 0
+JOB_PRIORITY_BY_REASON = {
+    "smt_authorized": JOB_PRIORITY_USER,
+    "user_refresh": JOB_PRIORITY_USER,
+    "user_orchestrate": JOB_PRIORITY_USER,
+    "past_sim_recalc": JOB_PRIORITY_USER,
+    "admin_triggered": JOB_PRIORITY_ADMIN,
+    "admin_refresh": JOB_PRIORITY_ADMIN,
+    "gapfill_compare": JOB_PRIORITY_ADMIN,
+}
+JOB_FINISHED_STATES = ("succeeded", "failed", "exited")
+
+# runner(job, on_done) starts the work without blocking and returns (pid, log_path);
+# it must call on_done(returncode) exactly once when the work ends.
+JobRunner = Callable[[Dict[str, Any], SimJobDone], Tuple[Optional[int], Optional[str]]]
+
+
+def _job_priority(payload: Dict[str, Any], reason: str) -> int:
+    """Caller may pass `priority` as "user"/"admin" or an int; otherwise it follows the reason."""
+    raw = payload.get("priority")
+    if raw == "user":
+        return JOB_PRIORITY_USER
+    if raw == "admin":
+        return JOB_PRIORITY_ADMIN
+    if isinstance(raw, int) and not isinstance(raw, bool):
+        return raw
+    return JOB_PRIORITY_BY_REASON.get(reason, JOB_PRIORITY_ADMIN)
+
+
+def _pid_identity(pid: Optional[int]) -> Optional[str]:
+    """
+    "<boot id>:<start ticks>" for a live (non-zombie) pid, from /proc; None when
+    it is gone or unreadable. A bare pid is reused after exit or a reboot; this
+    pair names one process.
+    """
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as fh:
+            stat = fh.read()
+        with open("/proc/sys/kernel/random/boot_id", "r", encoding="ascii") as fh:
+            boot_id = fh.read().strip()
+    except OSError:
+        return None
+    # comm (field 2) may contain spaces and parens; fields after its last ")" are fixed.
+    fields = stat[stat.rfind(b")") + 2 :].split()
+    if len(fields) < 20 or fields[0] == b"Z":
+        return None
+    return f"{boot_id}:{int(fields[19])}"
+
+
+def _stop_orphan(pid: int) -> None:
+    # Ingests run in their own session (pid == process group): stop the whole pass.
+    try:
+        if os.getpgid(pid) == pid:
+            os.killpg(pid, signal.SIGTERM)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except OSError:
+        pass
+
+
+class DurableJobQueue:
+    """
+    SQLite-backed (WAL) job queue with a single dispatcher thread.
+
+    Jobs are rows: queued -> running -> succeeded | failed | exited. The dispatcher
+    starts the highest-priority, oldest queued job whose kind is under its
+    concurrency limit. On startup, jobs left "running" by a previous process are
+    adopted only if the very process recorded for them (pid plus boot id and
+    start time, not a reused pid) is still alive and started less than
+    `orphan_max_seconds` ago; an adopted job still running at that age is
+    stopped. Everything else is requeued until `max_attempts`. Finished rows
+    beyond `history` are pruned. If the database path is unusable the queue
+    runs in memory.
+
+    Under the shipped smt-webhook.service (default KillMode=control-group)
+    systemd stops detached ingests together with the server, so a restart
+    requeues them; adoption only applies when they outlive it (KillMode=process
+    or a server run outside systemd).
+    """
+
+    orphan_poll_seconds = 5.0
+
+    def __init__(
+        self,
+        path: str,
+        limits: Dict[str, int],
+        history: int,
+        max_attempts: int,
+        *,
+        orphan_max_seconds: float = 6 * 3600,
+    ):
+        self.limits = limits
+        self.history = max(1, history)
+        self.max_attempts = max(1, max_attempts)
+        self.orphan_max_seconds = orphan_max_seconds
+        self._runners: Dict[str, JobRunner] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._started = False
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._open_lock = threading.Lock()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use so importing this module never touches the disk.
+        if self._conn is None:
+            with self._open_lock:
+                if self._conn is None:
+                    self._conn = self._open(self.path)
+        return self._conn
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        try:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        except (OSError, sqlite3.Error) as exc:
+            print(f"[WARN] job queue db {path!r} unusable ({exc!r}); jobs will not survive restarts", flush=True)
+            self.path = ":memory:"
+            db = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                pid INTEGER,
+                exit_code INTEGER,
+                log_path TEXT,
+                error TEXT
+            )
+            """
+        )
+        if "pid_identity" not in {col[1] for col in db.execute("PRAGMA table_info(jobs)")}:
+            db.execute("ALTER TABLE jobs ADD COLUMN pid_identity TEXT")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_state_order ON jobs (state, priority DESC, enqueued_at)")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+        return db
+
+    def register_runner(self, kind: str, runner: JobRunner) -> None:
+        self._runners[kind] = runner
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        try:
+            job["payload"] = json.loads(job["payload"])
+        except ValueError:
+            pass
+        return job
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int,
+        *,
+        coalesce: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Add a job. With `coalesce`, a job of the same kind that is still queued
+        (not started) absorbs this request instead: its payload becomes
+        coalesce(existing, new), its priority the higher of the two, and the
+        caller gets the shared job back with "coalesced": True.
+        """
+        job_id = f"{kind}-{int(time.time())}-{secrets.token_hex(4)}"
+        coalesced = False
+        with self._lock:
+            pending = None
+            if coalesce is not None:
+                pending = self._db.execute(
+                    "SELECT * FROM jobs WHERE kind = ? AND state = 'queued' ORDER BY enqueued_at LIMIT 1", (kind,)
+                ).fetchone()
+            if pending is not None:
+                job_id = pending["id"]
+                merged = coalesce(self._row(pending)["payload"], payload)  # type: ignore[index]
+                self._db.execute(
+                    "UPDATE jobs SET payload = ?, priority = MAX(priority, ?) WHERE id = ?",
+                    (json.dumps(merged), priority, job_id),
+                )
+                coalesced = True
+            else:
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, priority, payload, state, enqueued_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                    (job_id, kind, priority, json.dumps(payload), time.time()),
+                )
+            job = self._row(self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+            position = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND kind = ? AND (priority > ? OR (priority = ? AND enqueued_at < ?))",
+                (kind, job["priority"], job["priority"], job["enqueued_at"]),  # type: ignore[index]
+            ).fetchone()[0]
+        self.start()
+        self._wake.set()
+        job["queuePosition"] = position  # type: ignore[index]
+        job["coalesced"] = coalesced  # type: ignore[index]
+        return job  # type: ignore[return-value]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._row(self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, *, state: Optional[str] = None, kind: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        clauses, args = [], []  # type: ignore[var-annotated]
+        if state:
+            clauses.append("state = ?")
+            args.append(state)
+        if kind:
+            clauses.append("kind = ?")
+            args.append(kind)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM jobs {where} ORDER BY enqueued_at DESC LIMIT ?", (*args, max(1, limit))
+            ).fetchall()
+        return [self._row(row) for row in rows]  # type: ignore[misc]
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            rows = self._db.execute("SELECT kind, state, COUNT(*) AS n FROM jobs GROUP BY kind, state").fetchall()
+        out: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            out.setdefault(row["kind"], {})[row["state"]] = row["n"]
+        return out
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._recover()
+        threading.Thread(target=self._run, name="job-dispatcher", daemon=True).start()
+
+    def _recover(self) -> None:
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM jobs WHERE state = 'running'").fetchall()
+        for row in rows:
+            identity = row["pid_identity"]
+            alive = identity is not None and _pid_identity(row["pid"]) == identity
+            deadline = (row["started_at"] or 0) + self.orphan_max_seconds
+            if alive and time.time() < deadline:
+                print(f"[INFO] job queue adopting running job id={row['id']} pid={row['pid']}", flush=True)
+                threading.Thread(
+                    target=self._watch_orphan, args=(row["id"], row["pid"], identity, deadline), daemon=True
+                ).start()
+                continue
+            if alive:
+                print(f"[WARN] job queue stopping overdue orphan job id={row['id']} pid={row['pid']}", flush=True)
+                _stop_orphan(row["pid"])
+            if row["attempts"] < self.max_attempts:
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE jobs SET state = 'queued', pid = NULL, pid_identity = NULL, "
+                        "error = 'interrupted_by_restart' WHERE id = ?",
+                        (row["id"],),
+                    )
+                print(f"[INFO] job queue requeued interrupted job id={row['id']} attempts={row['attempts']}", flush=True)
+            else:
+                self._finish(row["id"], None, error="interrupted_by_restart")
+
+    def _watch_orphan(self, job_id: str, pid: int, identity: str, deadline: float) -> None:
+        # Not our child, so no exit code: poll until that process (not merely its pid) is gone.
+        while _pid_identity(pid) == identity:
+            if time.time() >= deadline:
+                print(f"[WARN] job queue stopping overdue orphan job id={job_id} pid={pid}", flush=True)
+                _stop_orphan(pid)
+                self._finish(job_id, None, state="failed", error="orphan_timeout")
+                return
+            time.sleep(self.orphan_poll_seconds)
+        self._finish(job_id, None, state="exited")
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(timeout=5)
+            self._wake.clear()
+            try:
+                while self._start_next():
+                    pass
+            except Exception:
+                logging.exception("[JOBS] dispatcher error")
+
+    def _start_next(self) -> bool:
+        with self._lock:
+            running = {
+                row["kind"]: row["n"]
+                for row in self._db.execute("SELECT kind, COUNT(*) AS n FROM jobs WHERE state = 'running' GROUP BY kind")
+            }
+            candidate = None
+            for row in self._db.execute("SELECT * FROM jobs WHERE state = 'queued' ORDER BY priority DESC, enqueued_at"):
+                limit = self.limits.get(row["kind"], 1)
+                if limit <= 0 or running.get(row["kind"], 0) < limit:
+                    candidate = row
+                    break
+            if candidate is None:
+                return False
+            self._db.execute(
+                "UPDATE jobs SET state = 'running', started_at = ?, attempts = attempts + 1, error = NULL WHERE id = ?",
+                (time.time(), candidate["id"]),
+            )
+        job = self._row(candidate)
+        runner = self._runners.get(job["kind"])  # type: ignore[index]
+        job_id = job["id"]  # type: ignore[index]
+        if runner is None:
+            self._finish(job_id, None, error="no_runner")
+            return True
+        try:
+            pid, log_path = runner(job, lambda rc: self._finish(job_id, rc))  # type: ignore[arg-type]
+        except Exception as exc:
+            print(f"[ERROR] job {job_id} failed to start: {exc!r}", flush=True)
+            self._finish(job_id, None, error=f"start_failed: {exc!r}")
+            return True
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET pid = COALESCE(?, pid), pid_identity = COALESCE(?, pid_identity), "
+                "log_path = COALESCE(?, log_path) WHERE id = ?",
+                (pid, _pid_identity(pid), log_path, job_id),
+            )
+        return True
+
+    def set_pid(self, job_id: str, pid: Optional[int]) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET pid = ?, pid_identity = ? WHERE id = ?", (pid, _pid_identity(pid), job_id)
+            )
+
+    def _finish(self, job_id: str, returncode: Optional[int], *, state: Optional[str] = None, error: Optional[str] = None) -> None:
+        if state is None:
+            state = "succeeded" if returncode == 0 else "failed"
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, exit_code = ?, finished_at = ?, error = COALESCE(?, error) WHERE id = ?",
+                (state, returncode, time.time(), error, job_id),
+            )
+            self._db.execute(
+                f"""
+                DELETE FROM jobs WHERE state IN ({",".join("?" * len(JOB_FINISHED_STATES))}) AND id NOT IN (
+                    SELECT id FROM jobs WHERE state IN ({",".join("?" * len(JOB_FINISHED_STATES))})
+                    ORDER BY finished_at DESC LIMIT ?
+                )
+                """,
+                (*JOB_FINISHED_STATES, *JOB_FINISHED_STATES, self.history),
+            )
+        self._wake.set()
+
+
+JOB_QUEUE = DurableJobQueue(
+    WEBHOOK_JOB_DB,
+    JOB_KIND_LIMITS,
+    WEBHOOK_JOB_HISTORY,
+    WEBHOOK_JOB_MAX_ATTEMPTS,
+    orphan_max_seconds=WEBHOOK_JOB_ORPHAN_MAX_SECONDS,
+)
+
+
+def _sim_job_runner(job: Dict[str, Any], on_done: SimJobDone) -> Tuple[Optional[int], Optional[str]]:
+    job_id = job["id"]
+    mode = _run_sim_job(
+        job["kind"],
+        job["payload"]["arg"],
+        on_done,
+        on_start=lambda pid: JOB_QUEUE.set_pid(job_id, pid),
+        job_id=job_id,
+    )
+    _, _, log_path = _sim_job_paths()
+    print(f"[sim_job] job id={job['id']} dispatched runner={mode}", flush=True)
+    return None, log_path
+
+
+def job_view(job: Dict[str, Any], *, include_tail: bool = False) -> Dict[str, Any]:
+    """API shape for one queue row; the tail comes from memory, else from the end of its log file."""
+    payload = dict(job.get("payload") or {})
+    payload.pop("logLine", None)
+    started = job.get("started_at")
+    finished = job.get("finished_at")
+    duration = None
+    if started:
+        duration = round((finished or time.time()) - started, 1)
+    view: Dict[str, Any] = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "args": payload,
+        "state": job["state"],
+        "priority": job["priority"],
+        "attempts": job["attempts"],
+        "pid": job.get("pid"),
+        "enqueuedAt": job["enqueued_at"],
+        "startedAt": started,
+        "finishedAt": finished,
+        "durationSec": duration,
+        "exitCode": job.get("exit_code"),
+        "logPath": job.get("log_path"),
+        "error": job.get("error"),
+    }
+    if include_tail:
+        tail = JOB_OUTPUT.get(job["id"])
+        if tail is None and job["kind"] in ("smt_ingest", "smt_archive_repost"):
+            # Ingest logs are per-job files (and the process may outlive us), so read the file end.
+            tail = _read_log_tail(job.get("log_path"), JOB_OUTPUT_TAIL_LINES)
+        view["outputTail"] = tail or []
+    return view
+
+
+JOB_QUEUE.register_runner("gapfill_compare", _sim_job_runner)
+JOB_QUEUE.register_runner("past_sim_recalc", _sim_job_runner)
 
 
 def handle_gapfill_compare(payload: dict) -> bytes:
     """Authenticated trigger only: shared TS runner (no compare math in Python).
 
-    Spawn failures raise so the HTTP server returns 500; Vercel can mark the run failed.
+    A missing runner raises so the HTTP server returns 500 and Vercel can mark the
+    run failed; otherwise the job is queued and later start failures land on the job.
     """
     compare_run_id = str(payload.get("compareRunId") or "").strip()
     if not compare_run_id:
@@ -569,8 +2488,10 @@ def handle_gapfill_compare(payload: dict) -> bytes:
     runner = os.path.join(app_root, "scripts", "droplet", "sim-job-run.ts")
     if not os.path.isfile(runner):
         raise FileNotFoundError(runner)
-    _spawn_sim_job_tsx("gapfill_compare", compare_run_id)
-    return json.dumps({"ok": True, "queued": True, "compareRunId": compare_run_id}).encode("utf-8")
+    job = JOB_QUEUE.enqueue("gapfill_compare", {"arg": compare_run_id}, _job_priority(payload, "gapfill_compare"))
+    return json.dumps(
+        {"ok": True, "queued": True, "compareRunId": compare_run_id, "jobId": job["id"], "queuePosition": job["queuePosition"]}
+    ).encode("utf-8")
 
 
 def handle_past_sim_recalc(payload: dict) -> bytes:
@@ -582,8 +2503,10 @@ def handle_past_sim_recalc(payload: dict) -> bytes:
     runner = os.path.join(app_root, "scripts", "droplet", "sim-job-run.ts")
     if not os.path.isfile(runner):
         raise FileNotFoundError(runner)
-    _spawn_sim_job_tsx("past_sim_recalc", job_id)
-    return json.dumps({"ok": True, "queued": True, "jobId": job_id}).encode("utf-8")
+    job = JOB_QUEUE.enqueue("past_sim_recalc", {"arg": job_id}, _job_priority(payload, "past_sim_recalc"))
+    return json.dumps(
+        {"ok": True, "queued": True, "jobId": job_id, "queueJobId": job["id"], "queuePosition": job["queuePosition"]}
+    ).encode("utf-8")
 
 
 def handle_smt_authorized(payload: dict) -> bytes:
@@ -592,8 +2515,9 @@ def handle_smt_authorized(payload: dict) -> bytes:
 
     This both:
     - Logs the key SMT auth fields for observability.
-    - Kicks off an on-demand SMT ingest by calling the existing
-      deploy/smt/fetch_and_post.sh script with ESIID_DEFAULT set.
+    - Kicks off an on-demand SMT ingest for that ESIID: the native engine
+      (smt_ingest.py) on a worker thread, or deploy/smt/fetch_and_post.sh with
+      ESIID_DEFAULT set when the engine is unavailable or disabled.
     """
 
     reason = payload.get("reason")
@@ -631,72 +2555,399 @@ def handle_smt_authorized(payload: dict) -> bytes:
         return (log_line + "\n" + warn + "\n").encode()
 
     # Use the existing ingest pipeline:
-    #   SMT SFTP → /home/deploy/smt_inbox → deploy/smt/fetch_and_post.sh (inline POST)
-    # We set ESIID_DEFAULT for this run so the script knows which meter to focus on.
-    env_prefix = f"ESIID_DEFAULT={esiid}"
-    if force_repost:
-        env_prefix = env_prefix + " SMT_FORCE_REPOST=true"
+    #   SMT SFTP → /home/deploy/smt_inbox → smt_ingest.run_ingest (or fetch_and_post.sh) → upload
+    # IMPORTANT:
+    # This handler is invoked by Vercel /api/admin/smt/pull. Vercel may enforce
+    # strict request timeouts, so we must not block for the full ingest run.
+    # The run goes on the durable job queue (user refreshes ahead of admin
+    # batches, one ingest at a time) and we return the job id immediately.
+    # Triggers that arrive while an ingest is running all fold into the single
+    # queued follow-up pass, so every caller gets that pass's job id.
+    try:
+        job = JOB_QUEUE.enqueue(
+            "smt_ingest",
+            {
+                "targets": [{"esiid": esiid, "forceRepost": force_repost}],
+                "reasons": [reason],
+                "triggers": 1,
+                "logLine": log_line,
+            },
+            _job_priority(payload, str(reason or "")),
+            coalesce=_coalesce_ingest_payload,
+        )
+    except Exception as e:
+        msg = f"[ERROR] Failed to queue SMT ingest for ESIID={esiid!r}: {e!r}"
+        print(msg, flush=True)
+        return (log_line + "\n" + msg + "\n").encode()
+
+    queued = (
+        f"[INFO] SMT ingest queued for ESIID={esiid!r} jobId={job['id']} "
+        f"priority={job['priority']} queuePosition={job['queuePosition']} "
+        f"coalesced={job['coalesced']} esiids={len(_ingest_targets(job['payload']))}"
+    )
+    print(queued, flush=True)
+    return (log_line + "\n" + queued + "\n").encode()
+
+
+def _ingest_targets(job_payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    targets = job_payload.get("targets")
+    if isinstance(targets, list):
+        return targets
+    # Rows queued before coalescing carried a single ESIID.
+    return [{"esiid": job_payload.get("esiid"), "forceRepost": bool(job_payload.get("forceRepost"))}]
+
+
+def _coalesce_ingest_payload(existing: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Union of ESIIDs (first-come order); forceRepost sticks once any trigger asked for it."""
+    targets = [dict(t) for t in _ingest_targets(existing)]
+    by_esiid = {t["esiid"]: t for t in targets}
+    for target in _ingest_targets(new):
+        current = by_esiid.get(target["esiid"])
+        if current is None:
+            current = dict(target)
+            targets.append(current)
+            by_esiid[current["esiid"]] = current
+        elif target.get("forceRepost"):
+            current["forceRepost"] = True
+    merged = dict(existing)
+    merged["targets"] = targets
+    merged["reasons"] = sorted({str(r) for r in (existing.get("reasons") or []) + (new.get("reasons") or [])})
+    merged["triggers"] = int(existing.get("triggers") or 1) + int(new.get("triggers") or 1)
+    return merged
+
+
+def _start_smt_ingest(job: Dict[str, Any], on_done: SimJobDone) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Job-queue runner: one fetch_and_post.sh pass in its own session.
+
+    A coalesced job covers several ESIIDs. The script tags every inbox file with
+    ESIID_DEFAULT, so it runs once per ESIID, but only the first run does the
+    SFTP sync; the rest post from the freshly synced inbox (SMT_SKIP_SFTP).
+    """
+    job_payload = job["payload"]
+    targets = _ingest_targets(job_payload)
+    esiid = targets[0]["esiid"] if len(targets) == 1 else f"batch{len(targets)}"
+
+    steps = []
+    for index, target in enumerate(targets):
+        # We set ESIID_DEFAULT for this run so the script knows which meter to focus on.
+        env_prefix = f"ESIID_DEFAULT={shlex.quote(str(target['esiid']))}"
+        if target.get("forceRepost"):
+            env_prefix = env_prefix + " SMT_FORCE_REPOST=true"
+        if index > 0:
+            env_prefix = env_prefix + " SMT_SKIP_SFTP=true"
+        steps.append(f"{{ {env_prefix} deploy/smt/fetch_and_post.sh || rc=1; }}")
+
+    ingest_cmd = "cd /home/deploy/apps/intelliwatt && rc=0; " + "; ".join(steps) + "; exit $rc"
+
+    print(f"[INFO] Starting SMT ingest via: {ingest_cmd} jobId={job['id']}", flush=True)
+
+    logs_dir = "/home/deploy/smt_ingest/logs"
+    try:
+        os.makedirs(logs_dir, exist_ok=True)
+    except Exception as e:
+        print(f"[WARN] Could not create logs dir {logs_dir!r}: {e!r}", flush=True)
+
+    ts = int(time.time())
+    log_path = os.path.join(logs_dir, f"ingest_{esiid}_{ts}.log")
+
+    def _wait_and_log(proc: subprocess.Popen, esiid_for_log: str, path_for_log: str) -> None:
+        rc: Optional[int] = None
+        try:
+            rc = proc.wait()
+            print(
+                f"[INFO] SMT ingest finished for ESIID={esiid_for_log!r} rc={rc} log={path_for_log}",
+                flush=True,
+            )
+        except Exception as e2:
+            print(
+                f"[ERROR] SMT ingest wait/log failed for ESIID={esiid_for_log!r}: {e2!r}",
+                flush=True,
+            )
+        _track_background_end("smt_ingest", rc)
+        on_done(rc)
+
+    with open(log_path, "a", encoding="utf-8") as lf:
+        if job_payload.get("logLine"):
+            lf.write(job_payload["logLine"] + "\n")
+        lf.write(f"[INFO] Starting SMT ingest via: {ingest_cmd} jobId={job['id']}\n")
+        lf.flush()
+
+        proc = subprocess.Popen(
+            ["/bin/bash", "-lc", ingest_cmd],
+            stdout=lf,
+            stderr=lf,
+            text=True,
+            start_new_session=True,
+        )
+
+    print(f"[INFO] SMT ingest started for ESIID={esiid!r} pid={proc.pid} log={log_path}", flush=True)
+    _track_background_start("smt_ingest")
+    threading.Thread(target=_wait_and_log, args=(proc, esiid, log_path), daemon=True).start()
+    return proc.pid, log_path
+
+
+# Native ingest engine (deploy/droplet/smt_ingest.py). It ships next to this file
+# in the repo checkout systemd runs; a standalone /home/deploy/webhook_server.py
+# copy has no sibling module and keeps using fetch_and_post.sh.
+try:
+    import smt_archive
+    import smt_ingest
+    import smt_intervals
+except ImportError:
+    smt_archive = None  # type: ignore[assignment]
+    smt_ingest = None  # type: ignore[assignment]
+    smt_intervals = None  # type: ignore[assignment]
+
+SMT_INGEST_ENGINE = (os.environ.get("SMT_INGEST_ENGINE") or "python").strip().lower()
+
+# Interval coverage index the native engine keeps in its ledger (smt_coverage.py).
+try:
+    import smt_coverage
+except ImportError:
+    smt_coverage = None  # type: ignore[assignment]
+
+SMT_COVERAGE_WINDOW_DAYS = int(os.environ.get("SMT_COVERAGE_WINDOW_DAYS", "365"))
+SMT_COVERAGE_MERGE_GAP_DAYS = int(os.environ.get("SMT_COVERAGE_MERGE_GAP_DAYS", "2"))
+SMT_COVERAGE_BACKFILL_COOLDOWN_HOURS = float(os.environ.get("SMT_COVERAGE_BACKFILL_COOLDOWN_HOURS", "24"))
+SMT_COVERAGE_AUTO_BACKFILL = (os.environ.get("SMT_COVERAGE_AUTO_BACKFILL") or "").strip().lower() in ("1", "true", "yes")
+
+_coverage_store: Optional[Any] = None
+_coverage_lock = threading.Lock()
+
+
+def coverage_store() -> Optional[Any]:
+    """The shared CoverageStore over the ingest ledger, or None when the native engine is not available."""
+    global _coverage_store
+    if smt_coverage is None or smt_ingest is None:
+        return None
+    with _coverage_lock:
+        if _coverage_store is None:
+            config = smt_ingest.IngestConfig.from_env()
+            os.makedirs(os.path.dirname(config.ledger_file()) or ".", exist_ok=True)
+            _coverage_store = smt_coverage.CoverageStore(
+                config.ledger_file(), retention_days=config.ledger_retention_days or 400.0
+            )
+        return _coverage_store
+
+
+def coverage_window(start_date: Optional[str], end_date: Optional[str]) -> Tuple[int, int]:
+    """
+    Chicago day numbers for an inclusive window; defaults to the last
+    SMT_COVERAGE_WINDOW_DAYS ending yesterday. ValueError for anything but date strings.
+    """
+    for value in (start_date, end_date):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"dates must be MM/DD/YYYY or YYYY-MM-DD strings, got {value!r}")
+    end = smt_intervals.parse_day(end_date) if end_date else smt_intervals.chicago_day(int(time.time())) - 1
+    start = smt_intervals.parse_day(start_date) if start_date else end - max(1, SMT_COVERAGE_WINDOW_DAYS) + 1
+    if start > end:
+        raise ValueError("startDate is after endDate")
+    return start, end
+
+
+def coverage_backfill(
+    esiids: List[str],
+    start_day: int,
+    end_day: int,
+    *,
+    dry_run: bool = False,
+    force: bool = False,
+    through_last_covered: bool = False,
+) -> Dict[str, Any]:
+    """
+    Submit SMT interval backfills for just the windows the coverage index says
+    are missing. Windows already requested within the cooldown are skipped
+    unless `force`. `through_last_covered` stops each ESIID's window at its
+    newest covered day, so files that simply have not arrived yet are not requested.
+    """
+    store = coverage_store()
+    since = time.time() - SMT_COVERAGE_BACKFILL_COOLDOWN_HOURS * 3600
+    items: List[Dict[str, str]] = []
+    skipped: List[Dict[str, str]] = []
+    for esiid in esiids:
+        last_day = end_day
+        if through_last_covered:
+            _, last = store.load(esiid).bounds()
+            if last is None:
+                continue
+            last_day = min(end_day, smt_intervals.chicago_day(last * smt_coverage.SLOT_SECONDS))
+        if last_day < start_day:
+            continue
+        report = store.report(esiid, start_day, last_day, merge_gap_days=SMT_COVERAGE_MERGE_GAP_DAYS)
+        for window in report["backfillWindows"]:
+            item = {"esiid": esiid, "startDate": window["startDate"], "endDate": window["endDate"]}
+            first, last = smt_intervals.parse_day(item["startDate"]), smt_intervals.parse_day(item["endDate"])
+            if not force and store.recent_backfill(esiid, first, last, since):
+                skipped.append(item)
+            else:
+                items.append(item)
+
+    if dry_run or not items:
+        return {"ok": True, "dryRun": dry_run, "requests": items, "skipped": skipped, "chunks": []}
+
+    chunks = smt_request_interval_backfill_batch(items)
+    for chunk in chunks:
+        if not chunk.get("ok"):
+            continue
+        chunk["tracked"] = BACKFILL_TRACKER.track(
+            chunk["jobId"],
+            esiids=chunk["esiids"],
+            startDate=chunk["startDate"],
+            endDate=chunk["endDate"],
+            plannedFrom="coverage",
+        )
+        first, last = smt_intervals.parse_day(chunk["startDate"]), smt_intervals.parse_day(chunk["endDate"])
+        for esiid in chunk["esiids"]:
+            store.record_backfill(esiid, first, last, chunk["jobId"])
+
+    accepted = sum(1 for chunk in chunks if chunk.get("ok"))
+    log_event(
+        "DEBUG",
+        "SMT_DEBUG",
+        "coverage_backfill",
+        esiids=len(esiids),
+        windows=len(items),
+        skipped=len(skipped),
+        chunks=len(chunks),
+        accepted=accepted,
+    )
+    return {
+        "ok": accepted == len(chunks),
+        "dryRun": False,
+        "requests": items,
+        "skipped": skipped,
+        "accepted": accepted,
+        "rejected": len(chunks) - accepted,
+        "chunks": chunks,
+    }
 
-    ingest_cmd = "cd /home/deploy/apps/intelliwatt && " + env_prefix + " deploy/smt/fetch_and_post.sh"
 
-    print(f"[INFO] Starting SMT ingest via: {ingest_cmd}", flush=True)
+def _start_smt_ingest_native(job: Dict[str, Any], on_done: SimJobDone) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Job-queue runner: the same pass as _start_smt_ingest, on a worker thread.
 
-    # IMPORTANT:
-    # This handler is invoked by Vercel /api/admin/smt/pull. Vercel may enforce
-    # strict request timeouts, so we must not block for the full ingest run.
-    # We start ingest in the background and return immediately, while still
-    # logging completion to journal via a daemon thread.
+    No pid is recorded, so a restart mid-run requeues the job (see
+    DurableJobQueue on adoption); reposting is safe because finished files are
+    already in .posted_sha256.
+    """
+    job_id = job["id"]
+    job_payload = job["payload"]
+    targets = _ingest_targets(job_payload)
+    esiid = targets[0]["esiid"] if len(targets) == 1 else f"batch{len(targets)}"
 
     logs_dir = "/home/deploy/smt_ingest/logs"
     try:
         os.makedirs(logs_dir, exist_ok=True)
     except Exception as e:
         print(f"[WARN] Could not create logs dir {logs_dir!r}: {e!r}", flush=True)
+    log_path = os.path.join(logs_dir, f"ingest_{esiid}_{int(time.time())}.log")
+    lf = open(log_path, "a", encoding="utf-8")
+    log_lock = threading.Lock()
+
+    def _log(message: str) -> None:
+        line = f"[{_log_timestamp()}] {message}"
+        with log_lock:
+            lf.write(line + "\n")
+            lf.flush()
+        JOB_OUTPUT.append(job_id, line)
 
-    ts = int(time.time())
-    log_path = os.path.join(logs_dir, f"ingest_{esiid}_{ts}.log")
-
-    def _wait_and_log(proc: subprocess.Popen, esiid_for_log: str, path_for_log: str) -> None:
+    def _run() -> None:
+        rc: Optional[int] = None
         try:
-            rc = proc.wait()
-            print(
-                f"[INFO] SMT ingest finished for ESIID={esiid_for_log!r} rc={rc} log={path_for_log}",
-                flush=True,
-            )
-        except Exception as e2:
-            print(
-                f"[ERROR] SMT ingest wait/log failed for ESIID={esiid_for_log!r}: {e2!r}",
-                flush=True,
-            )
+            rc = smt_ingest.run_ingest(targets, _log, METRICS)
+            if rc == 0 and SMT_COVERAGE_AUTO_BACKFILL and coverage_store() is not None:
+                start_day, end_day = coverage_window(None, None)
+                result = coverage_backfill(
+                    [t["esiid"] for t in targets], start_day, end_day, through_last_covered=True
+                )
+                for item in result["requests"]:
+                    _log(f"Coverage backfill {item['esiid']} {item['startDate']}-{item['endDate']}")
+                if result["chunks"] and not result["ok"]:
+                    _log(f"WARN: coverage backfill rejected {result['rejected']} of {len(result['chunks'])} request(s)")
+        except Exception as e:
+            _log(f"ERROR: native ingest crashed: {e!r}")
+            logging.exception("[SMT_INGEST] native ingest crashed jobId=%s", job_id)
+            rc = 1
+        finally:
+            lf.close()
+        print(f"[INFO] SMT ingest finished for ESIID={esiid!r} rc={rc} log={log_path} engine=python", flush=True)
+        _track_background_end("smt_ingest", rc)
+        on_done(rc)
+
+    if job_payload.get("logLine"):
+        _log(job_payload["logLine"])
+    _log(f"Starting native SMT ingest jobId={job_id} esiids={[t['esiid'] for t in targets]}")
+    print(f"[INFO] SMT ingest started for ESIID={esiid!r} engine=python log={log_path}", flush=True)
+    _track_background_start("smt_ingest")
+    threading.Thread(target=_run, name=f"smt-ingest-{job_id}", daemon=True).start()
+    return None, log_path
+
+
+def _start_smt_ingest_job(job: Dict[str, Any], on_done: SimJobDone) -> Tuple[Optional[int], Optional[str]]:
+    if smt_ingest is not None and SMT_INGEST_ENGINE != "script":
+        return _start_smt_ingest_native(job, on_done)
+    return _start_smt_ingest(job, on_done)
+
+
+JOB_QUEUE.register_runner("smt_ingest", _start_smt_ingest_job)
+
+
+def interval_archive() -> Optional[Any]:
+    """The local interval archive the native engine writes, or None when it is unavailable or off."""
+    if smt_ingest is None:
+        return None
+    config = smt_ingest.IngestConfig.from_env()
+    return smt_archive.IntervalArchive(config.archive_dir) if config.archive else None
+
 
+def _archive_safe_esiid(esiid: str) -> bool:
     try:
-        with open(log_path, "a", encoding="utf-8") as lf:
-            lf.write(log_line + "\n")
-            lf.write(f"[INFO] Starting SMT ingest via: {ingest_cmd}\n")
-            lf.flush()
+        return smt_archive.esiid_key(esiid) == esiid
+    except ValueError:
+        return False
 
-            proc = subprocess.Popen(
-                ["/bin/bash", "-lc", ingest_cmd],
-                stdout=lf,
-                stderr=lf,
-                text=True,
-                start_new_session=True,
-            )
 
-        print(f"[INFO] SMT ingest started for ESIID={esiid!r} pid={proc.pid} log={log_path}", flush=True)
-        threading.Thread(target=_wait_and_log, args=(proc, esiid, log_path), daemon=True).start()
+def _start_smt_archive_repost(job: Dict[str, Any], on_done: SimJobDone) -> Tuple[Optional[int], Optional[str]]:
+    """Job-queue runner: smt_ingest.repost_archive for one ESIID and window, on a worker thread."""
+    job_id = job["id"]
+    payload = job["payload"]
+    esiid = str(payload.get("esiid") or "")
+    if smt_ingest is None:
+        raise RuntimeError("native ingest engine unavailable")
+
+    logs_dir = "/home/deploy/smt_ingest/logs"
+    os.makedirs(logs_dir, exist_ok=True)
+    log_path = os.path.join(logs_dir, f"archive_repost_{smt_archive.esiid_key(esiid)}_{int(time.time())}.log")
+    lf = open(log_path, "a", encoding="utf-8")
+
+    def _log(message: str) -> None:
+        line = f"[{_log_timestamp()}] {message}"
+        lf.write(line + "\n")
+        lf.flush()
+        JOB_OUTPUT.append(job_id, line)
+
+    def _run() -> None:
+        rc: Optional[int] = None
+        try:
+            start_day, end_day = coverage_window(payload.get("startDate"), payload.get("endDate"))
+            rc = smt_ingest.repost_archive(esiid, start_day, end_day, _log, METRICS)
+        except Exception as e:
+            _log(f"ERROR: archive repost crashed: {e!r}")
+            logging.exception("[SMT_INGEST] archive repost crashed jobId=%s", job_id)
+            rc = 1
+        finally:
+            lf.close()
+        print(f"[INFO] SMT archive repost finished for ESIID={esiid!r} rc={rc} log={log_path}", flush=True)
+        _track_background_end("smt_archive_repost", rc)
+        on_done(rc)
+
+    _track_background_start("smt_archive_repost")
+    threading.Thread(target=_run, name=f"smt-archive-repost-{job_id}", daemon=True).start()
+    return None, log_path
 
-        body = "\n".join(
-            [
-                log_line,
-                f"[INFO] SMT ingest started for ESIID={esiid!r} pid={proc.pid} log={log_path}",
-            ]
-        ) + "\n"
-        return body.encode()
-    except Exception as e:
-        msg = f"[ERROR] Failed to start SMT ingest for ESIID={esiid!r}: {e!r}"
-        print(msg, flush=True)
-        return (log_line + "\n" + msg + "\n").encode()
+
+JOB_QUEUE.register_runner("smt_archive_repost", _start_smt_archive_repost)
 
 
 def handle_smt_meter_info(payload: dict) -> bytes:
@@ -805,7 +3056,7 @@ def handle_smt_meter_info(payload: dict) -> bytes:
     response_summary = "[WARN] smt_meter_info missing APP_BASE_URL or WEBHOOK_SECRET; payload not sent"
     if APP_BASE_URL and WEBHOOK_SECRET:
         try:
-            resp = requests.post(
+            resp = APP_HTTP.post(
                 f"{APP_BASE_URL}/api/admin/smt/meter-info",
                 headers={
                     "content-type": "application/json",
@@ -822,6 +3073,8 @@ def handle_smt_meter_info(payload: dict) -> bytes:
             response_summary = (
                 f"[ERROR] smt_meter_info POST to app failed: {exc!r}"
             )
+        # Fresh meter data may now be in the app; drop any cached (or negative) lookup.
+        METER_INFO_CACHE.invalidate(esiid)
     else:
         print(
             "[WARN] smt_meter_info cannot POST back to app; APP_BASE_URL or WEBHOOK_SECRET missing",
@@ -861,7 +3114,7 @@ def _post_meter_info_error(
         payload["rawPayload"] = raw_payload
 
     try:
-        resp = requests.post(
+        resp = APP_HTTP.post(
             f"{APP_BASE_URL}/api/admin/smt/meter-info",
             headers={
                 "content-type": "application/json",
@@ -882,13 +3135,53 @@ def _post_meter_info_error(
         )
 
 
-def get_smt_access_token() -> str:
+def _smt_token_expires_at(data: Dict[str, Any], token: str, now: float) -> float:
+    """
+    Work out when an SMT access token expires (epoch seconds).
+
+    Prefers the explicit expiresAt/expiresIn fields from the token response, then
+    the JWT `exp` claim, then falls back to SMT's documented one-hour lifetime.
+    """
+
+    expires_at_raw = data.get("expiresAt")
+    if isinstance(expires_at_raw, str) and expires_at_raw.strip():
+        try:
+            parsed = datetime.fromisoformat(expires_at_raw.strip().replace("Z", "+00:00"))
+            if parsed.tzinfo is not None:
+                expires_at = parsed.timestamp()
+                if expires_at > now:
+                    return expires_at
+        except ValueError:
+            pass
+
+    expires_in_raw = data.get("expiresIn") or data.get("expires_in")
+    try:
+        expires_in = float(str(expires_in_raw).strip())
+        if expires_in > 0:
+            return now + expires_in
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        claims_segment = token.split(".")[1]
+        claims_segment += "=" * (-len(claims_segment) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(claims_segment.encode("ascii")))
+        exp = claims.get("exp") if isinstance(claims, dict) else None
+        if isinstance(exp, (int, float)) and exp > now:
+            return float(exp)
+    except Exception:
+        pass
+
+    return now + 3600
+
+
+def _fetch_smt_access_token() -> Tuple[str, float]:
     if not SMT_PASSWORD:
         raise Exception("SMT_PASSWORD is not configured")
 
     token_url = f"{SMT_API_BASE_URL}/v2/token/"
     try:
-        resp = requests.post(
+        resp = SMT_HTTP.post(
             token_url,
             json={"username": SMT_USERNAME, "password": SMT_PASSWORD},
             timeout=30,
@@ -908,17 +3201,420 @@ def get_smt_access_token() -> str:
     if not token or not isinstance(token, str):
         raise Exception("SMT token response missing accessToken")
 
-    return token
+    return token, _smt_token_expires_at(data, token, time.time())
 
 
-def smt_post(path_or_url: str, body: Dict[str, Any]) -> Dict[str, Any]:
-    token = get_smt_access_token()
+class SmtTokenCache:
+    """
+    Process-wide SMT access token cache.
+
+    - Tokens are reused until `expiry_skew` seconds before they expire.
+    - Inside the `refresh_margin` window a single background refresh is started
+      while callers keep using the still-valid token.
+    - Concurrent callers that need a new token wait on one in-flight fetch
+      instead of each hitting /v2/token/ (single-flight).
+    """
+
+    def __init__(self, fetcher: Any, *, refresh_margin: float, expiry_skew: float):
+        self._fetcher = fetcher
+        self.refresh_margin = refresh_margin
+        self.expiry_skew = expiry_skew
+        self._cond = threading.Condition(threading.Lock())
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing = False
+        self._generation = 0
+        self._last_error: Optional[BaseException] = None
+        self.fetch_count = 0
+        self.fetch_errors = 0
+
+    def _usable_locked(self, now: float) -> bool:
+        return bool(self._token) and now < self._expires_at - self.expiry_skew
+
+    def get(self, *, force_refresh: bool = False, stale_token: Optional[str] = None) -> str:
+        """
+        Return a valid token. `force_refresh` (used after a 401) discards the
+        cached token; passing the rejected `stale_token` lets callers that raced
+        on the same 401 share whichever refresh lands first.
+        """
+
+        with self._cond:
+            while True:
+                now = time.time()
+                if force_refresh and stale_token is not None and self._token != stale_token:
+                    force_refresh = False
+                if not force_refresh and self._usable_locked(now):
+                    if now >= self._expires_at - self.refresh_margin and not self._refreshing:
+                        self._refreshing = True
+                        threading.Thread(
+                            target=self._refresh_in_background,
+                            name="smt-token-refresh",
+                            daemon=True,
+                        ).start()
+                    return self._token  # type: ignore[return-value]
+                if not self._refreshing:
+                    self._refreshing = True
+                    break
+                generation = self._generation
+                self._cond.wait(timeout=35)
+                if self._generation != generation:
+                    # The refresh we waited on finished; its result satisfies a forced refresh too.
+                    force_refresh = False
+                    stale_token = None
+                    if self._last_error is not None and not self._usable_locked(time.time()):
+                        raise Exception(f"SMT token refresh failed: {self._last_error}")
+
+        return self._run_fetch()
+
+    def invalidate(self) -> None:
+        with self._cond:
+            self._token = None
+            self._expires_at = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            remaining = self._expires_at - time.time() if self._token else 0.0
+            return {
+                "cached": bool(self._token),
+                "remainingSec": max(0, int(remaining)),
+                "refreshing": self._refreshing,
+                "fetchCount": self.fetch_count,
+                "fetchErrors": self.fetch_errors,
+            }
+
+    def _run_fetch(self) -> str:
+        try:
+            token, expires_at = self._fetcher()
+        except BaseException as exc:
+            with self._cond:
+                self._refreshing = False
+                self._last_error = exc
+                self.fetch_errors += 1
+                self._generation += 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._token = token
+            self._expires_at = expires_at
+            self._refreshing = False
+            self._last_error = None
+            self.fetch_count += 1
+            self._generation += 1
+            self._cond.notify_all()
+        logging.info(
+            "[SMT_PROXY] token refreshed expires_in=%ss",
+            int(expires_at - time.time()),
+        )
+        return token
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self._run_fetch()
+        except Exception as exc:
+            # The current token is still valid; the next caller retries the refresh.
+            logging.warning("[SMT_PROXY] background token refresh failed: %s", exc)
+
+
+SMT_TOKEN_CACHE = SmtTokenCache(
+    _fetch_smt_access_token,
+    refresh_margin=float(os.environ.get("SMT_TOKEN_REFRESH_MARGIN_SECONDS", "300")),
+    expiry_skew=float(os.environ.get("SMT_TOKEN_EXPIRY_SKEW_SECONDS", "30")),
+)
+
+
+def get_smt_access_token(*, force_refresh: bool = False, stale_token: Optional[str] = None) -> str:
+    return SMT_TOKEN_CACHE.get(force_refresh=force_refresh, stale_token=stale_token)
+
+
+# Client-side protection for SMT: per-endpoint token buckets plus one circuit breaker.
+SMT_RATE_LIMIT_PER_SECOND = float(os.environ.get("SMT_RATE_LIMIT_PER_SECOND", "5"))
+SMT_RATE_LIMIT_BURST = float(os.environ.get("SMT_RATE_LIMIT_BURST", "10"))
+SMT_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("SMT_RATE_LIMIT_MAX_WAIT_SECONDS", "10"))
+SMT_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("SMT_CIRCUIT_FAILURE_THRESHOLD", "5"))
+SMT_CIRCUIT_OPEN_SECONDS = float(os.environ.get("SMT_CIRCUIT_OPEN_SECONDS", "30"))
+
+
+class SmtUnavailableError(Exception):
+    """Raised without contacting SMT when the rate limiter or circuit breaker refuses a call."""
+
+    def __init__(self, code: str, retry_after: float, url: Optional[str] = None):
+        super().__init__(f"{code} (retry after {retry_after:.1f}s)")
+        self.code = code
+        self.retry_after = retry_after
+        self.url = url
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets. Callers wait up to `max_wait` for a token, then fail fast."""
+
+    def __init__(self, rate: float, burst: float, max_wait: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_wait = max_wait
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, key: str, max_wait: Optional[float] = None) -> None:
+        if self.rate <= 0:
+            return
+        wait_budget = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        deadline = time.monotonic() + wait_budget
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                bucket = self._buckets.setdefault(key, [self.burst, now])
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] >= 1.0:
+                    bucket[0] -= 1.0
+                    return
+                wait = (1.0 - bucket[0]) / self.rate
+                if now + wait > deadline:
+                    self.rejected += 1
+                    raise SmtUnavailableError("smt_rate_limited", wait)
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    Opens after `failure_threshold` consecutive failures, rejects calls for
+    `open_seconds`, then lets one probe through; the probe's outcome closes or
+    re-opens the circuit.
+    """
 
+    def __init__(self, name: str, failure_threshold: int, open_seconds: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.short_circuited = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "open":
+                remaining = self.opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self.short_circuited += 1
+                    raise SmtUnavailableError("smt_circuit_open", remaining)
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    self.short_circuited += 1
+                    raise SmtUnavailableError("smt_circuit_open", 1.0)
+                self._probe_in_flight = True
+
+    def release(self) -> None:
+        """Give back a half-open probe slot that was reserved but never used."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            if success:
+                if self.state != "closed":
+                    logging.warning("[SMT_PROXY] circuit %s closed", self.name)
+                self.state = "closed"
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (
+                self.state == "closed" and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.opens += 1
+                logging.warning(
+                    "[SMT_PROXY] circuit %s opened after %s consecutive failures",
+                    self.name,
+                    self.consecutive_failures,
+                )
+
+
+SMT_RATE_LIMITER = TokenBucketLimiter(
+    SMT_RATE_LIMIT_PER_SECOND,
+    SMT_RATE_LIMIT_BURST,
+    SMT_RATE_LIMIT_MAX_WAIT_SECONDS,
+)
+SMT_CIRCUIT = CircuitBreaker("smt", SMT_CIRCUIT_FAILURE_THRESHOLD, SMT_CIRCUIT_OPEN_SECONDS)
+
+
+# Retry policy for smt_post. Reads are retried on transport errors and on the
+# statuses below; writes only when the request provably never reached SMT.
+SMT_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("SMT_REQUEST_TIMEOUT_SECONDS", "60"))
+SMT_RETRY_MAX_ATTEMPTS = int(os.environ.get("SMT_RETRY_MAX_ATTEMPTS", "3"))
+SMT_RETRY_BASE_SECONDS = float(os.environ.get("SMT_RETRY_BASE_SECONDS", "0.5"))
+SMT_RETRY_MAX_BACKOFF_SECONDS = float(os.environ.get("SMT_RETRY_MAX_BACKOFF_SECONDS", "5"))
+SMT_MIN_ATTEMPT_SECONDS = 1.0
+SMT_IDEMPOTENT_PATHS = {
+    "/v2/reportrequeststatus/",
+    "/v2/myagreements/",
+    "/v2/mysubscriptions/",
+    "/v2/agreementesiids/",
+}
+SMT_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Per-thread request context; carries the caller's end-to-end deadline (time.monotonic()).
+_REQUEST_CONTEXT = threading.local()
+
+
+def current_deadline() -> Optional[float]:
+    return getattr(_REQUEST_CONTEXT, "deadline", None)
+
+
+class request_deadline:
+    """Context manager that sets the calling thread's deadline (None clears it)."""
+
+    def __init__(self, deadline: Optional[float]):
+        self.deadline = deadline
+        self._previous: Optional[float] = None
+
+    def __enter__(self) -> "request_deadline":
+        self._previous = current_deadline()
+        _REQUEST_CONTEXT.deadline = self.deadline
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _REQUEST_CONTEXT.deadline = self._previous
+
+
+class SmtTransportError(Exception):
+    """SMT could not be reached or did not answer; `never_sent` marks failures before the request left."""
+
+    def __init__(self, message: str, never_sent: bool):
+        super().__init__(message)
+        self.never_sent = never_sent
+
+
+def _request_never_sent(exc: requests.RequestException) -> bool:
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError) and exc.args:
+        reason = getattr(exc.args[0], "reason", None)
+        return type(reason).__name__ in ("NewConnectionError", "NameResolutionError")
+    return False
+
+
+def smt_post(path_or_url: str, body: Dict[str, Any]) -> Dict[str, Any]:
     if path_or_url.startswith("http://") or path_or_url.startswith("https://"):
         url = path_or_url
     else:
         url = f"{SMT_API_BASE_URL}{path_or_url}"
 
+    endpoint = urlparse(url).path.lower() or "/"
+    idempotent = endpoint in SMT_IDEMPOTENT_PATHS
+    deadline = current_deadline()
+    attempt = 0
+
+    while True:
+        attempt += 1
+        timeout = _attempt_timeout(url, deadline)
+
+        last_error: Optional[SmtTransportError] = None
+        result: Optional[Dict[str, Any]] = None
+        try:
+            result = _smt_post_guarded(url, endpoint, body, timeout, deadline)
+        except SmtTransportError as exc:
+            if not (idempotent or exc.never_sent):
+                raise
+            last_error = exc
+        else:
+            if not idempotent or result["status"] not in SMT_RETRYABLE_STATUSES:
+                return result
+
+        # Full jitter, and never sleep past the point where another attempt could fit.
+        backoff = random.uniform(0, min(SMT_RETRY_MAX_BACKOFF_SECONDS, SMT_RETRY_BASE_SECONDS * (2 ** (attempt - 1))))
+        out_of_time = deadline is not None and time.monotonic() + backoff + SMT_MIN_ATTEMPT_SECONDS > deadline
+        if attempt >= SMT_RETRY_MAX_ATTEMPTS or out_of_time:
+            if last_error is not None:
+                raise last_error
+            return result  # type: ignore[return-value]
+
+        reason = repr(last_error) if last_error is not None else f"status={result['status']}"  # type: ignore[index]
+        log_event(
+            "INFO",
+            "SMT_PROXY",
+            "smt_retry",
+            url=url,
+            attempt=f"{attempt + 1}/{SMT_RETRY_MAX_ATTEMPTS}",
+            after=round(backoff, 2),
+            reason=reason,
+        )
+        time.sleep(backoff)
+
+
+def _attempt_timeout(url: str, deadline: Optional[float]) -> float:
+    """HTTP timeout for the next step of an attempt: what is left before `deadline`, at most the default."""
+    if deadline is None:
+        return SMT_REQUEST_TIMEOUT_SECONDS
+    remaining = deadline - time.monotonic()
+    if remaining < SMT_MIN_ATTEMPT_SECONDS:
+        raise SmtUnavailableError("smt_deadline_exceeded", 0.0, url)
+    return min(SMT_REQUEST_TIMEOUT_SECONDS, remaining)
+
+
+def _smt_post_guarded(
+    url: str, endpoint: str, body: Dict[str, Any], timeout: float, deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    One attempt through the circuit breaker and the endpoint's rate limiter.
+    Time spent waiting for a rate-limit token comes out of the caller's deadline,
+    so the POST only gets what is left.
+    """
+
+    try:
+        SMT_CIRCUIT.before_call()
+    except SmtUnavailableError as exc:
+        exc.url = url
+        raise
+    try:
+        wait_budget = timeout if deadline is None else max(0.0, timeout - SMT_MIN_ATTEMPT_SECONDS)
+        SMT_RATE_LIMITER.acquire(endpoint, max_wait=wait_budget)
+        timeout = min(timeout, _attempt_timeout(url, deadline))
+    except SmtUnavailableError as exc:
+        SMT_CIRCUIT.release()
+        exc.url = url
+        raise
+
+    # Transport errors, timeouts, 429 and 5xx count against the breaker; other
+    # HTTP statuses mean SMT is up and answering.
+    healthy = False
+    outcome = "transport_error"
+    started = time.monotonic()
+    probed = True
+    try:
+        result = _smt_post_once(url, body, timeout, deadline)
+        healthy = result["status"] < 500 and result["status"] != 429
+        outcome = str(result["status"])
+        return result
+    except SmtUnavailableError:
+        # Out of time before the POST went out: nothing was learned about SMT.
+        probed = False
+        outcome = "deadline"
+        raise
+    finally:
+        if probed:
+            SMT_CIRCUIT.record(healthy)
+        else:
+            SMT_CIRCUIT.release()
+        METRICS.inc("smt_upstream_requests_total", endpoint=endpoint, status=outcome)
+        METRICS.observe("smt_upstream_duration_seconds", time.monotonic() - started, endpoint=endpoint)
+
+
+def _smt_post_once(url: str, body: Dict[str, Any], timeout: float, deadline: Optional[float] = None) -> Dict[str, Any]:
+    token = get_smt_access_token()
+    # A token fetch can be slow too; the POST gets only what is left of the deadline.
+    timeout = min(timeout, _attempt_timeout(url, deadline))
+
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
@@ -938,48 +3634,34 @@ def smt_post(path_or_url: str, body: Dict[str, Any]) -> Dict[str, Any]:
         headers["serviceId"] = SMT_SERVICE_ID
 
     if step_name:
-        try:
-            _log_smt_request(step_name, url, headers, payload)
-        except Exception as exc:
-            print(
-                f"[SMT_DEBUG] log_error step={step_name} err={exc!r}",
-                flush=True,
+        _log_smt_request(step_name, url, headers, payload)
+        if step_name in {"NewAgreement", "NewSubscription"}:
+            log_event(
+                "DEBUG",
+                "SMT_DEBUG",
+                "smt_identity",
+                step=step_name,
+                username=headers.get("username"),
+                serviceId=headers.get("serviceId"),
+                body=LazySnip(payload, limit=8000),
             )
 
     try:
-        if "NewAgreement" in url:
-            print(
-                "[SMT_DEBUG] NewAgreement username=%r serviceId=%r body=%s"
-                % (
-                    headers.get("username"),
-                    headers.get("serviceId"),
-                    json.dumps(payload, separators=(",", ":")),
-                ),
-                flush=True,
-            )
-        elif "NewSubscription" in url:
-            print(
-                "[SMT_DEBUG] NewSubscription username=%r serviceId=%r body=%s"
-                % (
-                    headers.get("username"),
-                    headers.get("serviceId"),
-                    json.dumps(payload, separators=(",", ":")),
-                ),
-                flush=True,
-            )
-        resp = requests.post(url, json=body, headers=headers, timeout=60)
+        resp = SMT_HTTP.post(url, json=body, headers=headers, timeout=timeout)
+        if resp.status_code == 401:
+            # Token revoked or expired early: refresh once (shared with any racing callers) and retry.
+            log_event("INFO", "SMT_PROXY", "token_retry", url=url, status=401)
+            token = get_smt_access_token(force_refresh=True, stale_token=token)
+            headers["Authorization"] = f"Bearer {token}"
+            timeout = min(timeout, _attempt_timeout(url, deadline))
+            resp = SMT_HTTP.post(url, json=body, headers=headers, timeout=timeout)
     except requests.RequestException as exc:
-        raise Exception(f"SMT POST to {url} failed: {exc}") from exc
+        raise SmtTransportError(f"SMT POST to {url} failed: {exc}", _request_never_sent(exc)) from exc
 
     if step_name:
         _log_smt_response(step_name, resp)
 
-    print(f"[SMT_PROXY] POST {url} status={resp.status_code}", flush=True)
-    try:
-        snippet = resp.text.replace("\n", " ")[:200]
-    except Exception:
-        snippet = "<non-text-body>"
-    print(f"[SMT_PROXY] SMT body_snip={snippet}", flush=True)
+    log_event("INFO", "SMT_PROXY", "smt_post", url=url, status=resp.status_code, body_snip=LazySnip(resp.text, limit=200))
 
     try:
         data = resp.json()
@@ -1029,16 +3711,467 @@ def _normalize_subscription_response(status: int, payload: Optional[Dict[str, An
     else:
         result["reason"] = f"HTTP {status}"
 
-    return result
+    return result
+
+
+HEALTH_PATHS = ("/health", "/healthz", "/")
+METRICS_PATH = "/metrics"
+# Paths reported under their own label; anything else is "other" so scanners can't blow up cardinality.
+METRIC_ROUTES = frozenset(
+    HEALTH_PATHS
+    + (
+        METRICS_PATH,
+        "/jobs",
+        "/trigger/smt-now",
+        "/agreements",
+        "/agreements-no-meter",
+        "/smt/report-status",
+        "/smt/report-status/batch",
+        "/smt/backfill/batch",
+        "/smt/backfill/plan",
+        "/smt/backfill/jobs",
+        "/smt/coverage",
+        "/smt/coverage/backfill",
+        "/smt/archive",
+        "/smt/archive/repost",
+        "/smt/subscriptions/list",
+        "/smt/subscriptions/unsubscribe",
+        "/smt/agreements/esiids",
+        "/smt/agreements/terminate",
+        "/smt/agreements/myagreements",
+    )
+)
+# Optional request header: the caller's remaining time budget in milliseconds.
+DEADLINE_HEADER = "x-deadline-ms"
+
+
+def _route_class(path: str) -> str:
+    """Bucket a request path (query string ignored) into the admission-control class it is capped under."""
+    path = urlparse(path).path or "/"
+    if path in HEALTH_PATHS or path == METRICS_PATH:
+        return "health"
+    if path == "/jobs" or path.startswith("/jobs/"):
+        # Local SQLite reads only; keep app polling from competing with SMT proxy slots.
+        return "jobs"
+    if path in ("/smt/coverage", "/smt/archive", "/smt/archive/repost"):
+        # Local coverage/archive reads and job-queue inserts only.
+        return "jobs"
+    if path == "/trigger/smt-now":
+        return "trigger"
+    return "smt_proxy"
+
+
+class RouteLimiter:
+    """
+    Non-blocking in-flight cap for one route class.
+
+    Requests never wait for a slot: if the class is saturated the handler answers
+    503 + Retry-After immediately so Vercel can fail fast and retry later.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.limit > 0 and self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self.in_flight > 0:
+                self.in_flight -= 1
+
+
+ROUTE_LIMITERS: Dict[str, RouteLimiter] = {
+    name: RouteLimiter(name, limit) for name, limit in WEBHOOK_ROUTE_LIMITS.items()
+}
+
+
+def _collect_gauges(server: Any) -> List[Tuple[str, Dict[str, Any], float]]:
+    """Point-in-time values read from the shared components at scrape time."""
+
+    gauges: List[Tuple[str, Dict[str, Any], float]] = []
+    work_queue = getattr(server, "work_queue", None)
+    if work_queue is not None:
+        gauges.append(("webhook_work_queue_depth", {}, work_queue.qsize()))
+        gauges.append(("webhook_work_queue_capacity", {}, work_queue.maxsize))
+    gauges.append(("webhook_rejected_connections_total", {}, getattr(server, "rejected_connections", 0)))
+    gauges.append(("webhook_log_records_written_total", {}, LOG_WRITER.written))
+    gauges.append(("webhook_log_records_dropped_total", {}, LOG_WRITER.dropped))
+    for route, limiter in ROUTE_LIMITERS.items():
+        gauges.append(("webhook_route_in_flight", {"route": route}, limiter.in_flight))
+        gauges.append(("webhook_route_rejected_total", {"route": route}, limiter.rejected))
+
+    # Running background jobs = started - finished, per kind.
+    running: Dict[str, float] = {}
+    for (metric, labels), value in METRICS.collect()["counters"].items():
+        kind = dict(labels).get("kind")
+        if kind is None:
+            continue
+        if metric == "webhook_background_jobs_started_total":
+            running[kind] = running.get(kind, 0.0) + value
+        elif metric == "webhook_background_jobs_finished_total":
+            running[kind] = running.get(kind, 0.0) - value
+    for kind in sorted(running):
+        gauges.append(("webhook_background_jobs_running", {"kind": kind}, max(0.0, running[kind])))
+
+    token = SMT_TOKEN_CACHE.snapshot()
+    gauges.append(("smt_token_fetches_total", {}, token["fetchCount"]))
+    gauges.append(("smt_token_fetch_errors_total", {}, token["fetchErrors"]))
+    gauges.append(("smt_token_remaining_seconds", {}, token["remainingSec"]))
+
+    gauges.append(("smt_circuit_open", {}, 0 if SMT_CIRCUIT.state == "closed" else 1))
+    gauges.append(("smt_circuit_opens_total", {}, SMT_CIRCUIT.opens))
+    gauges.append(("smt_circuit_short_circuited_total", {}, SMT_CIRCUIT.short_circuited))
+    gauges.append(("smt_rate_limited_total", {}, SMT_RATE_LIMITER.rejected))
+
+    for kind, states in JOB_QUEUE.counts().items():
+        for state, count in states.items():
+            gauges.append(("webhook_jobs", {"kind": kind, "state": state}, count))
+
+    sim_pool = SIM_JOB_POOL.snapshot()
+    gauges.append(("sim_job_workers_healthy", {}, sim_pool["healthy"]))
+    gauges.append(("sim_job_queue_depth", {}, sim_pool["queued"]))
+    gauges.append(("sim_job_worker_restarts_total", {}, sim_pool["restarts"]))
+
+    backfill = BACKFILL_TRACKER.snapshot()
+    gauges.append(("smt_backfill_jobs_active", {}, len(backfill["active"])))
+
+    for cache in (METER_INFO_CACHE, SMT_LISTING_CACHE):
+        snap = cache.snapshot()
+        for field, metric in (
+            ("size", "webhook_cache_entries"),
+            ("hits", "webhook_cache_hits_total"),
+            ("misses", "webhook_cache_misses_total"),
+            ("evictions", "webhook_cache_evictions_total"),
+        ):
+            gauges.append((metric, {"cache": cache.name}, snap[field]))
+
+    for pool in (SMT_HTTP, APP_HTTP):
+        snap = pool.snapshot()
+        gauges.append(("upstream_http_requests_total", {"upstream": pool.name}, snap["requests"]))
+        gauges.append(("upstream_http_errors_total", {"upstream": pool.name}, snap["errors"]))
+        gauges.append(("upstream_http_connections_open", {"upstream": pool.name}, snap["connectionsOpened"]))
+    return gauges
+
+
+def _overload_refusal() -> bytes:
+    body = json.dumps(
+        {"ok": False, "error": "server_busy", "route": "overload", "retryAfter": WEBHOOK_RETRY_AFTER_SECONDS}
+    ).encode("utf-8")
+    head = (
+        "HTTP/1.1 503 Service Unavailable\r\n"
+        "Content-Type: application/json\r\n"
+        f"Retry-After: {WEBHOOK_RETRY_AFTER_SECONDS}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("ascii") + body
+
+
+# Sent by the accept thread, unread request and all, when even the overload responders are backed up.
+OVERLOAD_REFUSAL = _overload_refusal()
+
+
+class BoundedThreadPoolHTTPServer(HTTPServer):
+    """
+    HTTPServer that hands accepted connections to a fixed pool of worker threads.
+
+    The hand-off queue is bounded. When it is full the connection goes to a
+    small overload responder pool running `overload_handler_class` (health still
+    answers 200, everything else gets a fast 503) under a total deadline for the
+    whole exchange. If the responders are backed up too, the accept thread
+    writes a canned 503 without reading anything and closes. The accept thread
+    itself never reads from a client, so a burst of slow SMT calls or a client
+    dribbling bytes can never stall /health or pile up unbounded sockets.
+    """
+
+    overload_deadline = 2.0
+    overload_responders = 2
+    overload_backlog = 32
+
+    def __init__(
+        self,
+        server_address: Tuple[str, int],
+        handler_class: Any,
+        *,
+        overload_handler_class: Any,
+        workers: int,
+        queue_size: int,
+    ):
+        super().__init__(server_address, handler_class)
+        self.overload_handler_class = overload_handler_class
+        self.work_queue: "queue.Queue[Tuple[Any, Any]]" = queue.Queue(maxsize=max(1, queue_size))
+        self.workers = max(1, workers)
+        self.rejected_connections = 0
+        self.overload_queue: "queue.Queue[Tuple[Any, Any]]" = queue.Queue(maxsize=self.overload_backlog)
+        for idx in range(self.workers):
+            threading.Thread(
+                target=self._worker_loop,
+                name=f"webhook-worker-{idx}",
+                daemon=True,
+            ).start()
+        for idx in range(self.overload_responders):
+            threading.Thread(
+                target=self._overload_loop,
+                name=f"webhook-overload-{idx}",
+                daemon=True,
+            ).start()
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        try:
+            self.work_queue.put_nowait((request, client_address))
+        except queue.Full:
+            self.rejected_connections += 1
+            try:
+                self.overload_queue.put_nowait((request, client_address))
+            except queue.Full:
+                self._refuse(request)
+
+    def _refuse(self, request: Any) -> None:
+        # Never blocks: nothing is read, and a short reply fits an empty send buffer.
+        try:
+            request.setblocking(False)
+            request.send(OVERLOAD_REFUSAL)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    @staticmethod
+    def _cut_off(request: Any) -> None:
+        try:
+            request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _process_overloaded(self, request: Any, client_address: Any) -> None:
+        # settimeout bounds each recv; the timer bounds the whole exchange, so a
+        # client sending a byte at a time cannot hold a responder past the deadline.
+        watchdog = threading.Timer(self.overload_deadline, self._cut_off, (request,))
+        watchdog.daemon = True
+        try:
+            request.settimeout(self.overload_deadline)
+            watchdog.start()
+            self.overload_handler_class(request, client_address, self)
+        except OSError:
+            pass
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            watchdog.cancel()
+            self.shutdown_request(request)
+
+    def _overload_loop(self) -> None:
+        while True:
+            request, client_address = self.overload_queue.get()
+            try:
+                self._process_overloaded(request, client_address)
+            finally:
+                self.overload_queue.task_done()
+
+    def _worker_loop(self) -> None:
+        while True:
+            request, client_address = self.work_queue.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.work_queue.task_done()
+
+
+class H(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        # The stdlib access log writes to stderr synchronously; send it through the async writer.
+        log_event("INFO", "WEBHOOK", "access", client=self.address_string(), line=format % args)
+
+    def _write_busy(self, error: str, route: str) -> None:
+        # Drain a bounded request body so the client sees the 503 instead of a reset.
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        if 0 < length <= 1024 * 1024:
+            try:
+                self.rfile.read(length)
+            except Exception:
+                pass
+        body = json.dumps(
+            {
+                "ok": False,
+                "error": error,
+                "route": route,
+                "retryAfter": WEBHOOK_RETRY_AFTER_SECONDS,
+            }
+        ).encode("utf-8")
+        self.send_response(503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Retry-After", str(WEBHOOK_RETRY_AFTER_SECONDS))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_smt_unavailable(
+        self,
+        exc: SmtUnavailableError,
+        partial_results: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        retry_after = max(1, int(exc.retry_after + 0.999))
+        payload: Dict[str, Any] = {"ok": False, "error": exc.code, "retryAfter": retry_after}
+        if partial_results:
+            payload["partialResults"] = partial_results
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(504 if exc.code == "smt_deadline_exceeded" else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Retry-After", str(retry_after))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _request_deadline(self) -> Optional[float]:
+        # Callers pass their remaining budget so SMT retries never outlive the caller's wait.
+        raw = (self.headers.get(DEADLINE_HEADER) or "").strip()
+        if not raw:
+            return None
+        try:
+            budget_ms = float(raw)
+        except ValueError:
+            return None
+        if budget_ms <= 0:
+            return None
+        return time.monotonic() + budget_ms / 1000.0
+
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status_code = code
+        super().send_response(code, message)
+
+    def _admit_and_run(self, handler: Any) -> None:
+        self._status_code = 0
+        started = time.monotonic()
+        try:
+            with request_deadline(self._request_deadline()):
+                self._admit_and_run_inner(handler)
+        finally:
+            path = urlparse(getattr(self, "path", "/")).path
+            if path.startswith("/jobs/"):
+                route = "/jobs/:id"
+            else:
+                route = path if path in METRIC_ROUTES else "other"
+            METRICS.inc("webhook_requests_total", route=route, method=self.command, status=self._status_code)
+            METRICS.observe("webhook_request_duration_seconds", time.monotonic() - started, route=route)
+
+    def _admit_and_run_inner(self, handler: Any) -> None:
+        route = _route_class(getattr(self, "path", "/"))
+        limiter = ROUTE_LIMITERS.get(route)
+        if limiter is None:
+            handler()
+            return
+        if not limiter.try_acquire():
+            log_event(
+                "WARNING",
+                "WEBHOOK",
+                "admission_rejected",
+                route=route,
+                path=self.path,
+                in_flight=limiter.in_flight,
+                limit=limiter.limit,
+            )
+            self._write_busy("route_busy", route)
+            return
+        try:
+            handler()
+        except SmtUnavailableError as exc:
+            # Handlers without their own SMT error mapping (terminate, unsubscribe) land here.
+            self._write_smt_unavailable(exc)
+        finally:
+            limiter.release()
+
+    def do_GET(self) -> None:
+        self._admit_and_run(self._dispatch_get)
+
+    def do_POST(self) -> None:
+        self._admit_and_run(self._dispatch_post)
+
+    def _handle_jobs_get(self, parsed: Any) -> None:
+        if parsed.path.startswith("/jobs/"):
+            job_id = parsed.path[len("/jobs/"):].strip("/")
+            job = JOB_QUEUE.get(job_id) if job_id else None
+            if job is None:
+                self._write_json(404, {"ok": False, "error": "job_not_found"})
+                return
+            self._write_json(200, {"ok": True, "job": job_view(job, include_tail=True)})
+            return
+
+        query = parse_qs(parsed.query)
+        state = (query.get("state") or [""])[0].strip() or None
+        kind = (query.get("kind") or [""])[0].strip() or None
+        try:
+            limit = min(500, max(1, int((query.get("limit") or ["100"])[0])))
+        except ValueError:
+            self._write_json(400, {"ok": False, "error": "invalid_limit"})
+            return
+        jobs = JOB_QUEUE.list(state=state, kind=kind, limit=limit)
+        self._write_json(
+            200,
+            {"ok": True, "counts": JOB_QUEUE.counts(), "jobs": [job_view(job) for job in jobs]},
+        )
+
+    def _dispatch_get(self) -> None:
+        parsed = urlparse(getattr(self, "path", "/"))
+        # Lightweight health endpoint so systemd/ops can confirm the webhook server is alive.
+        if (parsed.path or "/") in HEALTH_PATHS:
+            body = b"ok"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if parsed.path == "/smt/backfill/jobs":
+            if not self._ensure_proxy_auth():
+                return
+            self._write_json(200, {"ok": True, **BACKFILL_TRACKER.snapshot()})
+            return
+
+        if parsed.path == "/jobs" or parsed.path.startswith("/jobs/"):
+            if not self._ensure_proxy_auth():
+                return
+            self._handle_jobs_get(parsed)
+            return
+
+        if parsed.path == "/smt/coverage":
+            if not self._ensure_proxy_auth():
+                return
+            self._handle_smt_coverage_get(parsed)
+            return
 
+        if parsed.path == "/smt/archive":
+            if not self._ensure_proxy_auth():
+                return
+            self._handle_smt_archive_get(parsed)
+            return
 
-class H(BaseHTTPRequestHandler):
-    def do_GET(self) -> None:
-        # Lightweight health endpoint so systemd/ops can confirm the webhook server is alive.
-        if getattr(self, "path", "/") in ("/health", "/healthz", "/"):
-            body = b"ok"
+        if parsed.path == METRICS_PATH:
+            if WEBHOOK_METRICS_TOKEN:
+                auth = (self.headers.get("authorization") or "").strip()
+                if not hmac.compare_digest(auth.encode("utf-8"), f"Bearer {WEBHOOK_METRICS_TOKEN}".encode("utf-8")):
+                    self._write_json(401, {"ok": False, "error": "unauthorized"})
+                    return
+            body = render_metrics(METRICS, _collect_gauges(self.server)).encode("utf-8")
             self.send_response(200)
-            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
             self.send_header("Content-Length", str(len(body)))
             self.end_headers()
             self.wfile.write(body)
@@ -1075,10 +4208,7 @@ class H(BaseHTTPRequestHandler):
 
     def _ensure_proxy_auth(self) -> bool:
         if not SMT_PROXY_TOKEN:
-            print(
-                "[SMT_DEBUG] proxy_auth path=%s error=token_not_configured" % (getattr(self, "path", "?"),),
-                flush=True,
-            )
+            log_event("DEBUG", "SMT_DEBUG", "proxy_auth", path=getattr(self, "path", "?"), error="token_not_configured")
             self._write_json(
                 500,
                 {"ok": False, "error": "smt_proxy_token_not_configured"},
@@ -1087,33 +4217,27 @@ class H(BaseHTTPRequestHandler):
 
         auth_header = self.headers.get("Authorization") or ""
         if not auth_header.startswith("Bearer "):
-            print(
-                "[SMT_DEBUG] proxy_auth path=%s error=missing_bearer_header" % (getattr(self, "path", "?"),),
-                flush=True,
-            )
+            log_event("DEBUG", "SMT_DEBUG", "proxy_auth", path=getattr(self, "path", "?"), error="missing_bearer_header")
             self._write_json(401, {"ok": False, "error": "unauthorized"})
             return False
 
         incoming_token = auth_header.split(" ", 1)[1].strip()
         if not secrets.compare_digest(incoming_token, SMT_PROXY_TOKEN):
-            print(
-                "[SMT_DEBUG] proxy_auth path=%s error=token_mismatch incoming_len=%s incoming_sha256=%s expected_len=%s expected_sha256=%s"
-                % (
-                    getattr(self, "path", "?"),
-                    len(incoming_token),
-                    self._sha256_hex(incoming_token),
-                    len(SMT_PROXY_TOKEN),
-                    self._sha256_hex(SMT_PROXY_TOKEN),
-                ),
-                flush=True,
+            log_event(
+                "DEBUG",
+                "SMT_DEBUG",
+                "proxy_auth",
+                path=getattr(self, "path", "?"),
+                error="token_mismatch",
+                incoming_len=len(incoming_token),
+                incoming_sha256=self._sha256_hex(incoming_token),
+                expected_len=len(SMT_PROXY_TOKEN),
+                expected_sha256=self._sha256_hex(SMT_PROXY_TOKEN),
             )
             self._write_json(401, {"ok": False, "error": "unauthorized"})
             return False
 
-        print(
-            "[SMT_DEBUG] proxy_auth path=%s status=accepted" % (getattr(self, "path", "?"),),
-            flush=True,
-        )
+        log_event("DEBUG", "SMT_DEBUG", "proxy_auth", path=getattr(self, "path", "?"), status="accepted")
         return True
 
     def _read_json_payload(self, *, allow_empty: bool) -> Optional[Dict[str, Any]]:
@@ -1156,13 +4280,18 @@ class H(BaseHTTPRequestHandler):
 
         if action_str == "list_subscriptions":
             service_type = str(payload.get("serviceType") or "").strip() or None
-            print(
-                "[SMT_DEBUG] /agreements legacy action=list_subscriptions serviceType=%r"
-                % (service_type or "<none>"),
-                flush=True,
+            log_event(
+                "DEBUG",
+                "SMT_DEBUG",
+                "agreements_legacy",
+                action="list_subscriptions",
+                serviceType=service_type or None,
             )
             try:
-                status, data = smt_list_subscriptions()
+                status, data, cache_info = smt_list_subscriptions_cached(payload.get("noCache") is True)
+            except SmtUnavailableError as exc:
+                self._write_smt_unavailable(exc)
+                return
             except SmtProxyRequestError as exc:
                 logging.error(
                     "[SMT_PROXY] legacy list_subscriptions error status=%s payload_snip=%s",
@@ -1188,7 +4317,7 @@ class H(BaseHTTPRequestHandler):
 
             self._write_json(
                 200,
-                {"ok": True, "status": status, "subscriptions": data},
+                {"ok": True, "status": status, "subscriptions": data, "cache": cache_info},
             )
             return
 
@@ -1202,14 +4331,20 @@ class H(BaseHTTPRequestHandler):
                 )
                 return
 
-            print(
-                "[SMT_DEBUG] /agreements legacy action=report_status correlationId=%r serviceType=%r"
-                % (correlation_id, service_type or "<none>"),
-                flush=True,
+            log_event(
+                "DEBUG",
+                "SMT_DEBUG",
+                "agreements_legacy",
+                action="report_status",
+                correlationId=correlation_id,
+                serviceType=service_type or None,
             )
 
             try:
                 status, data = smt_report_status(correlation_id, service_type)
+            except SmtUnavailableError as exc:
+                self._write_smt_unavailable(exc)
+                return
             except SmtProxyRequestError as exc:
                 logging.error(
                     "[SMT_PROXY] legacy report_status error status=%s payload_snip=%s",
@@ -1250,14 +4385,19 @@ class H(BaseHTTPRequestHandler):
                 )
                 return
 
-            print(
-                "[SMT_DEBUG] /agreements legacy action=agreement_esiids agreementNumber=%r"
-                % agreement_number,
-                flush=True,
+            log_event(
+                "DEBUG",
+                "SMT_DEBUG",
+                "agreements_legacy",
+                action="agreement_esiids",
+                agreementNumber=agreement_number,
             )
 
             try:
                 status, data = smt_agreement_esiids(agreement_number)
+            except SmtUnavailableError as exc:
+                self._write_smt_unavailable(exc)
+                return
             except SmtProxyRequestError as exc:
                 logging.error(
                     "[SMT_PROXY] legacy agreement_esiids error status=%s payload_snip=%s",
@@ -1306,10 +4446,13 @@ class H(BaseHTTPRequestHandler):
                 )
                 return
 
-            print(
-                "[SMT_DEBUG] /agreements legacy action=terminate_agreement agreementNumber=%r retailCustomerEmail=%r"
-                % (agreement_number, retail_email),
-                flush=True,
+            log_event(
+                "DEBUG",
+                "SMT_DEBUG",
+                "agreements_legacy",
+                action="terminate_agreement",
+                agreementNumber=agreement_number,
+                retailCustomerEmail=retail_email,
             )
 
             status, data = smt_terminate_agreement(agreement_number, retail_email)
@@ -1338,17 +4481,22 @@ class H(BaseHTTPRequestHandler):
                     )
                     return
 
-            print(
-                "[SMT_DEBUG] /agreements legacy action=myagreements agreementNumber=%r statusReason=%r"
-                % (
-                    agreement_number if agreement_number is not None else "<none>",
-                    status_reason or "<none>",
-                ),
-                flush=True,
+            log_event(
+                "DEBUG",
+                "SMT_DEBUG",
+                "agreements_legacy",
+                action="myagreements",
+                agreementNumber=agreement_number,
+                statusReason=status_reason or None,
             )
 
             try:
-                status, data = smt_my_agreements(agreement_number, status_reason)
+                status, data, cache_info = smt_my_agreements_cached(
+                    agreement_number, status_reason, payload.get("noCache") is True
+                )
+            except SmtUnavailableError as exc:
+                self._write_smt_unavailable(exc)
+                return
             except SmtProxyRequestError as exc:
                 logging.error(
                     "[SMT_PROXY] legacy myagreements error status=%s payload_snip=%s",
@@ -1374,7 +4522,7 @@ class H(BaseHTTPRequestHandler):
 
             self._write_json(
                 200,
-                {"ok": True, "status": status, "agreements": data},
+                {"ok": True, "status": status, "agreements": data, "cache": cache_info},
             )
             return
 
@@ -1417,12 +4565,22 @@ class H(BaseHTTPRequestHandler):
                     end_date=str(end_date).strip(),
                     authorization_id=str(authorization_id).strip() if authorization_id else None,
                 )
+            except SmtUnavailableError as exc:
+                self._write_smt_unavailable(exc)
+                return
             except Exception:
                 logging.exception("[SMT_PROXY] request_interval_backfill failed")
                 self._write_json(500, {"ok": False, "error": "backfill_failed"})
                 return
 
-            self._write_json(200, {"ok": True, "jobId": job_id})
+            tracked = BACKFILL_TRACKER.track(
+                job_id,
+                esiid=str(esiid).strip(),
+                startDate=str(start_date).strip(),
+                endDate=str(end_date).strip(),
+                authorizationId=str(authorization_id).strip() if authorization_id else None,
+            )
+            self._write_json(200, {"ok": True, "jobId": job_id, "tracked": tracked})
             return
 
         if action_str != "create_agreement_and_subscription":
@@ -1439,10 +4597,7 @@ class H(BaseHTTPRequestHandler):
                 rep_puct_number = int(str(rep_puct_number_raw).strip())
             except Exception:
                 rep_puct_number = rep_puct_number_default
-        print(
-            f"[SMT_DEBUG] /agreements using PUCTRORNumber={rep_puct_number}",
-            flush=True,
-        )
+        log_event("DEBUG", "SMT_DEBUG", "agreements_rep", PUCTRORNumber=rep_puct_number)
 
         steps: List[Dict[str, Any]] = []
         raw_steps = payload.get("steps")
@@ -1539,10 +4694,7 @@ class H(BaseHTTPRequestHandler):
             else action
         )
 
-        print(
-            f"[SMT_PROXY] {log_prefix} action={action_for_log} steps={len(validated_steps)}",
-            flush=True,
-        )
+        log_event("INFO", "SMT_PROXY", "agreements_steps", route=log_prefix, action=action_for_log, steps=len(validated_steps))
 
         agreement_result: Optional[Dict[str, Any]] = None
         subscription_result: Optional[Dict[str, Any]] = None
@@ -1552,6 +4704,9 @@ class H(BaseHTTPRequestHandler):
             # Execute each SMT step in order, capturing responses for the client.
             try:
                 smt_response = smt_post(step["path"], step["body"])
+            except SmtUnavailableError as exc:
+                self._write_smt_unavailable(exc, partial_results=response_steps)
+                return
             except Exception as exc:
                 self._write_json(
                     502,
@@ -1587,6 +4742,9 @@ class H(BaseHTTPRequestHandler):
                         status_raw,
                     )
                     status_code = 0
+            if 200 <= status_code < 300:
+                # A NewAgreement/NewSubscription landed; cached listings are now stale.
+                invalidate_smt_listing_cache(f"{log_prefix}:{step_name or 'step'}")
             data = smt_response.get("data")
             subscription_payload: Optional[Dict[str, Any]]
             if isinstance(data, dict):
@@ -1627,15 +4785,9 @@ class H(BaseHTTPRequestHandler):
                                 if candidate:
                                     duns = candidate
                                     break
-                        print(
-                            f"[SMT_PROXY] SMT subscription already active for DUNS={duns} status={status_code}",
-                            flush=True,
-                        )
+                        log_event("INFO", "SMT_PROXY", "subscription_already_active", duns=duns, status=status_code)
                     else:
-                        print(
-                            f"[SMT_PROXY] SMT subscription created status={status_code}",
-                            flush=True,
-                        )
+                        log_event("INFO", "SMT_PROXY", "subscription_created", status=status_code)
                 else:
                     self._write_json(
                         502,
@@ -1681,14 +4833,19 @@ class H(BaseHTTPRequestHandler):
             self._write_json(400, {"ok": False, "error": "missing_correlationId"})
             return
 
-        print(
-            "[SMT_DEBUG] /smt/report-status request "
-            f"correlationId={correlation_id!r} serviceType={(service_type or '<none>')!r}",
-            flush=True,
+        log_event(
+            "DEBUG",
+            "SMT_DEBUG",
+            "report_status_request",
+            correlationId=correlation_id,
+            serviceType=service_type or None,
         )
 
         try:
             status, data = smt_report_status(correlation_id, service_type or None)
+        except SmtUnavailableError as exc:
+            self._write_smt_unavailable(exc)
+            return
         except SmtProxyRequestError as exc:
             logging.error(
                 "[SMT_PROXY] /smt/report-status error status=%s payload_snip=%s",
@@ -1710,25 +4867,419 @@ class H(BaseHTTPRequestHandler):
             self._write_json(500, {"ok": False, "error": "Unexpected SMT proxy error"})
             return
 
+        log_event("DEBUG", "SMT_DEBUG", "report_status_response", httpStatus=status, body=LazySnip(data, limit=800))
+
+        self._write_json(
+            200,
+            {
+                "ok": True,
+                "status": status,
+                "reportStatus": data,
+            },
+        )
+
+    def _handle_smt_report_status_batch(self) -> None:
+        if not self._ensure_proxy_auth():
+            return
+
+        payload = self._read_json_payload(allow_empty=False)
+        if payload is None:
+            self._write_json(400, {"ok": False, "error": "invalid_json"})
+            return
+
+        raw_ids = payload.get("correlationIds")
+        if not isinstance(raw_ids, list) or not raw_ids:
+            self._write_json(400, {"ok": False, "error": "missing_correlationIds"})
+            return
+
+        # De-duplicate while preserving caller order.
+        correlation_ids: List[str] = []
+        seen: set = set()
+        for raw in raw_ids:
+            value = str(raw or "").strip()
+            if value and value not in seen:
+                seen.add(value)
+                correlation_ids.append(value)
+
+        if not correlation_ids:
+            self._write_json(400, {"ok": False, "error": "missing_correlationIds"})
+            return
+        if len(correlation_ids) > SMT_BATCH_MAX_IDS:
+            self._write_json(
+                400,
+                {"ok": False, "error": "too_many_correlationIds", "max": SMT_BATCH_MAX_IDS},
+            )
+            return
+
+        service_type = str(payload.get("serviceType") or "").strip() or None
+        concurrency: Optional[int] = None
+        try:
+            if payload.get("concurrency") is not None:
+                concurrency = max(1, min(int(payload["concurrency"]), SMT_BATCH_CONCURRENCY))
+        except (TypeError, ValueError):
+            concurrency = None
+
+        started = time.monotonic()
+        results = smt_report_status_batch(correlation_ids, service_type, concurrency)
+        succeeded = sum(1 for r in results if r.get("ok"))
+
+        log_event(
+            "DEBUG",
+            "SMT_DEBUG",
+            "report_status_batch",
+            count=len(correlation_ids),
+            succeeded=succeeded,
+            failed=len(results) - succeeded,
+            elapsed_ms=int((time.monotonic() - started) * 1000),
+        )
+
+        self._write_json(
+            200,
+            {
+                "ok": succeeded == len(results),
+                "total": len(results),
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results,
+            },
+        )
+
+    def _handle_smt_backfill_batch(self) -> None:
+        if not self._ensure_proxy_auth():
+            return
+
+        payload = self._read_json_payload(allow_empty=False)
+        if payload is None:
+            self._write_json(400, {"ok": False, "error": "invalid_json"})
+            return
+
+        # Either {"esiids": [...], "startDate", "endDate"} or {"requests": [{"esiid", "startDate", "endDate"}]}.
+        raw_items: List[Any] = []
+        if isinstance(payload.get("requests"), list):
+            raw_items = payload["requests"]
+        elif isinstance(payload.get("esiids"), list):
+            raw_items = [
+                {"esiid": value, "startDate": payload.get("startDate"), "endDate": payload.get("endDate")}
+                for value in payload["esiids"]
+            ]
+
+        items: List[Dict[str, str]] = []
+        for idx, raw in enumerate(raw_items):
+            if not isinstance(raw, dict):
+                self._write_json(400, {"ok": False, "error": "invalid_request", "detail": f"requests[{idx}] must be an object"})
+                return
+            esiid = str(raw.get("esiid") or raw.get("ESIID") or "").strip()
+            start_date = str(raw.get("startDate") or "").strip()
+            end_date = str(raw.get("endDate") or "").strip()
+            if not esiid or not start_date or not end_date:
+                self._write_json(
+                    400,
+                    {
+                        "ok": False,
+                        "error": "missing_required_fields",
+                        "detail": f"requests[{idx}] needs esiid, startDate and endDate",
+                    },
+                )
+                return
+            items.append({"esiid": esiid, "startDate": start_date, "endDate": end_date})
+
+        if not items:
+            self._write_json(400, {"ok": False, "error": "missing_esiids"})
+            return
+        if len(items) > SMT_BATCH_MAX_IDS:
+            self._write_json(400, {"ok": False, "error": "too_many_esiids", "max": SMT_BATCH_MAX_IDS})
+            return
+
+        chunk_size: Optional[int] = None
         try:
-            body_snip = (
-                json.dumps(data, separators=(",", ":")) if isinstance(data, (dict, list)) else repr(data)
+            if payload.get("chunkSize") is not None:
+                chunk_size = max(1, min(int(payload["chunkSize"]), SMT_BACKFILL_MAX_ESIIDS_PER_REQUEST))
+        except (TypeError, ValueError):
+            chunk_size = None
+
+        chunks = smt_request_interval_backfill_batch(items, chunk_size=chunk_size)
+
+        jobs: Dict[str, str] = {}
+        for chunk in chunks:
+            if not chunk.get("ok"):
+                continue
+            chunk["tracked"] = BACKFILL_TRACKER.track(
+                chunk["jobId"],
+                esiids=chunk["esiids"],
+                startDate=chunk["startDate"],
+                endDate=chunk["endDate"],
             )
-        except Exception:
-            body_snip = repr(data)
+            for esiid in chunk["esiids"]:
+                jobs[esiid] = chunk["jobId"]
+
+        accepted = sum(1 for chunk in chunks if chunk.get("ok"))
+        log_event(
+            "DEBUG",
+            "SMT_DEBUG",
+            "backfill_batch",
+            esiids=len(items),
+            chunks=len(chunks),
+            accepted=accepted,
+            rejected=len(chunks) - accepted,
+        )
 
-        print(
-            "[SMT_DEBUG] /smt/report-status response "
-            f"httpStatus={status!r} body={_smt_snip(body_snip, limit=800)}",
-            flush=True,
+        self._write_json(
+            200,
+            {
+                "ok": accepted == len(chunks),
+                "accepted": accepted,
+                "rejected": len(chunks) - accepted,
+                "chunks": chunks,
+                "jobs": jobs,
+            },
+        )
+
+    def _handle_smt_backfill_plan(self) -> None:
+        if not self._ensure_proxy_auth():
+            return
+
+        payload = self._read_json_payload(allow_empty=False)
+        if payload is None:
+            self._write_json(400, {"ok": False, "error": "invalid_json"})
+            return
+
+        raw_esiids = payload.get("esiids")
+        if not isinstance(raw_esiids, list):
+            raw_esiids = [payload.get("esiid") or payload.get("ESIID")]
+        esiids = [str(value).strip() for value in raw_esiids if value and str(value).strip()]
+        start_date = str(payload.get("startDate") or "").strip()
+        end_date = str(payload.get("endDate") or "").strip()
+        if not esiids or not start_date or not end_date:
+            self._write_json(
+                400,
+                {
+                    "ok": False,
+                    "error": "missing_required_fields",
+                    "details": {"esiid": bool(esiids), "startDate": bool(start_date), "endDate": bool(end_date)},
+                },
+            )
+            return
+
+        split = payload.get("split")
+        try:
+            split = backfill_split(SMT_BACKFILL_SPLIT_DEFAULT if split is None or split == "" else split)
+        except (TypeError, ValueError) as exc:
+            self._write_json(400, {"ok": False, "error": "invalid_split", "detail": str(exc)})
+            return
+
+        # Size the plan arithmetically; only build the windows once it is known to fit.
+        try:
+            count = count_backfill_windows(start_date, end_date, split)
+        except (OverflowError, ValueError) as exc:
+            self._write_json(400, {"ok": False, "error": "invalid_window", "detail": str(exc)})
+            return
+
+        if count * len(esiids) > SMT_BATCH_MAX_IDS:
+            self._write_json(400, {"ok": False, "error": "plan_too_large", "max": SMT_BATCH_MAX_IDS})
+            return
+
+        try:
+            windows = plan_backfill_windows(start_date, end_date, split)
+        except (OverflowError, ValueError) as exc:
+            self._write_json(400, {"ok": False, "error": "invalid_window", "detail": str(exc)})
+            return
+
+        if payload.get("dryRun") is True:
+            self._write_json(200, {"ok": True, "dryRun": True, "windows": windows})
+            return
+
+        chunks = smt_request_interval_backfill_planned(esiids, start_date, end_date, split=split)
+        for chunk in chunks:
+            if chunk.get("ok"):
+                chunk["tracked"] = BACKFILL_TRACKER.track(
+                    chunk["jobId"],
+                    esiids=chunk["esiids"],
+                    startDate=chunk["startDate"],
+                    endDate=chunk["endDate"],
+                    plannedFrom=f"{start_date}-{end_date}",
+                )
+
+        accepted = sum(1 for chunk in chunks if chunk.get("ok"))
+        log_event(
+            "DEBUG",
+            "SMT_DEBUG",
+            "backfill_plan",
+            esiids=len(esiids),
+            window=f"{start_date}->{end_date}",
+            split=split,
+            subjobs=len(chunks),
+            accepted=accepted,
+        )
+
+        self._write_json(
+            200,
+            {
+                "ok": accepted == len(chunks),
+                "split": split,
+                "windows": windows,
+                "accepted": accepted,
+                "rejected": len(chunks) - accepted,
+                "subJobs": chunks,
+            },
         )
 
+    def _handle_smt_coverage_get(self, parsed: Any) -> None:
+        store = coverage_store()
+        if store is None:
+            self._write_json(501, {"ok": False, "error": "coverage_unavailable"})
+            return
+        query = parse_qs(parsed.query)
+        esiid = ((query.get("esiid") or [""])[0]).strip()
+        if not esiid:
+            self._write_json(400, {"ok": False, "error": "missing_esiid"})
+            return
+        try:
+            start_day, end_day = coverage_window((query.get("startDate") or [None])[0], (query.get("endDate") or [None])[0])
+        except ValueError as exc:
+            self._write_json(400, {"ok": False, "error": "invalid_window", "detail": str(exc)})
+            return
+        report = store.report(
+            esiid,
+            start_day,
+            end_day,
+            include_leading=(query.get("includeLeading") or ["0"])[0] in ("1", "true"),
+            merge_gap_days=SMT_COVERAGE_MERGE_GAP_DAYS,
+        )
+        self._write_json(200, {"ok": True, **report})
+
+    def _handle_smt_coverage_backfill(self) -> None:
+        if not self._ensure_proxy_auth():
+            return
+        if coverage_store() is None:
+            self._write_json(501, {"ok": False, "error": "coverage_unavailable"})
+            return
+
+        payload = self._read_json_payload(allow_empty=False)
+        if payload is None:
+            self._write_json(400, {"ok": False, "error": "invalid_json"})
+            return
+
+        raw_esiids = payload.get("esiids")
+        if not isinstance(raw_esiids, list):
+            raw_esiids = [payload.get("esiid") or payload.get("ESIID")]
+        esiids = [str(value).strip() for value in raw_esiids if value and str(value).strip()]
+        if not esiids:
+            self._write_json(400, {"ok": False, "error": "missing_esiids"})
+            return
+        if len(esiids) > SMT_BATCH_MAX_IDS:
+            self._write_json(400, {"ok": False, "error": "too_many_esiids", "max": SMT_BATCH_MAX_IDS})
+            return
+        try:
+            start_day, end_day = coverage_window(payload.get("startDate"), payload.get("endDate"))
+        except ValueError as exc:
+            self._write_json(400, {"ok": False, "error": "invalid_window", "detail": str(exc)})
+            return
+
+        result = coverage_backfill(
+            esiids,
+            start_day,
+            end_day,
+            dry_run=payload.get("dryRun") is True,
+            force=payload.get("force") is True,
+        )
+        self._write_json(200, result)
+
+    def _handle_smt_archive_get(self, parsed: Any) -> None:
+        archive = interval_archive()
+        if archive is None:
+            self._write_json(501, {"ok": False, "error": "archive_unavailable"})
+            return
+        query = parse_qs(parsed.query)
+        esiid = ((query.get("esiid") or [""])[0]).strip()
+        if not esiid:
+            self._write_json(400, {"ok": False, "error": "missing_esiid"})
+            return
+        try:
+            start_day, end_day = coverage_window((query.get("startDate") or [None])[0], (query.get("endDate") or [None])[0])
+        except ValueError as exc:
+            self._write_json(400, {"ok": False, "error": "invalid_window", "detail": str(exc)})
+            return
+        started = time.perf_counter()
+        try:
+            cols = archive.read(
+                esiid, smt_intervals.chicago_day_start(start_day), smt_intervals.chicago_day_start(end_day + 1)
+            )
+        except (OSError, ValueError) as exc:
+            self._write_json(500, {"ok": False, "error": "archive_unreadable", "detail": str(exc)})
+            return
+        read_ms = (time.perf_counter() - started) * 1000
+        first, last = cols.ts_range()
         self._write_json(
             200,
             {
                 "ok": True,
-                "status": status,
-                "reportStatus": data,
+                "esiid": esiid,
+                "startDate": smt_intervals.format_day(start_day),
+                "endDate": smt_intervals.format_day(end_day),
+                "intervals": len(cols),
+                "meters": [meter for _, meter in cols.series_keys],
+                "first": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(first)) if first is not None else None,
+                "last": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(last)) if last is not None else None,
+                "readMs": round(read_ms, 2),
+                "partitions": archive.index(esiid),
+            },
+        )
+
+    def _handle_smt_archive_repost(self) -> None:
+        if not self._ensure_proxy_auth():
+            return
+        if interval_archive() is None:
+            self._write_json(501, {"ok": False, "error": "archive_unavailable"})
+            return
+
+        payload = self._read_json_payload(allow_empty=False)
+        if payload is None:
+            self._write_json(400, {"ok": False, "error": "invalid_json"})
+            return
+
+        raw_esiids = payload.get("esiids")
+        if not isinstance(raw_esiids, list):
+            raw_esiids = [payload.get("esiid") or payload.get("ESIID")]
+        esiids = [str(value).strip() for value in raw_esiids if value and str(value).strip()]
+        if not esiids:
+            self._write_json(400, {"ok": False, "error": "missing_esiids"})
+            return
+        if len(esiids) > SMT_BATCH_MAX_IDS:
+            self._write_json(400, {"ok": False, "error": "too_many_esiids", "max": SMT_BATCH_MAX_IDS})
+            return
+        # ESIIDs name archive directories and job log files: same character rule as the archive.
+        invalid = [esiid for esiid in esiids if not _archive_safe_esiid(esiid)]
+        if invalid:
+            self._write_json(400, {"ok": False, "error": "invalid_esiid", "esiids": invalid[:20]})
+            return
+        start_date = payload.get("startDate")
+        end_date = payload.get("endDate")
+        try:
+            start_day, end_day = coverage_window(start_date, end_date)
+        except ValueError as exc:
+            self._write_json(400, {"ok": False, "error": "invalid_window", "detail": str(exc)})
+            return
+
+        jobs: Dict[str, str] = {}
+        for esiid in esiids:
+            job = JOB_QUEUE.enqueue(
+                "smt_archive_repost",
+                {
+                    "esiid": esiid,
+                    "startDate": smt_intervals.format_day(start_day),
+                    "endDate": smt_intervals.format_day(end_day),
+                },
+                _job_priority(payload, "admin_triggered"),
+            )
+            jobs[esiid] = job["id"]
+        self._write_json(
+            200,
+            {
+                "ok": True,
+                "queued": len(jobs),
+                "startDate": smt_intervals.format_day(start_day),
+                "endDate": smt_intervals.format_day(end_day),
+                "jobs": jobs,
             },
         )
 
@@ -1743,7 +5294,10 @@ class H(BaseHTTPRequestHandler):
             return
 
         try:
-            status, data = smt_list_subscriptions()
+            status, data, cache_info = smt_list_subscriptions_cached(payload.get("noCache") is True)
+        except SmtUnavailableError as exc:
+            self._write_smt_unavailable(exc)
+            return
         except SmtProxyRequestError as exc:
             logging.error(
                 "[SMT_PROXY] /smt/subscriptions/list error status=%s payload_snip=%s",
@@ -1771,6 +5325,7 @@ class H(BaseHTTPRequestHandler):
                 "ok": True,
                 "status": status,
                 "subscriptions": data,
+                "cache": cache_info,
             },
         )
 
@@ -1821,6 +5376,9 @@ class H(BaseHTTPRequestHandler):
 
         try:
             status, data = smt_agreement_esiids(agreement_number)
+        except SmtUnavailableError as exc:
+            self._write_smt_unavailable(exc)
+            return
         except SmtProxyRequestError as exc:
             logging.error(
                 "[SMT_PROXY] /smt/agreements/esiids error status=%s payload_snip=%s",
@@ -1879,26 +5437,24 @@ class H(BaseHTTPRequestHandler):
             )
             return
 
-        print(
-            "[SMT_DEBUG] /smt/agreements/terminate request "
-            f"agreementNumber={agreement_number!r} retailCustomerEmail={retail_customer_email!r}",
-            flush=True,
+        log_event(
+            "DEBUG",
+            "SMT_DEBUG",
+            "terminate_request",
+            agreementNumber=agreement_number,
+            retailCustomerEmail=retail_customer_email,
         )
 
         status, data = smt_terminate_agreement(agreement_number, retail_customer_email)
         ok = _smt_success(status)
 
-        try:
-            body_snip = (
-                json.dumps(data, separators=(",", ":")) if isinstance(data, (dict, list)) else repr(data)
-            )
-        except Exception:
-            body_snip = repr(data)
-
-        print(
-            "[SMT_DEBUG] /smt/agreements/terminate response "
-            f"httpStatus={status!r} ok={ok} body={_smt_snip(body_snip, limit=800)}",
-            flush=True,
+        log_event(
+            "DEBUG",
+            "SMT_DEBUG",
+            "terminate_response",
+            httpStatus=status,
+            ok=ok,
+            body=LazySnip(data, limit=800),
         )
 
         self._write_json(
@@ -1935,15 +5491,21 @@ class H(BaseHTTPRequestHandler):
                 )
                 return
 
-        print(
-            "[SMT_DEBUG] /smt/agreements/myagreements request "
-            f"agreementNumber={(agreement_number if agreement_number is not None else '<none>')!r} "
-            f"statusReason={(status_reason or '<none>')!r}",
-            flush=True,
+        log_event(
+            "DEBUG",
+            "SMT_DEBUG",
+            "myagreements_request",
+            agreementNumber=agreement_number,
+            statusReason=status_reason or None,
         )
 
         try:
-            status, data = smt_my_agreements(agreement_number, status_reason or None)
+            status, data, cache_info = smt_my_agreements_cached(
+                agreement_number, status_reason or None, payload.get("noCache") is True
+            )
+        except SmtUnavailableError as exc:
+            self._write_smt_unavailable(exc)
+            return
         except SmtProxyRequestError as exc:
             logging.error(
                 "[SMT_PROXY] /smt/agreements/myagreements error status=%s payload_snip=%s",
@@ -1965,18 +5527,7 @@ class H(BaseHTTPRequestHandler):
             self._write_json(500, {"ok": False, "error": "Unexpected SMT proxy error"})
             return
 
-        try:
-            body_snip = (
-                json.dumps(data, separators=(",", ":")) if isinstance(data, (dict, list)) else repr(data)
-            )
-        except Exception:
-            body_snip = repr(data)
-
-        print(
-            "[SMT_DEBUG] /smt/agreements/myagreements response "
-            f"httpStatus={status!r} body={_smt_snip(body_snip, limit=800)}",
-            flush=True,
-        )
+        log_event("DEBUG", "SMT_DEBUG", "myagreements_response", httpStatus=status, body=LazySnip(data, limit=800))
 
         self._write_json(
             200,
@@ -1984,10 +5535,11 @@ class H(BaseHTTPRequestHandler):
                 "ok": True,
                 "status": status,
                 "agreements": data,
+                "cache": cache_info,
             },
         )
 
-    def do_POST(self):
+    def _dispatch_post(self) -> None:
         if self.path == "/agreements":
             self._handle_agreements()
             return
@@ -2000,6 +5552,26 @@ class H(BaseHTTPRequestHandler):
             self._handle_smt_report_status()
             return
 
+        if self.path == "/smt/report-status/batch":
+            self._handle_smt_report_status_batch()
+            return
+
+        if self.path == "/smt/backfill/batch":
+            self._handle_smt_backfill_batch()
+            return
+
+        if self.path == "/smt/backfill/plan":
+            self._handle_smt_backfill_plan()
+            return
+
+        if self.path == "/smt/coverage/backfill":
+            self._handle_smt_coverage_backfill()
+            return
+
+        if self.path == "/smt/archive/repost":
+            self._handle_smt_archive_repost()
+            return
+
         if self.path == "/smt/subscriptions/list":
             self._handle_smt_subscriptions_list()
             return
@@ -2105,11 +5677,40 @@ class H(BaseHTTPRequestHandler):
             self.wfile.write(json.dumps({"ok": False, "error": msg}).encode("utf-8"))
 
 
+class OverloadedH(H):
+    """Handler used by the accept thread while the worker queue is full."""
+
+    def do_GET(self) -> None:
+        if (urlparse(getattr(self, "path", "/")).path or "/") in HEALTH_PATHS:
+            self._dispatch_get()
+            return
+        self._write_busy("server_busy", _route_class(self.path))
+
+    def do_POST(self) -> None:
+        self._write_busy("server_busy", _route_class(self.path))
+
+
 if __name__ == "__main__":
+    _install_log_handler()
+    # Warm the sim-job workers now so the first webhook doesn't pay the cold start.
+    SIM_JOB_POOL.start()
+    # Recover jobs left queued/running by the previous process and start dispatching.
+    JOB_QUEUE.start()
     port = int(os.environ.get("PORT", "8787"))
-    srv = HTTPServer(("0.0.0.0", port), H)
+    if WEBHOOK_WORKERS > 0:
+        srv: HTTPServer = BoundedThreadPoolHTTPServer(
+            ("0.0.0.0", port),
+            H,
+            overload_handler_class=OverloadedH,
+            workers=WEBHOOK_WORKERS,
+            queue_size=WEBHOOK_QUEUE_SIZE,
+        )
+        mode = f"pool workers={WEBHOOK_WORKERS} queue={WEBHOOK_QUEUE_SIZE} limits={WEBHOOK_ROUTE_LIMITS}"
+    else:
+        srv = HTTPServer(("0.0.0.0", port), H)
+        mode = "single"
     print(
-        f"listening on :{port}, headers={ACCEPT_HEADERS}, secrets_loaded={len(SECRETS)}",
+        f"listening on :{port}, mode={mode}, headers={ACCEPT_HEADERS}, secrets_loaded={len(SECRETS)}",
         flush=True,
     )
     srv.serve_forever()
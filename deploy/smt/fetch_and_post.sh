@@ -140,6 +140,14 @@ FORCE_REPOST="false"
 case "${FORCE_REPOST_RAW,,}" in
   1|true|yes|y) FORCE_REPOST="true" ;;
 esac
+# Optional: skip the SFTP sync and only post what is already in SMT_LOCAL_DIR.
+# The webhook sets this for the 2nd..Nth ESIID of a coalesced ingest pass, which
+# already synced the inbox once for the first ESIID.
+SKIP_SFTP_RAW="${SMT_SKIP_SFTP:-false}"
+SKIP_SFTP="false"
+case "${SKIP_SFTP_RAW,,}" in
+  1|true|yes|y) SKIP_SFTP="true" ;;
+esac
 require_cmd python3
 
 mkdir -p "$SMT_LOCAL_DIR"
@@ -165,21 +173,25 @@ trap 'rm -f "$BATCH_FILE" "$RESP_FILE"' EXIT
 # Clean up stale temp dirs from previous decrypts (run best-effort, ignore errors)
 find "$SMT_LOCAL_DIR" -maxdepth 1 -type d -name 'pgp_tmp.*' -mmin +60 -prune -exec rm -rf {} + >/dev/null 2>&1 || true
 
-log "Starting SFTP sync from ${SMT_USER}@${SMT_HOST}:${SMT_REMOTE_DIR}"
-cat >"$BATCH_FILE" <<BATCH
+if [[ "$SKIP_SFTP" == "true" ]]; then
+  log "SMT_SKIP_SFTP=true; using files already in ${SMT_LOCAL_DIR}"
+else
+  log "Starting SFTP sync from ${SMT_USER}@${SMT_HOST}:${SMT_REMOTE_DIR}"
+  cat >"$BATCH_FILE" <<BATCH
 cd ${SMT_REMOTE_DIR}
 lcd ${SMT_LOCAL_DIR}
 mget -p -r *
 BATCH
 
-if [[ -n "${SMT_KEY:-}" ]]; then
-  sftp_cmd=(sftp -i "$SMT_KEY" -oStrictHostKeyChecking=accept-new "${SMT_USER}@${SMT_HOST}")
-else
-  sftp_cmd=(sftp -oPreferredAuthentications=password -oStrictHostKeyChecking=accept-new "${SMT_USER}@${SMT_HOST}")
-fi
+  if [[ -n "${SMT_KEY:-}" ]]; then
+    sftp_cmd=(sftp -i "$SMT_KEY" -oStrictHostKeyChecking=accept-new "${SMT_USER}@${SMT_HOST}")
+  else
+    sftp_cmd=(sftp -oPreferredAuthentications=password -oStrictHostKeyChecking=accept-new "${SMT_USER}@${SMT_HOST}")
+  fi
 
-if ! "${sftp_cmd[@]}" <"$BATCH_FILE"; then
-  log "WARN: sftp returned non-zero; continuing with any downloaded files"
+  if ! "${sftp_cmd[@]}" <"$BATCH_FILE"; then
+    log "WARN: sftp returned non-zero; continuing with any downloaded files"
+  fi
 fi
 
 mapfile -t FILES < <(
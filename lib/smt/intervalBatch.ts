@@ -0,0 +1,133 @@
+/**
+ * Packed SMT interval batches posted by the droplet ingest engine
+ * (deploy/droplet/smt_intervals.py, SMT_UPLOAD_FORMAT=binary).
+ *
+ * The droplet parses IntervalMeterUsage CSVs itself and sends one batch per
+ * ESIID/meter and America/Chicago day, so the app never parses CSV on this path.
+ * Layout (little-endian), batches concatenated back to back:
+ *
+ *   magic "SMTB" | version u8 | esiid len u8 + ascii | meter len u8 + ascii
+ *   | chicago day i32 (days since 1970-01-01) | base ts i64 (UTC epoch seconds)
+ *   | count u16 | count x (minute offset u16, kWh*1000 i32, flags u8)
+ */
+
+export const SMT_INTERVAL_BATCH_MAGIC = "SMTB";
+export const SMT_INTERVAL_BATCH_VERSION = 1;
+export const SMT_INTERVAL_FLAG_ESTIMATED = 0x01;
+export const SMT_INTERVAL_FLAG_GENERATION = 0x02;
+
+const RECORD_BYTES = 7;
+
+export type SmtIntervalBatchPoint = {
+  ts: Date;
+  kwh: number;
+  flags: number;
+};
+
+export type SmtIntervalBatch = {
+  esiid: string;
+  meter: string;
+  /** America/Chicago calendar day, as days since 1970-01-01. */
+  chicagoDay: number;
+  intervals: SmtIntervalBatchPoint[];
+};
+
+export class SmtIntervalBatchError extends Error {
+  constructor(message: string) {
+    super(message);
+    this.name = "SmtIntervalBatchError";
+  }
+}
+
+function ascii(bytes: Uint8Array): string {
+  return Buffer.from(bytes.buffer, bytes.byteOffset, bytes.byteLength).toString("ascii");
+}
+
+export function decodeSmtIntervalBatches(input: Uint8Array): SmtIntervalBatch[] {
+  const view = new DataView(input.buffer, input.byteOffset, input.byteLength);
+  const batches: SmtIntervalBatch[] = [];
+  let pos = 0;
+
+  const need = (n: number) => {
+    if (pos + n > input.byteLength) {
+      throw new SmtIntervalBatchError(`truncated batch at byte ${pos}`);
+    }
+  };
+  const readString = (): string => {
+    need(1);
+    const len = view.getUint8(pos);
+    pos += 1;
+    need(len);
+    const value = ascii(input.subarray(pos, pos + len));
+    pos += len;
+    return value;
+  };
+
+  while (pos < input.byteLength) {
+    need(5);
+    const magic = ascii(input.subarray(pos, pos + 4));
+    if (magic !== SMT_INTERVAL_BATCH_MAGIC) {
+      throw new SmtIntervalBatchError(`bad batch magic at byte ${pos}`);
+    }
+    const version = view.getUint8(pos + 4);
+    if (version !== SMT_INTERVAL_BATCH_VERSION) {
+      throw new SmtIntervalBatchError(`unsupported batch version ${version}`);
+    }
+    pos += 5;
+    const esiid = readString();
+    const meter = readString();
+    need(14);
+    const chicagoDay = view.getInt32(pos, true);
+    // i64 base seconds as low u32 + signed high i32 (exact for any real timestamp).
+    const baseMs = (view.getUint32(pos + 4, true) + view.getInt32(pos + 8, true) * 2 ** 32) * 1000;
+    const count = view.getUint16(pos + 12, true);
+    pos += 14;
+    need(count * RECORD_BYTES);
+    const intervals: SmtIntervalBatchPoint[] = new Array(count);
+    for (let i = 0; i < count; i += 1) {
+      intervals[i] = {
+        ts: new Date(baseMs + view.getUint16(pos, true) * 60_000),
+        kwh: view.getInt32(pos + 2, true) / 1000,
+        flags: view.getUint8(pos + 6),
+      };
+      pos += RECORD_BYTES;
+    }
+    if (!esiid) {
+      throw new SmtIntervalBatchError("batch without ESIID");
+    }
+    batches.push({ esiid, meter: meter || "unknown", chicagoDay, intervals });
+  }
+
+  return batches;
+}
+
+/** Inverse of decodeSmtIntervalBatches for one batch (tests and tooling). */
+export function encodeSmtIntervalBatch(batch: SmtIntervalBatch): Uint8Array {
+  const esiid = Buffer.from(batch.esiid, "ascii");
+  const meter = Buffer.from(batch.meter, "ascii");
+  const count = batch.intervals.length;
+  const out = new Uint8Array(5 + 1 + esiid.length + 1 + meter.length + 14 + count * RECORD_BYTES);
+  const view = new DataView(out.buffer);
+  const baseSeconds = count ? Math.min(...batch.intervals.map((p) => Math.floor(p.ts.getTime() / 1000))) : 0;
+  let pos = 0;
+  out.set(Buffer.from(SMT_INTERVAL_BATCH_MAGIC, "ascii"), pos);
+  view.setUint8(pos + 4, SMT_INTERVAL_BATCH_VERSION);
+  pos += 5;
+  for (const value of [esiid, meter]) {
+    view.setUint8(pos, value.length);
+    out.set(value, pos + 1);
+    pos += 1 + value.length;
+  }
+  view.setInt32(pos, batch.chicagoDay, true);
+  view.setUint32(pos + 4, baseSeconds >>> 0, true);
+  view.setInt32(pos + 8, Math.floor(baseSeconds / 2 ** 32), true);
+  view.setUint16(pos + 12, count, true);
+  pos += 14;
+  for (const point of batch.intervals) {
+    view.setUint16(pos, Math.round((point.ts.getTime() / 1000 - baseSeconds) / 60), true);
+    view.setInt32(pos + 2, Math.round(point.kwh * 1000), true);
+    view.setUint8(pos + 6, point.flags);
+    pos += RECORD_BYTES;
+  }
+  return out;
+}
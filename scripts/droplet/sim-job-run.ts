@@ -3,7 +3,16 @@
  * Usage:
  *   npx tsx scripts/droplet/sim-job-run.ts gapfill_compare <compareRunId>
  *   npx tsx scripts/droplet/sim-job-run.ts past_sim_recalc <jobId>
+ *   npx tsx scripts/droplet/sim-job-run.ts --worker
+ *
+ * Worker mode keeps one warm process (tsx transpile, Prisma client) for many jobs.
+ * The webhook server writes one JSON request per line on stdin:
+ *   {"id": "...", "op": "run", "kind": "gapfill_compare", "arg": "<id>"}
+ *   {"id": "...", "op": "ping"}
+ * and reads one JSON reply per line on stdout: {"id": "...", "ok": true|false, "error"?: "..."}.
+ * Jobs run one at a time. All other output goes to stderr so stdout stays protocol-only.
  */
+import { createInterface } from "node:readline";
 import { runGapfillCompareQueuedWorker } from "../../modules/usageSimulator/gapfillCompareQueuedWorker";
 import { runPastSimRecalcQueuedWorker } from "../../modules/usageSimulator/pastSimRecalcQueuedWorker";
 import {
@@ -11,16 +20,7 @@ import {
   SIM_DROPLET_JOB_KIND_PAST_SIM_RECALC,
 } from "../../modules/usageSimulator/dropletSimWebhook";
 
-const kind = process.argv[2]?.trim();
-const id = process.argv[3]?.trim();
-
-async function main() {
-  if (!kind || !id) {
-    console.error(
-      "Usage: npx tsx scripts/droplet/sim-job-run.ts <gapfill_compare|past_sim_recalc> <id>"
-    );
-    process.exit(1);
-  }
+async function runJob(kind: string, id: string): Promise<void> {
   console.error(`[sim-job-run] start kind=${kind} id=${id} cwd=${process.cwd()}`);
   if (kind === SIM_DROPLET_JOB_KIND_GAPFILL_COMPARE) {
     await runGapfillCompareQueuedWorker(id);
@@ -32,8 +32,77 @@ async function main() {
     console.log("[sim-job-run] past_sim_recalc ok", id);
     return;
   }
-  console.error("[sim-job-run] unknown job kind:", kind);
-  process.exit(1);
+  throw new Error(`unknown job kind: ${kind}`);
+}
+
+type WorkerRequest = { id?: string; op?: string; kind?: string; arg?: string };
+
+function reply(message: Record<string, unknown>): void {
+  process.stdout.write(JSON.stringify(message) + "\n");
+}
+
+async function workerMain(): Promise<void> {
+  // Job code logs with console.log; keep those lines off the protocol channel.
+  console.log = console.error.bind(console);
+  console.error(`[sim-job-run] worker ready pid=${process.pid} cwd=${process.cwd()}`);
+
+  const lines = createInterface({ input: process.stdin, crlfDelay: Infinity });
+  for await (const line of lines) {
+    const trimmed = line.trim();
+    if (!trimmed) continue;
+    let request: WorkerRequest;
+    try {
+      request = JSON.parse(trimmed) as WorkerRequest;
+    } catch {
+      reply({ ok: false, error: "invalid_json" });
+      continue;
+    }
+    const id = String(request.id ?? "");
+    if (request.op === "ping") {
+      reply({ id, ok: true, pong: true });
+      continue;
+    }
+    const kind = String(request.kind ?? "").trim();
+    const arg = String(request.arg ?? "").trim();
+    if (request.op !== "run" || !kind || !arg) {
+      reply({ id, ok: false, error: "invalid_request" });
+      continue;
+    }
+    const started = Date.now();
+    try {
+      await runJob(kind, arg);
+      reply({ id, ok: true, ms: Date.now() - started });
+    } catch (err) {
+      console.error("[sim-job-run] failed", kind, arg, err);
+      reply({ id, ok: false, error: err instanceof Error ? err.message : String(err), ms: Date.now() - started });
+    }
+  }
+  console.error(`[sim-job-run] worker stdin closed pid=${process.pid}; exiting`);
+}
+
+async function main() {
+  if (process.argv[2]?.trim() === "--worker") {
+    await workerMain();
+    process.exit(0);
+  }
+
+  const kind = process.argv[2]?.trim();
+  const id = process.argv[3]?.trim();
+  if (!kind || !id) {
+    console.error(
+      "Usage: npx tsx scripts/droplet/sim-job-run.ts <gapfill_compare|past_sim_recalc> <id> | --worker"
+    );
+    process.exit(1);
+  }
+  try {
+    await runJob(kind, id);
+  } catch (err) {
+    if (err instanceof Error && err.message.startsWith("unknown job kind")) {
+      console.error("[sim-job-run] unknown job kind:", kind);
+      process.exit(1);
+    }
+    throw err;
+  }
 }
 
 main().catch((err) => {
@@ -0,0 +1,53 @@
+import { describe, expect, it } from "vitest";
+
+import {
+  decodeSmtIntervalBatches,
+  encodeSmtIntervalBatch,
+  SMT_INTERVAL_FLAG_ESTIMATED,
+  SmtIntervalBatchError,
+} from "@/lib/smt/intervalBatch";
+
+// Packed by deploy/droplet/smt_intervals.py from two rows of an SMT interval CSV:
+// 08/01/2024 00:00 0.412 A and 00:15 1.5 E (America/Chicago, CDT).
+const DROPLET_BATCH_HEX =
+  "534d544201113130343433373230303030303030303031024d31e04d00005016ab6600000000020000009c010000000f00dc05000001";
+
+describe("decodeSmtIntervalBatches", () => {
+  it("decodes a batch packed by the droplet ingest engine", () => {
+    const batches = decodeSmtIntervalBatches(Buffer.from(DROPLET_BATCH_HEX, "hex"));
+    expect(batches).toHaveLength(1);
+    const [batch] = batches;
+    expect(batch.esiid).toBe("10443720000000001");
+    expect(batch.meter).toBe("M1");
+    expect(batch.chicagoDay).toBe(Date.UTC(2024, 7, 1) / 86_400_000);
+    expect(batch.intervals.map((p) => p.ts.toISOString())).toEqual([
+      "2024-08-01T05:00:00.000Z",
+      "2024-08-01T05:15:00.000Z",
+    ]);
+    expect(batch.intervals.map((p) => p.kwh)).toEqual([0.412, 1.5]);
+    expect(batch.intervals[1].flags & SMT_INTERVAL_FLAG_ESTIMATED).toBe(SMT_INTERVAL_FLAG_ESTIMATED);
+  });
+
+  it("round-trips concatenated batches", () => {
+    const day = {
+      esiid: "1044",
+      meter: "M2",
+      chicagoDay: 20000,
+      intervals: [
+        { ts: new Date("2024-10-04T05:00:00.000Z"), kwh: 0.25, flags: 0 },
+        { ts: new Date("2024-10-05T04:45:00.000Z"), kwh: -0.125, flags: 2 },
+      ],
+    };
+    const one = encodeSmtIntervalBatch(day);
+    const body = Buffer.concat([one, one]);
+    const decoded = decodeSmtIntervalBatches(body);
+    expect(decoded).toHaveLength(2);
+    expect(decoded[1]).toEqual(day);
+  });
+
+  it("rejects truncated or foreign payloads", () => {
+    const packed = Buffer.from(DROPLET_BATCH_HEX, "hex");
+    expect(() => decodeSmtIntervalBatches(packed.subarray(0, packed.length - 3))).toThrow(SmtIntervalBatchError);
+    expect(() => decodeSmtIntervalBatches(Buffer.from("ESIID,USAGE_KWH\n"))).toThrow(SmtIntervalBatchError);
+  });
+});